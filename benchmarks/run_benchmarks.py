@@ -0,0 +1,413 @@
+# benchmarks/run_benchmarks.py
+
+"""
+Benchmarks for the pipeline's hot paths.
+
+    python benchmarks/run_benchmarks.py run --notes 10k --output results.json
+    python benchmarks/run_benchmarks.py compare base.json results.json
+
+`run` generates (or reuses, with --corpus) a synthetic Takeout corpus, times
+each benchmark `--repeat` times and writes the results as JSON. `compare`
+reports the throughput change of every benchmark between two result files
+and exits with status 1 if any of them regressed by more than --threshold.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import pickle
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from plugins.base import Entry, PublishPlugin
+from plugins.chunk import Plugin as ChunkPlugin
+from plugins.big_query import Plugin as BigQueryPlugin
+from plugins.google_keep import Plugin as GoogleKeepPlugin
+from plugins.image_description import Plugin as ImageDescriptionPlugin
+from plugins.lexical_index import Plugin as LexicalIndexPlugin, LexicalIndex
+from plugins.llm_metadata_enricher import Plugin as MetadataEnricherPlugin
+from plugins.llm_vectorize import Plugin as VectorizePlugin
+from plugins.near_duplicate import Plugin as NearDuplicatePlugin
+from plugins.vector_index import Plugin as VectorIndexPlugin
+from takeout_generator import generate_takeout, parse_count
+from core.dag import Branch
+from core.dead_letter import open_dead_letters
+from core.metrics import PipelineMetrics
+from core.sharded import run_sharded_pipeline
+from core.sync_runner import run_sync_pipeline
+
+class BenchContext:
+    """Shared inputs of one benchmark session."""
+    def __init__(self, corpus: str, workdir: str, mock_latency: float, workers: int):
+        self.corpus = corpus
+        self.workdir = workdir
+        self.mock_latency = mock_latency
+        self.workers = workers
+        self._entries: Optional[bytes] = None
+
+    def fresh_entries(self) -> List[Entry]:
+        """Returns a new copy of the parsed corpus (filters modify entries in place)."""
+        if self._entries is None:
+            entries = list(GoogleKeepPlugin({"path": self.corpus}).execute())
+            self._entries = pickle.dumps(entries, protocol=pickle.HIGHEST_PROTOCOL)
+        return pickle.loads(self._entries)
+
+    def vectorized_entries(self) -> List[Entry]:
+        return list(VectorizePlugin({"batch_size": 64}).execute(iter(self.fresh_entries())))
+
+
+def _timed(fn: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def _drain(iterator):
+    for _ in iterator:
+        pass
+
+# Each benchmark prepares its inputs, times the hot path only and returns
+# (seconds, items processed).
+
+def bench_keep_parse(ctx: BenchContext) -> Tuple[float, int]:
+    plugin = GoogleKeepPlugin({"path": ctx.corpus, "mock_latency": ctx.mock_latency})
+    count = [0]
+    def run():
+        count[0] = sum(1 for _ in plugin.execute())
+    return _timed(run), count[0]
+
+
+def bench_keep_parse_parallel(ctx: BenchContext) -> Tuple[float, int]:
+    plugin = GoogleKeepPlugin({"path": ctx.corpus, "workers": ctx.workers, "mock_latency": ctx.mock_latency})
+    count = [0]
+    def run():
+        count[0] = sum(1 for _ in plugin.execute())
+    return _timed(run), count[0]
+
+
+def bench_keep_parse_staged(ctx: BenchContext) -> Tuple[float, int]:
+    # Images described by their own stage, overlapping with parsing.
+    plugin = GoogleKeepPlugin({"path": ctx.corpus, "describe_images": False})
+    describe = ImageDescriptionPlugin({"workers": ctx.workers, "mock_latency": ctx.mock_latency})
+    count = [0]
+    def run():
+        count[0] = sum(1 for _ in describe.execute(plugin.execute()))
+    return _timed(run), count[0]
+
+
+def bench_filter_chain(ctx: BenchContext) -> Tuple[float, int]:
+    entries = ctx.fresh_entries()
+    vectorize = VectorizePlugin({"batch_size": 64, "mock_latency": ctx.mock_latency})
+    enrich = MetadataEnricherPlugin({"mock_latency": ctx.mock_latency})
+    return _timed(lambda: _drain(enrich.execute(vectorize.execute(iter(entries))))), len(entries)
+
+
+def bench_near_duplicate(ctx: BenchContext) -> Tuple[float, int]:
+    entries = ctx.fresh_entries()
+    plugin = NearDuplicatePlugin({"workers": ctx.workers})
+    return _timed(lambda: _drain(plugin.execute(iter(entries)))), len(entries)
+
+
+def bench_entry_pickle(ctx: BenchContext) -> Tuple[float, int]:
+    entries = ctx.vectorized_entries()
+    def run():
+        for entry in entries:
+            pickle.loads(pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+    return _timed(run), len(entries)
+
+
+def bench_entry_to_row(ctx: BenchContext) -> Tuple[float, int]:
+    entries = ctx.vectorized_entries()
+    def run():
+        for entry in entries:
+            json.dumps(BigQueryPlugin.to_row(entry), ensure_ascii=False, separators=(",", ":"))
+    return _timed(run), len(entries)
+
+
+def _bench_bigquery(ctx: BenchContext, mode: str) -> Tuple[float, int]:
+    entries = ctx.vectorized_entries()
+    plugin = BigQueryPlugin({"table_id": "entries", "client": "fake", "mode": mode,
+                             "mock_latency": ctx.mock_latency})
+    return _timed(lambda: plugin.execute(iter(entries))), len(entries)
+
+
+def bench_publish_bigquery_streaming(ctx: BenchContext) -> Tuple[float, int]:
+    return _bench_bigquery(ctx, "streaming")
+
+
+def bench_publish_bigquery_load(ctx: BenchContext) -> Tuple[float, int]:
+    return _bench_bigquery(ctx, "load")
+
+
+def bench_publish_vector_index(ctx: BenchContext) -> Tuple[float, int]:
+    entries = ctx.vectorized_entries()
+    path = os.path.join(ctx.workdir, "vector_index")
+    shutil.rmtree(path, ignore_errors=True)
+    plugin = VectorIndexPlugin({"path": path})
+    return _timed(lambda: plugin.execute(iter(entries))), len(entries)
+
+
+def bench_publish_lexical_index(ctx: BenchContext) -> Tuple[float, int]:
+    entries = ctx.fresh_entries()
+    path = os.path.join(ctx.workdir, "lexical_index")
+    shutil.rmtree(path, ignore_errors=True)
+    plugin = LexicalIndexPlugin({"path": path})
+    return _timed(lambda: plugin.execute(iter(entries))), len(entries)
+
+
+def bench_lexical_search(ctx: BenchContext) -> Tuple[float, int]:
+    # Queries are short extracts of the notes themselves.
+    entries = ctx.fresh_entries()
+    path = os.path.join(ctx.workdir, "lexical_search")
+    shutil.rmtree(path, ignore_errors=True)
+    LexicalIndexPlugin({"path": path}).execute(iter(entries))
+    step = max(1, len(entries) // 200)
+    queries = [entry.content[len(entry.content) // 2:][:6] for entry in entries[::step]]
+    index = LexicalIndex(path)
+    return _timed(lambda: [index.search(query, k=10) for query in queries]), len(queries)
+
+
+class _CountingPublisher(PublishPlugin):
+    def __init__(self):
+        super().__init__({})
+        self.count = 0
+
+    def execute(self, entries):
+        self.count += sum(1 for _ in entries)
+
+
+def _bench_pipeline(ctx: BenchContext, sharded: bool, isolated: bool = False) -> Tuple[float, int]:
+    # A CPU-bound chain: sentence chunking and hash embeddings of every chunk.
+    subscription = GoogleKeepPlugin({"path": ctx.corpus})
+    filters = [
+        ChunkPlugin({"max_tokens": 128, "overlap_tokens": 16}),
+        VectorizePlugin({"backend": "hash", "dimensions": 256, "batch_size": 64}),
+    ]
+    publisher = _CountingPublisher()
+    global_config = {"sharded": {"workers": ctx.workers}}
+    run = run_sharded_pipeline if sharded else run_sync_pipeline
+    metrics = PipelineMetrics()
+    dead_letters = None
+    if isolated:
+        # Per-entry error boundaries on every stage; nothing fails.
+        path = os.path.join(ctx.workdir, "dead_letters.sqlite3")
+        dead_letters = open_dead_letters({"path": path}, metrics, [subscription], filters, [publisher])
+    try:
+        seconds = _timed(lambda: run([subscription], filters, [publisher], global_config, metrics,
+                                     dead_letters=dead_letters))
+    finally:
+        if dead_letters is not None:
+            dead_letters.store.close()
+    return seconds, publisher.count
+
+
+def bench_pipeline_sync(ctx: BenchContext) -> Tuple[float, int]:
+    return _bench_pipeline(ctx, sharded=False)
+
+
+def bench_pipeline_sharded(ctx: BenchContext) -> Tuple[float, int]:
+    return _bench_pipeline(ctx, sharded=True)
+
+
+def bench_pipeline_isolated(ctx: BenchContext) -> Tuple[float, int]:
+    return _bench_pipeline(ctx, sharded=False, isolated=True)
+
+
+def bench_pipeline_branched(ctx: BenchContext) -> Tuple[float, int]:
+    # Only notes with attachments go through image description; every note is embedded.
+    subscription = GoogleKeepPlugin({"path": ctx.corpus, "describe_images": False})
+    images, vectors = _CountingPublisher(), _CountingPublisher()
+    branches = [
+        Branch("images", {"metadata": {"attachments": {"exists": True}}},
+               [ImageDescriptionPlugin({"workers": ctx.workers, "mock_latency": ctx.mock_latency})], [images]),
+        Branch("vectors", None,
+               [VectorizePlugin({"backend": "hash", "dimensions": 256, "batch_size": 64})], [vectors]),
+    ]
+    seconds = _timed(lambda: run_sync_pipeline([subscription], [], [], {}, PipelineMetrics(), branches=branches))
+    return seconds, vectors.count
+
+
+def bench_cold_start(ctx: BenchContext) -> Tuple[float, int]:
+    # Times a fresh interpreter validating the example config; should stay well under a second.
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    command = [sys.executable, os.path.join(root, 'src', 'main.py'), '--validate', os.path.join(root, 'rag.yaml.example')]
+    return _timed(lambda: subprocess.run(command, check=True, capture_output=True)), 1
+
+
+BENCHMARKS: Dict[str, Callable[[BenchContext], Tuple[float, int]]] = {
+    "keep_parse": bench_keep_parse,
+    "keep_parse_parallel": bench_keep_parse_parallel,
+    "keep_parse_staged": bench_keep_parse_staged,
+    "filter_chain": bench_filter_chain,
+    "near_duplicate": bench_near_duplicate,
+    "entry_pickle": bench_entry_pickle,
+    "entry_to_row": bench_entry_to_row,
+    "publish_bigquery_streaming": bench_publish_bigquery_streaming,
+    "publish_bigquery_load": bench_publish_bigquery_load,
+    "publish_vector_index": bench_publish_vector_index,
+    "publish_lexical_index": bench_publish_lexical_index,
+    "lexical_search": bench_lexical_search,
+    "pipeline_sync": bench_pipeline_sync,
+    "pipeline_sharded": bench_pipeline_sharded,
+    "pipeline_isolated": bench_pipeline_isolated,
+    "pipeline_branched": bench_pipeline_branched,
+    "cold_start": bench_cold_start,
+}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def run_benchmarks(ctx: BenchContext, names: List[str], repeat: int = 3) -> Dict[str, Any]:
+    """Runs the named benchmarks `repeat` times each and summarizes the timings."""
+    results = {}
+    for name in names:
+        runs, items = [], 0
+        for _ in range(max(1, repeat)):
+            seconds, items = BENCHMARKS[name](ctx)
+            runs.append(seconds)
+        best = min(runs)
+        results[name] = {
+            "items": items,
+            "runs_seconds": runs,
+            "best_seconds": best,
+            "median_seconds": statistics.median(runs),
+            "items_per_second": items / best if best else 0.0,
+        }
+        print(f"{name:30s} {items:>9d} items  {results[name]['items_per_second']:>12.1f} items/s", file=sys.stderr)
+    return results
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """
+    Compares the throughput of every benchmark present in both reports.
+    A benchmark regressed if its throughput dropped by more than `threshold`.
+    """
+    rows = []
+    for name, result in new["results"].items():
+        if name not in base["results"]:
+            continue
+        before = base["results"][name]["items_per_second"]
+        after = result["items_per_second"]
+        change = (after - before) / before if before else 0.0
+        rows.append({
+            "name": name,
+            "base_items_per_second": before,
+            "new_items_per_second": after,
+            "change": change,
+            "regression": change < -threshold,
+        })
+    return rows
+
+
+def _cmd_run(args) -> int:
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"Unknown benchmarks: {', '.join(unknown)}. Available: {', '.join(BENCHMARKS)}")
+
+    workdir = tempfile.mkdtemp(prefix="shiori-bench-")
+    try:
+        corpus = args.corpus
+        notes = parse_count(args.notes)
+        if corpus is None:
+            corpus = os.path.join(workdir, "takeout")
+            generate_takeout(corpus, notes, attachment_ratio=args.attachment_ratio,
+                             min_chars=args.min_chars, max_chars=args.max_chars, seed=args.seed)
+        ctx = BenchContext(corpus, workdir, args.mock_latency, args.workers)
+        results = run_benchmarks(ctx, names, args.repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "corpus": args.corpus,
+            "notes": None if args.corpus else notes,
+            "attachment_ratio": args.attachment_ratio,
+            "mock_latency": args.mock_latency,
+            "workers": args.workers,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+def _cmd_compare(args) -> int:
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+
+    for key in ("notes", "attachment_ratio", "mock_latency", "workers"):
+        if base["meta"].get(key) != new["meta"].get(key):
+            print(f"Warning: '{key}' differs ({base['meta'].get(key)} vs {new['meta'].get(key)}); "
+                  "results may not be comparable.", file=sys.stderr)
+
+    rows = compare(base, new, args.threshold)
+    print(f"{'benchmark':30s} {'base/s':>12s} {'new/s':>12s} {'change':>8s}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['name']:30s} {row['base_items_per_second']:>12.1f} "
+              f"{row['new_items_per_second']:>12.1f} {row['change']:>+8.1%}{flag}")
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the shiori pipeline's hot paths.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the benchmarks and write a JSON report")
+    run.add_argument("--notes", default="1k", help="Synthetic corpus size, e.g. 1k, 100k, 1M")
+    run.add_argument("--corpus", help="Use an existing Takeout directory instead of generating one")
+    run.add_argument("--attachment-ratio", type=float, default=0.1)
+    run.add_argument("--min-chars", type=int, default=20)
+    run.add_argument("--max-chars", type=int, default=2000)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--mock-latency", type=float, default=0.0, help="Seconds added to every mock model/API call")
+    run.add_argument("--workers", type=int, default=4, help="Workers for the parallel benchmarks")
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--only", help="Comma-separated benchmark names")
+    run.add_argument("--output", "-o", help="Write the report here instead of stdout")
+    run.set_defaults(func=_cmd_run)
+
+    cmp = commands.add_parser("compare", help="Compare two reports and flag regressions")
+    cmp.add_argument("base")
+    cmp.add_argument("new")
+    cmp.add_argument("--threshold", type=float, default=0.1, help="Allowed throughput drop (0.1 = 10%%)")
+    cmp.set_defaults(func=_cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# benchmarks/takeout_generator.py
+
+"""
+Generates synthetic Google Keep Takeout directories for benchmarks.
+
+    python benchmarks/takeout_generator.py OUT_DIR --notes 100k --attachment-ratio 0.1
+
+Notes are written as Takeout-style JSON files (plus placeholder JPEG files
+for attachments), deterministically for a given seed, so runs on different
+commits read the same corpus.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from typing import Any, Dict, Optional
+
+COLORS = ["DEFAULT", "RED", "ORANGE", "YELLOW", "GREEN", "TEAL", "BLUE", "GRAY"]
+LABELS = ["work", "home", "ideas", "reading", "travel", "recipes", "todo"]
+
+ASCII_WORDS = (
+    "the of and to in is for on with as meeting notes idea project book read "
+    "list buy call review draft plan trip weekend budget code release design "
+    "recipe garden music follow up question answer deadline travel photo"
+).split()
+JA_WORDS = (
+    "今日 明日 会議 メモ アイデア 買い物 旅行 読書 予定 確認 連絡 資料 "
+    "レシピ 写真 映画 仕事 週末 家族 散歩 勉強 発表 締め切り 天気 料理"
+).split()
+
+# Smallest valid-looking JPEG header; the rest of the file is filler.
+JPEG_HEADER = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+
+def parse_count(value: str) -> int:
+    """Parses note counts such as '1000', '1k', '100k' or '1M'."""
+    value = value.strip()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:].lower(), 1)
+    number = value[:-1] if multiplier > 1 else value
+    return int(float(number) * multiplier)
+
+
+def _text(rng: random.Random, chars: int, ja_ratio: float) -> str:
+    words = JA_WORDS if rng.random() < ja_ratio else ASCII_WORDS
+    separator = "" if words is JA_WORDS else " "
+    parts, length = [], 0
+    while length < chars:
+        word = rng.choice(words)
+        parts.append(word)
+        length += len(word) + len(separator)
+    return separator.join(parts)[:chars]
+
+
+def make_note(rng: random.Random, index: int, min_chars: int, max_chars: int,
+              ja_ratio: float, attachment: Optional[str]) -> Dict[str, Any]:
+    """Builds one note in the Takeout JSON layout read by Subscription::GoogleKeep."""
+    # Sizes are skewed towards short notes, like real Keep exports.
+    span = max(0, max_chars - min_chars)
+    chars = min_chars + int(span * rng.random() ** 3)
+    created = 1_500_000_000_000_000 + index * 60_000_000 + rng.randrange(60_000_000)
+    note: Dict[str, Any] = {
+        "textContent": _text(rng, chars, ja_ratio),
+        "title": _text(rng, rng.randint(0, 40), ja_ratio) if rng.random() < 0.7 else "",
+        "createdTimestampUsec": created,
+        "lastModifiedTimestampUsec": created + rng.randrange(10**12),
+        "userEditedTimestampUsec": created,
+        "isArchived": rng.random() < 0.2,
+        "isPinned": rng.random() < 0.05,
+        "isTrashed": False,
+        "color": rng.choice(COLORS),
+    }
+    if rng.random() < 0.3:
+        note["labels"] = [{"name": name} for name in rng.sample(LABELS, rng.randint(1, 2))]
+    if attachment:
+        note["attachments"] = [{"filePath": attachment, "mimetype": "image/jpeg"}]
+    return note
+
+
+def generate_takeout(
+    path: str,
+    notes: int,
+    attachment_ratio: float = 0.1,
+    min_chars: int = 20,
+    max_chars: int = 2000,
+    ja_ratio: float = 0.5,
+    attachment_bytes: int = 2048,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Writes `notes` synthetic notes into `path` and returns a summary.
+
+    A fraction `attachment_ratio` of the notes reference an image file of
+    `attachment_bytes` bytes. Note lengths range from `min_chars` to
+    `max_chars`, and `ja_ratio` of them are written in Japanese.
+    Files are streamed one at a time, so memory use does not depend on `notes`.
+    """
+    os.makedirs(path, exist_ok=True)
+    rng = random.Random(seed)
+    filler = bytes(rng.getrandbits(8) for _ in range(max(0, attachment_bytes - len(JPEG_HEADER))))
+    total_bytes = attachments = 0
+
+    for i in range(notes):
+        attachment = None
+        if rng.random() < attachment_ratio:
+            attachment = f"image_{i:07d}.jpg"
+            with open(os.path.join(path, attachment), 'wb') as f:
+                f.write(JPEG_HEADER + filler)
+            attachments += 1
+            total_bytes += len(JPEG_HEADER) + len(filler)
+
+        note = make_note(rng, i, min_chars, max_chars, ja_ratio, attachment)
+        data = json.dumps(note, ensure_ascii=False).encode("utf-8")
+        with open(os.path.join(path, f"note_{i:07d}.json"), 'wb') as f:
+            f.write(data)
+        total_bytes += len(data)
+
+    return {"path": path, "notes": notes, "attachments": attachments, "bytes": total_bytes, "seed": seed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Google Keep Takeout directory.")
+    parser.add_argument("path", help="Output directory")
+    parser.add_argument("--notes", default="1k", help="Number of notes, e.g. 1k, 100k, 1M")
+    parser.add_argument("--attachment-ratio", type=float, default=0.1)
+    parser.add_argument("--min-chars", type=int, default=20)
+    parser.add_argument("--max-chars", type=int, default=2000)
+    parser.add_argument("--ja-ratio", type=float, default=0.5, help="Fraction of notes written in Japanese")
+    parser.add_argument("--attachment-bytes", type=int, default=2048)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    summary = generate_takeout(
+        args.path,
+        parse_count(args.notes),
+        attachment_ratio=args.attachment_ratio,
+        min_chars=args.min_chars,
+        max_chars=args.max_chars,
+        ja_ratio=args.ja_ratio,
+        attachment_bytes=args.attachment_bytes,
+        seed=args.seed,
+    )
+    json.dump(summary, sys.stdout)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+# src/core/async_runner.py
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from plugins.base import (
+    Entry,
+    SubscriptionPlugin, FilterPlugin, PublishPlugin,
+    AsyncSubscriptionPlugin, AsyncFilterPlugin, AsyncPublishPlugin,
+)
+from core.checkpoint import Checkpointer
+from core.dead_letter import DeadLetterQueue, publisher_consumer
+from core.metrics import PipelineMetrics, StageMetrics, instrument, measure_consumer
+
+# Marks the end of a stage's output stream.
+_DONE = object()
+
+
+class _Cancelled(Exception):
+    """Raised inside bridge threads when the pipeline is being torn down."""
+
+
+class _ThreadBridge:
+    """
+    Lets synchronous plugins, running in worker threads, read from and write
+    to the asyncio queues that connect the pipeline stages.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.cancelled = threading.Event()
+
+    def _wait(self, coro) -> Any:
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except concurrent.futures.TimeoutError:
+                if self.cancelled.is_set():
+                    future.cancel()
+                    raise _Cancelled()
+
+    def put(self, queue: asyncio.Queue, item: Any):
+        self._wait(queue.put(item))
+
+    def iterate(self, queue: asyncio.Queue) -> Iterator[Entry]:
+        while True:
+            item = self._wait(queue.get())
+            if item is _DONE:
+                return
+            yield item
+
+
+async def _iterate(queue: asyncio.Queue) -> AsyncIterator[Entry]:
+    while True:
+        item = await queue.get()
+        if item is _DONE:
+            return
+        yield item
+
+
+def _first_error(error: BaseException) -> BaseException:
+    """Finds the first non-cancellation error inside (nested) exception groups."""
+    if isinstance(error, BaseExceptionGroup):
+        found = [_first_error(e) for e in error.exceptions]
+        real = [e for e in found if not isinstance(e, _Cancelled)]
+        return (real or found)[0]
+    return error
+
+
+class AsyncPipelineRunner:
+    """
+    Runs a linear Subscription -> Filter -> Publish pipeline on asyncio.
+
+    Every stage runs concurrently and stages are connected by bounded queues,
+    so wall time approaches that of the slowest stage rather than the sum of
+    all of them. Async filters keep up to their `concurrency` entries in
+    flight. Synchronous plugins are adapted automatically by running them in
+    worker threads that exchange entries with the event loop.
+    Per-stage metrics, including the depth of each stage's output queue, are
+    recorded in `metrics`, commits are tracked by `checkpointer` and failed
+    entries sent to `dead_letters` if given (async publishers excepted).
+    """
+    def __init__(self, subscriptions: List, filters: List, publishers: List, queue_size: int = 100,
+                 metrics: Optional[PipelineMetrics] = None, checkpointer: Optional[Checkpointer] = None,
+                 dead_letters: Optional[DeadLetterQueue] = None):
+        self.subscriptions = subscriptions
+        self.filters = filters
+        self.publishers = publishers
+        self.queue_size = max(1, queue_size)
+        self.metrics = metrics or PipelineMetrics()
+        self.checkpointer = checkpointer
+        self.dead_letters = dead_letters
+        self._stages: Dict[int, StageMetrics] = {}
+        for kind, plugins in (("subscription", subscriptions), ("filter", filters), ("publish", publishers)):
+            for plugin in plugins:
+                self._stages[id(plugin)] = self.metrics.stage(plugin.name, kind)
+
+    def _queue(self) -> asyncio.Queue:
+        return asyncio.Queue(maxsize=self.queue_size)
+
+    async def _in_thread(self, fn, *args):
+        return await self.loop.run_in_executor(self.executor, fn, *args)
+
+    async def _emit(self, stage: StageMetrics, out_q: asyncio.Queue, entry: Entry):
+        await out_q.put(entry)
+        stage.entries += 1
+        stage.observe_queue(out_q.qsize())
+
+    def _emit_from_thread(self, stage: StageMetrics, out_q: asyncio.Queue, entry: Entry):
+        self.bridge.put(out_q, entry)
+        stage.observe_queue(out_q.qsize())
+
+    def _metered_input(self, stage: StageMetrics, in_q: asyncio.Queue):
+        """Reads a queue from a thread, recording the wait as `stage`'s upstream time."""
+        inbound = StageMetrics(f"{stage.name}:input", "queue")
+        return instrument(self.bridge.iterate(in_q), inbound), [inbound]
+
+    # --- Stages ---
+
+    async def _run_subscription(self, plugin, out_q: asyncio.Queue):
+        stage = self._stages[id(plugin)]
+        checkpointer = self.checkpointer
+        if isinstance(plugin, AsyncSubscriptionPlugin):
+            async for entry in plugin.execute():
+                if checkpointer is None or checkpointer.admit(plugin.name, entry):
+                    await self._emit(stage, out_q, entry)
+        else:
+            def pump():
+                entries = plugin.execute()
+                if checkpointer is not None:
+                    entries = checkpointer.track(plugin.name, entries)
+                for entry in instrument(entries, stage):
+                    self._emit_from_thread(stage, out_q, entry)
+            await self._in_thread(pump)
+
+    async def _run_sources(self, out_q: asyncio.Queue):
+        async with asyncio.TaskGroup() as group:
+            for plugin in self.subscriptions:
+                group.create_task(self._run_subscription(plugin, out_q))
+        await out_q.put(_DONE)
+
+    async def _timed(self, stage: StageMetrics, process, entry: Entry):
+        started = time.perf_counter()
+        try:
+            return await process(entry)
+        except Exception:
+            stage.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stage.latency.observe(elapsed)
+            stage.busy_seconds += elapsed
+
+    async def _run_filter(self, plugin, in_q: asyncio.Queue, out_q: asyncio.Queue):
+        stage = self._stages[id(plugin)]
+        if isinstance(plugin, AsyncFilterPlugin):
+            # An ordered window of in-flight tasks: keeps up to `concurrency`
+            # entries processing while emitting results in input order.
+            window: deque = deque()
+            concurrency = max(1, plugin.concurrency)
+            reject = self.dead_letters.rejecter(plugin.name, "filter") if self.dead_letters else None
+
+            async def result_of(entry: Entry, task: asyncio.Future) -> Optional[Entry]:
+                if reject is None:
+                    return await task
+                try:
+                    return await task
+                except Exception as e:
+                    reject(entry, e)
+                    return None
+
+            try:
+                async for entry in _iterate(in_q):
+                    window.append((entry, asyncio.ensure_future(self._timed(stage, plugin.process, entry))))
+                    if len(window) >= concurrency:
+                        result = await result_of(*window.popleft())
+                        if result is not None:
+                            await self._emit(stage, out_q, result)
+                while window:
+                    result = await result_of(*window.popleft())
+                    if result is not None:
+                        await self._emit(stage, out_q, result)
+            finally:
+                for _, task in window:
+                    task.cancel()
+        else:
+            def pump():
+                entries, upstream = self._metered_input(stage, in_q)
+                if self.dead_letters is not None:
+                    output = self.dead_letters.filter(plugin, entries)
+                else:
+                    output = plugin.execute(entries)
+                for entry in instrument(output, stage, upstream):
+                    self._emit_from_thread(stage, out_q, entry)
+            await self._in_thread(pump)
+        await out_q.put(_DONE)
+
+    async def _run_publisher(self, plugin, in_q: asyncio.Queue):
+        stage = self._stages[id(plugin)]
+        finished = False
+
+        async def read_async():
+            nonlocal finished
+            async for entry in _iterate(in_q):
+                stage.entries += 1
+                yield entry
+            finished = True
+
+        def read_sync():
+            nonlocal finished
+            yield from self.bridge.iterate(in_q)
+            finished = True
+
+        checkpointer = self.checkpointer
+        if isinstance(plugin, AsyncPublishPlugin):
+            entries = read_async()
+            if checkpointer is not None:
+                entries = checkpointer.async_publisher_input(plugin, entries)
+            await plugin.execute(entries)
+        else:
+            consume = publisher_consumer(plugin, checkpointer, self.dead_letters)
+            await self._in_thread(measure_consumer, consume, read_sync(), stage)
+        # Drain anything the publisher did not read, so upstream never blocks.
+        if not finished:
+            await self._drain(in_q)
+
+    async def _broadcast(self, in_q: asyncio.Queue, out_qs: List[asyncio.Queue]):
+        async for entry in _iterate(in_q):
+            for out_q in out_qs:
+                await out_q.put(entry)
+        for out_q in out_qs:
+            await out_q.put(_DONE)
+
+    async def _drain(self, in_q: asyncio.Queue):
+        async for _ in _iterate(in_q):
+            pass
+
+    # --- Entry point ---
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.bridge = _ThreadBridge(self.loop)
+        sync_stages = sum(
+            1 for plugin in (*self.subscriptions, *self.filters, *self.publishers)
+            if isinstance(plugin, (SubscriptionPlugin, FilterPlugin, PublishPlugin))
+        )
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, sync_stages), thread_name_prefix="sync-stage"
+        )
+        try:
+            async with asyncio.TaskGroup() as group:
+                stream = self._queue()
+                group.create_task(self._run_sources(stream))
+
+                for plugin in self.filters:
+                    out_q = self._queue()
+                    group.create_task(self._run_filter(plugin, stream, out_q))
+                    stream = out_q
+
+                if not self.publishers:
+                    group.create_task(self._drain(stream))
+                elif len(self.publishers) == 1:
+                    group.create_task(self._run_publisher(self.publishers[0], stream))
+                else:
+                    publisher_qs = [self._queue() for _ in self.publishers]
+                    group.create_task(self._broadcast(stream, publisher_qs))
+                    for plugin, queue in zip(self.publishers, publisher_qs):
+                        group.create_task(self._run_publisher(plugin, queue))
+        except BaseExceptionGroup as group_error:
+            # Surface the first real failure rather than the group wrapper.
+            raise _first_error(group_error)
+        finally:
+            self.bridge.cancelled.set()
+            self.executor.shutdown(wait=True)
+
+
+def run_async_pipeline(subscriptions: List, filters: List, publishers: List, queue_size: int = 100,
+                       metrics: Optional[PipelineMetrics] = None, checkpointer: Optional[Checkpointer] = None,
+                       dead_letters: Optional[DeadLetterQueue] = None):
+    """Runs the pipeline to completion on a fresh event loop."""
+    asyncio.run(AsyncPipelineRunner(subscriptions, filters, publishers, queue_size, metrics,
+                                    checkpointer, dead_letters).run())
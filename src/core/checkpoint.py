@@ -0,0 +1,364 @@
+# src/core/checkpoint.py
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from plugins.base import Entry, PublishPlugin
+
+logger = logging.getLogger(__name__)
+
+def entry_version(entry: Entry) -> str:
+    """
+    The version of an entry that commits are recorded at: the content hash
+    its subscription put in `metadata["content_hash"]`, or else a hash of its
+    content, so a subscription can tell an edited item from a committed one.
+    """
+    if entry.is_tombstone:
+        return "deleted"
+    version = entry.metadata.get("content_hash")
+    if version:
+        return str(version)
+    return hashlib.sha256((entry.content or "").encode("utf-8", "replace")).hexdigest()
+
+class CheckpointStore:
+    """
+    Durable record of which entry IDs each publisher has committed, and at
+    which version, per subscription, for the current (possibly interrupted)
+    run.
+
+    Commits are buffered in memory and written to SQLite in one transaction
+    every `flush_every` IDs or `flush_interval` seconds, so a crash loses at
+    most one batch of progress without paying an fsync per entry.
+    """
+    def __init__(self, path: str, flush_every: int = 500, flush_interval: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.flushes = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS commits ("
+            " subscription TEXT NOT NULL, publisher TEXT NOT NULL, entry_id TEXT NOT NULL,"
+            " version TEXT NOT NULL DEFAULT '',"
+            " PRIMARY KEY (subscription, publisher, entry_id)) WITHOUT ROWID"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(commits)")}
+        if "version" not in columns:
+            # Written before versions were recorded: those entries are processed again.
+            self._conn.execute("ALTER TABLE commits ADD COLUMN version TEXT NOT NULL DEFAULT ''")
+        self._conn.commit()
+        self._buffer: List[Tuple[str, str, str, str]] = []
+        self._last_flush = clock()
+
+    def load(self) -> Dict[Tuple[str, str], Dict[str, str]]:
+        """Returns the committed {ID: version} of the previous run, keyed by (subscription, publisher)."""
+        committed: Dict[Tuple[str, str], Dict[str, str]] = defaultdict(dict)
+        with self._lock:
+            for subscription, publisher, entry_id, version in self._conn.execute(
+                "SELECT subscription, publisher, entry_id, version FROM commits"
+            ):
+                committed[(subscription, publisher)][entry_id] = version
+        return committed
+
+    def commit(self, subscription: str, publisher: str, commits: Iterable[Tuple[str, str]]):
+        """Records (entry ID, version) pairs as committed by `publisher`."""
+        with self._lock:
+            self._buffer.extend((subscription, publisher, entry_id, version) for entry_id, version in commits)
+            if (len(self._buffer) >= self.flush_every
+                    or self.clock() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = self.clock()
+        if not self._buffer:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO commits (subscription, publisher, entry_id, version) VALUES (?, ?, ?, ?)",
+                self._buffer,
+            )
+        self._buffer = []
+        self.flushes += 1
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def clear(self):
+        """Forgets all progress; called once a run has completed."""
+        with self._lock:
+            self._buffer = []
+            with self._conn:
+                self._conn.execute("DELETE FROM commits")
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+
+class _Origin:
+    """An admitted entry that some publisher has not committed yet."""
+    __slots__ = ("subscription", "version", "pending", "outstanding", "open")
+
+    def __init__(self, subscription: str, version: str, publishers: Iterable[str]):
+        self.subscription = subscription
+        self.version = version
+        # Publishers yet to commit the entry (or everything derived from it).
+        self.pending: Set[str] = set(publishers)
+        # Per publisher fed from this origin: entries it has not committed yet.
+        self.outstanding: Dict[str, int] = {}
+        # Publishers that may still be fed entries derived from this origin.
+        self.open: Set[str] = set()
+
+
+class Checkpointer:
+    """
+    Connects a CheckpointStore to the pipeline stages of one run.
+
+    Commits are recorded per (entry ID, version), the version being the
+    content hash of the entry as its subscription emitted it (see
+    `entry_version`): an entry edited since the interrupted run is processed
+    again. Entries every publisher already committed at that version are
+    dropped right after their subscription, before any filter runs; entries
+    only some publishers committed are still skipped by those publishers.
+
+    Entries a filter derives from another (chunks, with `parent_id`) are
+    accounted to the entry they came from: it counts as committed by a
+    publisher once everything derived from it was. Entries a filter drops
+    count as committed once the publisher's stream ends without them.
+    Publishers that set `commits_explicitly` report durable writes through
+    `PublishPlugin.commit`; for the others, an entry counts as committed once
+    the publisher asks for the next one (or returns).
+    """
+    def __init__(self, store: CheckpointStore, publishers: List[PublishPlugin]):
+        self.store = store
+        # Publishers are keyed by name, numbered if the same plugin is used twice.
+        self._keys: Dict[int, str] = {}
+        counts: Dict[str, int] = defaultdict(int)
+        for publisher in publishers:
+            counts[publisher.name] += 1
+            n = counts[publisher.name]
+            self._keys[id(publisher)] = publisher.name if n == 1 else f"{publisher.name}#{n}"
+        self.publishers = list(self._keys.values())
+        self.previous = store.load()
+        self.skipped = 0
+        self._lock = threading.Lock()
+        # In-flight entry ID -> where it came from and who has yet to commit it.
+        self._origins: Dict[str, _Origin] = {}
+        # (publisher, derived entry ID) -> ID of the entry it was derived from.
+        self._derived: Dict[Tuple[str, str], str] = {}
+        if self.previous:
+            resumable = sum(len(ids) for ids in self.previous.values())
+            logger.info("Resuming from checkpoint %s (%d commits recorded).", store.path, resumable)
+
+    # --- Subscription side ---
+
+    def is_committed(self, subscription: str, entry_id: str, version: Optional[str] = None) -> bool:
+        """
+        True if every publisher committed the entry in the interrupted run,
+        at `version` if given (at any version otherwise).
+        """
+        if not self.publishers:
+            return False
+        for publisher in self.publishers:
+            committed = self.previous.get((subscription, publisher), {}).get(entry_id)
+            if committed is None or (version is not None and committed != version):
+                return False
+        return True
+
+    def admit(self, subscription: str, entry: Entry) -> bool:
+        """Records where an entry came from; False if it can be skipped entirely."""
+        version = entry_version(entry)
+        if self.is_committed(subscription, entry.id, version):
+            self.skipped += 1
+            return False
+        with self._lock:
+            self._origins[entry.id] = _Origin(subscription, version, self.publishers)
+        return True
+
+    def track(self, subscription: str, entries: Iterator[Entry]) -> Iterator[Entry]:
+        for entry in entries:
+            if self.admit(subscription, entry):
+                yield entry
+
+    # --- Publisher side ---
+
+    def _root(self, publisher: str, entry_id: str) -> Optional[str]:
+        """The admitted entry `entry_id` is or was derived from, if still in flight."""
+        root = self._derived.get((publisher, entry_id))
+        if root is None and entry_id in self._origins:
+            root = entry_id
+        return root
+
+    def _finish(self, root: str, publisher: str):
+        """Records that a publisher is done with an admitted entry."""
+        origin = self._origins.get(root)
+        if origin is None or publisher not in origin.pending:
+            return
+        origin.pending.discard(publisher)
+        origin.outstanding.pop(publisher, None)
+        origin.open.discard(publisher)
+        self.store.commit(origin.subscription, publisher, [(root, origin.version)])
+        if not origin.pending:
+            del self._origins[root]
+
+    def _close(self, root: str, publisher: str):
+        """Notes that a publisher will be fed nothing more derived from `root`."""
+        origin = self._origins.get(root)
+        if origin is None:
+            return
+        origin.open.discard(publisher)
+        if not origin.outstanding.get(publisher):
+            self._finish(root, publisher)
+
+    def _fed(self, publisher: str, entry: Entry, last: Optional[str]) -> Optional[str]:
+        """Accounts an entry fed to a publisher to its origin; returns that origin's ID."""
+        with self._lock:
+            root = entry.id if entry.id in self._origins else None
+            parent = entry.metadata.get("parent_id")
+            if root is None and parent in self._origins:
+                root = parent
+                self._derived[(publisher, entry.id)] = root
+            if last is not None and root != last:
+                # Filters emit what they derive from one entry together.
+                self._close(last, publisher)
+            if root is not None:
+                origin = self._origins[root]
+                origin.outstanding[publisher] = origin.outstanding.get(publisher, 0) + 1
+                origin.open.add(publisher)
+        return root
+
+    def _ended(self, publisher: str, last: Optional[str]):
+        """Called once a publisher's stream is exhausted: what never reached it was dropped."""
+        with self._lock:
+            if last is not None:
+                self._close(last, publisher)
+            dropped = [root for root, origin in self._origins.items()
+                       if publisher in origin.pending and publisher not in origin.outstanding]
+            for root in dropped:
+                self._finish(root, publisher)
+
+    def _feed(self, publisher: str, entries: Iterator[Entry]) -> Iterator[Entry]:
+        last: Optional[str] = None
+        for entry in entries:
+            last = self._fed(publisher, entry, last)
+            yield entry
+        self._ended(publisher, last)
+
+    def wants(self, publisher: str, entry: Entry) -> bool:
+        """False if this publisher already committed the entry in the interrupted run."""
+        with self._lock:
+            root = self._root(publisher, entry.id)
+            origin = self._origins.get(root) if root is not None else None
+            if origin is None or self.previous.get((origin.subscription, publisher), {}).get(root) != origin.version:
+                return True
+        self.commit(publisher, [entry.id])
+        return False
+
+    def commit(self, publisher: str, entry_ids: Iterable[str]):
+        with self._lock:
+            for entry_id in entry_ids:
+                root = self._derived.pop((publisher, entry_id), None)
+                if root is None and entry_id in self._origins:
+                    root = entry_id
+                origin = self._origins.get(root) if root is not None else None
+                if origin is None:
+                    continue  # Not from a subscription, or already accounted for.
+                left = origin.outstanding.get(publisher, 0) - 1
+                origin.outstanding[publisher] = max(0, left)
+                if left <= 0 and publisher not in origin.open:
+                    self._finish(root, publisher)
+
+    def skip(self, publisher: PublishPlugin, entry_ids: Iterable[str]):
+        """Records entries a publisher will never receive (routed to other branches) as done."""
+        name = self._keys[id(publisher)]
+        with self._lock:
+            for entry_id in entry_ids:
+                origin = self._origins.get(entry_id)
+                if origin is not None and name not in origin.outstanding:
+                    self._finish(entry_id, name)
+
+    def publisher_input(self, publisher: PublishPlugin, entries: Iterator[Entry]) -> Iterator[Entry]:
+        """Feeds a publisher, skipping its committed entries and tracking new commits."""
+        name = self._keys[id(publisher)]
+        if publisher.commits_explicitly:
+            publisher.on_commit = lambda entry_ids: self.commit(name, entry_ids)
+            for entry in entries:
+                if self.wants(name, entry):
+                    yield entry
+            return
+
+        previous: Optional[str] = None
+        for entry in entries:
+            if not self.wants(name, entry):
+                continue
+            if previous is not None:
+                self.commit(name, [previous])
+            previous = entry.id
+            yield entry
+        # Reached only once the publisher asked past the last entry.
+        if previous is not None:
+            self.commit(name, [previous])
+
+    async def async_publisher_input(self, publisher, entries: AsyncIterator[Entry]) -> AsyncIterator[Entry]:
+        """The `publisher_input` counterpart for async publishers (always implicit commits)."""
+        name = self._keys[id(publisher)]
+        last: Optional[str] = None
+        previous: Optional[str] = None
+        async for entry in entries:
+            last = self._fed(name, entry, last)
+            if not self.wants(name, entry):
+                continue
+            if previous is not None:
+                self.commit(name, [previous])
+            previous = entry.id
+            yield entry
+        if previous is not None:
+            self.commit(name, [previous])
+        self._ended(name, last)
+
+    def consumer(self, publisher: PublishPlugin) -> Callable[[Iterator[Entry]], Any]:
+        """Returns `publisher.execute` wrapped with `publisher_input`."""
+        return lambda entries: publisher.execute(self.publisher_input(publisher, entries))
+
+    def feeder(self, publisher: PublishPlugin, consume: Callable[[Iterator[Entry]], Any]) -> Callable[[Iterator[Entry]], Any]:
+        """
+        Wraps the outermost `consume` of a publisher (outside dead-letter
+        retries, which feed it parts of the stream again), so that what
+        reaches the publisher is accounted to the entries it came from.
+        """
+        name = self._keys[id(publisher)]
+        return lambda entries: consume(self._feed(name, entries))
+
+    def complete(self):
+        """Marks the run as finished: the next run starts from scratch."""
+        if self.skipped:
+            logger.info("Checkpoint: skipped %d entries committed by an earlier run.", self.skipped)
+        self.store.clear()
+
+
+def open_checkpointer(config: Optional[Dict], publishers: List[PublishPlugin]) -> Optional[Checkpointer]:
+    """Builds a Checkpointer from global.checkpoint, or None if checkpoints are off."""
+    if not config or not config.get("path"):
+        return None
+    store = CheckpointStore(
+        config["path"],
+        flush_every=int(config.get("flush_every", 500)),
+        flush_interval=float(config.get("flush_interval", 5.0)),
+    )
+    return Checkpointer(store, publishers)
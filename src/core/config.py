@@ -0,0 +1,181 @@
+# src/core/config.py
+
+from typing import Any, Dict, List
+
+from plugins.registry import resolve
+
+LOG_LEVELS = ("debug", "info", "warning", "error", "critical")
+EXECUTION_MODES = ("sync", "async", "sharded")
+SLOW_SINK_POLICIES = ("block", "spill")
+PREDICATE_KEYS = ("source", "metadata")
+
+def load_config(path: str) -> Dict[str, Any]:
+    """Reads rag.yaml. Raises OSError or ValueError if it cannot be used."""
+    import yaml  # only needed once a config is actually read
+
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            config = yaml.safe_load(f)
+        except yaml.YAMLError as e:
+            raise ValueError(f"Cannot parse {path}: {e}") from e
+    if config is None:
+        return {}
+    if not isinstance(config, dict):
+        raise ValueError(f"{path} must contain a mapping at the top level.")
+    return config
+
+
+def _section(config: Dict[str, Any], key: str, where: str, errors: List[str]) -> Dict[str, Any]:
+    value = config.get(key)
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        errors.append(f"{where}.{key}: must be a mapping.")
+        return {}
+    return value
+
+
+def validate_config(config: Dict[str, Any]) -> List[str]:
+    """
+    Checks a parsed rag.yaml and returns a list of problems (empty if valid).
+
+    Plugins are looked up in the registry but never imported, so this is
+    fast and works without the SDKs the plugins depend on.
+    """
+    errors: List[str] = []
+    global_config = _section(config, "global", "rag.yaml", errors)
+
+    execution = global_config.get("execution", "sync")
+    if execution not in EXECUTION_MODES:
+        errors.append(f"global.execution: '{execution}' is not one of {', '.join(EXECUTION_MODES)}.")
+    log_level = str(global_config.get("log_level", "info")).lower()
+    if log_level not in LOG_LEVELS:
+        errors.append(f"global.log_level: '{log_level}' is not one of {', '.join(LOG_LEVELS)}.")
+    fanout = _section(global_config, "fanout", "global", errors)
+    policy = fanout.get("on_slow_sink", "block")
+    if policy not in SLOW_SINK_POLICIES:
+        errors.append(f"global.fanout.on_slow_sink: '{policy}' is not one of {', '.join(SLOW_SINK_POLICIES)}.")
+    _section(global_config, "async", "global", errors)
+    sharded = _section(global_config, "sharded", "global", errors)
+    if sharded.get("start_method", "spawn") not in ("spawn", "fork", "forkserver"):
+        errors.append(f"global.sharded.start_method: '{sharded['start_method']}' is not one of spawn, fork, forkserver.")
+    _section(global_config, "metrics", "global", errors)
+    _section(global_config, "checkpoint", "global", errors)
+    _section(global_config, "routing", "global", errors)
+    dead_letter = _section(global_config, "dead_letter", "global", errors)
+    for key, upper in (("max_failures", None), ("max_failure_rate", 1), ("min_entries", None)):
+        value = dead_letter.get(key)
+        if value is None:
+            continue
+        if (isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0
+                or (upper is not None and value > upper)):
+            bounds = f"between 0 and {upper}" if upper is not None else "0 or more"
+            errors.append(f"global.dead_letter.{key}: must be a number {bounds}.")
+
+    plugins = config.get("plugins")
+    if not isinstance(plugins, list) or not plugins:
+        errors.append("plugins: must be a non-empty list.")
+        return errors
+
+    kinds = _validate_plugins(plugins, "plugins", errors)
+    if "subscription" not in kinds:
+        errors.append("plugins: at least one Subscription:: plugin is required.")
+
+    branches = config.get("branches")
+    if branches is not None:
+        if execution != "sync":
+            errors.append("branches: only run with global.execution: sync.")
+        _validate_branches(branches, "branches", errors, set())
+    return errors
+
+
+def _validate_plugins(plugins: List[Any], where_list: str, errors: List[str]) -> List[str]:
+    """Checks a list of plugin configs; returns the kinds of the valid ones."""
+    kinds = []
+    for i, plugin_config in enumerate(plugins):
+        where = f"{where_list}[{i}]"
+        if not isinstance(plugin_config, dict):
+            errors.append(f"{where}: must be a mapping with a 'module' key.")
+            continue
+        module_str = plugin_config.get("module")
+        if not module_str:
+            errors.append(f"{where}: missing 'module'.")
+            continue
+        where = f"{where} ({module_str})"
+        try:
+            spec = resolve(module_str)
+        except ValueError as e:
+            errors.append(f"{where}: {e}")
+            continue
+        if spec.kind is None:
+            errors.append(f"{where}: the name must start with Subscription::, Filter:: or Publish::.")
+        else:
+            kinds.append(spec.kind)
+
+        plugin_options = plugin_config.get("config") or {}
+        if not isinstance(plugin_options, dict):
+            errors.append(f"{where}.config: must be a mapping.")
+            continue
+        for key in spec.required:
+            if plugin_options.get(key) in (None, ""):
+                errors.append(f"{where}.config: missing required '{key}'.")
+    return kinds
+
+
+def _validate_when(when: Any, where: str, errors: List[str]):
+    if not isinstance(when, dict):
+        errors.append(f"{where}: must be a mapping.")
+        return
+    unknown = sorted(set(when) - set(PREDICATE_KEYS))
+    if unknown:
+        errors.append(f"{where}: unknown keys {', '.join(map(str, unknown))}; use {', '.join(PREDICATE_KEYS)}.")
+    source = when.get("source")
+    if source is not None and not (isinstance(source, str) or (
+            isinstance(source, list) and source and all(isinstance(s, str) for s in source))):
+        errors.append(f"{where}.source: must be a subscription name or a list of them.")
+    metadata = when.get("metadata")
+    if metadata is None:
+        return
+    if not isinstance(metadata, dict):
+        errors.append(f"{where}.metadata: must be a mapping of metadata keys to values.")
+        return
+    for key, expected in metadata.items():
+        if isinstance(expected, dict) and (set(expected) != {"exists"} or not isinstance(expected["exists"], bool)):
+            errors.append(f"{where}.metadata.{key}: a mapping must be {{exists: true}} or {{exists: false}}.")
+
+
+def _validate_branches(branches: Any, where_list: str, errors: List[str], names: set):
+    """Checks a `branches:` list and, recursively, the branches inside it."""
+    if not isinstance(branches, list) or not branches:
+        errors.append(f"{where_list}: must be a non-empty list.")
+        return
+    for i, branch in enumerate(branches):
+        where = f"{where_list}[{i}]"
+        if not isinstance(branch, dict):
+            errors.append(f"{where}: must be a mapping with 'name' and 'plugins' keys.")
+            continue
+        name = branch.get("name")
+        if not name or not isinstance(name, str):
+            errors.append(f"{where}: missing 'name'.")
+        elif name in names:
+            errors.append(f"{where}: the branch name '{name}' is used twice.")
+        else:
+            names.add(name)
+            where = f"{where} ({name})"
+        unknown = sorted(set(branch) - {"name", "when", "plugins", "branches"})
+        if unknown:
+            errors.append(f"{where}: unknown keys {', '.join(map(str, unknown))}.")
+        if branch.get("when") is not None:
+            _validate_when(branch["when"], f"{where}.when", errors)
+
+        plugins = branch.get("plugins")
+        if plugins is not None and not isinstance(plugins, list):
+            errors.append(f"{where}.plugins: must be a list.")
+        elif plugins:
+            kinds = _validate_plugins(plugins, f"{where}.plugins", errors)
+            if "subscription" in kinds:
+                errors.append(f"{where}.plugins: branches take Filter:: and Publish:: plugins only.")
+        if branch.get("branches") is not None:
+            _validate_branches(branch["branches"], f"{where}.branches", errors, names)
+        elif not plugins:
+            errors.append(f"{where}: needs 'plugins' or 'branches'.")
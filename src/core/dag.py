@@ -0,0 +1,386 @@
+# src/core/dag.py
+
+"""
+Branches of the pipeline graph (`branches:` in rag.yaml).
+
+The `plugins:` list is the trunk. Entries leaving the trunk filters go to
+the trunk publishers and to every branch whose `when:` predicate they
+match. A branch has its own filters and publishers, and may branch again,
+so each entry only goes through the stages of the branches it is routed
+to. Branches run concurrently, each on its own thread, and are fed through
+bounded SinkChannels: a slow branch holds back (or spills) the node it
+hangs from instead of buffering without limit.
+
+With a route store (`global.routing`), the IDs sent down each branch are
+kept between runs: an entry of a branch's sources that no longer matches
+its metadata condition, but was routed there before, is sent down that
+branch as a tombstone, so that the copy published while it still matched
+does not linger there. Without it, such copies are left in place.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from plugins.base import Entry, PublishPlugin, TOMBSTONE_KEY
+from plugins.registry import create_plugin, resolve
+from core.checkpoint import Checkpointer
+from core.dead_letter import DeadLetterQueue, publisher_consumer
+from core.fanout import SinkChannel
+from core.metrics import PipelineMetrics, StageMetrics, measure_consumer
+from core.sync_runner import apply_filters, publish
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+def _is_empty(value: Any) -> bool:
+    return value is _MISSING or value is None or (isinstance(value, (str, list, tuple, dict, set)) and not value)
+
+
+def _value_matcher(expected: Any) -> Callable[[Any], bool]:
+    """Turns one `when.metadata` condition into a test of the metadata value."""
+    if isinstance(expected, dict):
+        # {exists: true}: present and not empty; {exists: false}: the opposite.
+        exists = bool(expected.get("exists", True))
+        return lambda value: _is_empty(value) != exists
+    allowed = expected if isinstance(expected, list) else [expected]
+
+    def match(value: Any) -> bool:
+        if isinstance(value, (list, tuple, set)):  # e.g. llm_tags: any of them
+            return any(item in allowed for item in value)
+        return value is not _MISSING and value in allowed
+    return match
+
+
+class Predicate:
+    """
+    A branch's `when:` condition. `source` is a subscription name or a list
+    of them; each `metadata` key must hold the given value, one of a list of
+    values, or (`{exists: true}`) anything not empty. An empty condition
+    matches every entry.
+
+    Tombstones are only matched on `source`: the deletion of an entry must
+    reach every publisher it may have been published to. For the same
+    reason, `withdraws` tells which entries of the branch's sources fail
+    its metadata condition: they may have matched on an earlier run (see
+    RouteStore).
+    """
+    def __init__(self, when: Optional[Dict[str, Any]] = None):
+        when = when or {}
+        sources = when.get("source")
+        self.sources: Optional[Set[str]] = None
+        if sources is not None:
+            self.sources = set(sources) if isinstance(sources, list) else {sources}
+        self.metadata = [(key, _value_matcher(expected)) for key, expected in (when.get("metadata") or {}).items()]
+
+    def _matches_metadata(self, entry: Entry) -> bool:
+        metadata = entry.metadata
+        return all(match(metadata.get(key, _MISSING)) for key, match in self.metadata)
+
+    def __call__(self, entry: Entry) -> bool:
+        if self.sources is not None and entry.source not in self.sources:
+            return False
+        return entry.is_tombstone or self._matches_metadata(entry)
+
+    def withdraws(self, entry: Entry) -> bool:
+        """True for a live entry of the right source that the metadata condition rejects."""
+        return (bool(self.metadata) and not entry.is_tombstone
+                and (self.sources is None or entry.source in self.sources)
+                and not self._matches_metadata(entry))
+
+
+class Branch:
+    """The filters, publishers and sub-branches that the entries matching `when` go through."""
+    def __init__(self, name: str, when: Optional[Dict[str, Any]] = None, filters: Sequence = (),
+                 publishers: Sequence = (), branches: Sequence["Branch"] = ()):
+        self.name = name
+        self.when = Predicate(when)
+        self.filters = list(filters)
+        self.publishers = list(publishers)
+        self.branches = list(branches)
+
+    def plugins(self) -> Tuple[List, List]:
+        """The filters and publishers of this branch and its sub-branches, depth first."""
+        return flatten([self])
+
+
+def flatten(branches: Sequence[Branch]) -> Tuple[List, List]:
+    """All filters and all publishers of `branches`, depth first."""
+    filters: List = []
+    publishers: List = []
+    for branch in branches:
+        sub_filters, sub_publishers = flatten(branch.branches)
+        filters += branch.filters + sub_filters
+        publishers += branch.publishers + sub_publishers
+    return filters, publishers
+
+
+def build_branches(configs: Optional[List[Dict[str, Any]]],
+                   create: Callable[[Dict[str, Any]], Any] = create_plugin) -> List[Branch]:
+    """Instantiates the plugins of a validated `branches:` list."""
+    branches = []
+    for config in configs or []:
+        filters, publishers = [], []
+        for plugin_config in config.get("plugins") or []:
+            kind = resolve(plugin_config["module"]).kind
+            (filters if kind == "filter" else publishers).append(create(plugin_config))
+        branches.append(Branch(config["name"], config.get("when"), filters, publishers,
+                               build_branches(config.get("branches"), create)))
+    return branches
+
+
+class RouteStore:
+    """
+    Durable record of the entry IDs routed down each branch, kept between
+    runs, so that only entries a branch actually received are withdrawn
+    from it.
+
+    Routed IDs are buffered and written every `flush_every` IDs, and on
+    `close` even if the run failed: at worst, a later withdrawal sends a
+    tombstone for an entry that never got published. IDs withdrawn (or
+    deleted) are only forgotten by `complete`, so a failed run withdraws
+    them again.
+    """
+    def __init__(self, path: str, flush_every: int = 1000):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS routes ("
+            " branch TEXT NOT NULL, entry_id TEXT NOT NULL,"
+            " PRIMARY KEY (branch, entry_id)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self._routed: List[Tuple[str, str]] = []
+        self._withdrawn: Set[Tuple[str, str]] = set()
+
+    def route(self, branch: str, entry_id: str):
+        """Records that an entry was sent down `branch`."""
+        with self._lock:
+            self._withdrawn.discard((branch, entry_id))
+            self._routed.append((branch, entry_id))
+            if len(self._routed) >= self.flush_every:
+                self._flush_locked()
+
+    def withdraw(self, branch: str, entry_id: str) -> bool:
+        """
+        True if an entry was routed down `branch` and not withdrawn since:
+        it is then recorded as withdrawn.
+        """
+        key = (branch, entry_id)
+        with self._lock:
+            if key in self._withdrawn:
+                return False
+            self._flush_locked()
+            routed = self._conn.execute(
+                "SELECT 1 FROM routes WHERE branch = ? AND entry_id = ?", key
+            ).fetchone() is not None
+            if routed:
+                self._withdrawn.add(key)
+            return routed
+
+    def forget(self, branch: str, entry_id: str):
+        """Records that the deletion of an entry was sent down `branch`."""
+        with self._lock:
+            self._withdrawn.add((branch, entry_id))
+
+    def _flush_locked(self):
+        if not self._routed:
+            return
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO routes (branch, entry_id) VALUES (?, ?)", self._routed)
+        self._routed = []
+
+    def complete(self):
+        """Forgets the entries withdrawn from their branches; called once a run has completed."""
+        with self._lock:
+            self._flush_locked()
+            with self._conn:
+                self._conn.executemany("DELETE FROM routes WHERE branch = ? AND entry_id = ?", self._withdrawn)
+            self._withdrawn = set()
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+
+def open_routing(config: Optional[Dict[str, Any]]) -> Optional[RouteStore]:
+    """Builds a RouteStore from global.routing, or None if routes are not kept."""
+    if not config or not config.get("path"):
+        return None
+    return RouteStore(config["path"], flush_every=int(config.get("flush_every", 1000)))
+
+
+def _withdrawal(entry: Entry) -> Entry:
+    """A tombstone for an entry leaving a branch it may have been published to."""
+    metadata = {TOMBSTONE_KEY: True}
+    if "parent_id" in entry.metadata:
+        metadata["parent_id"] = entry.metadata["parent_id"]
+    return Entry(id=entry.id, source=entry.source, content="", metadata=metadata)
+
+
+def _received(entries: Iterator[Entry], stage: StageMetrics) -> Iterator[Entry]:
+    """Counts the entries a branch receives; the time spent waiting for them is upstream wait."""
+    clock = time.perf_counter
+    while True:
+        started = clock()
+        entry = next(entries, None)
+        waited = clock() - started
+        stage.pull_seconds += waited
+        stage.upstream_wait_seconds += waited
+        if entry is None:
+            return
+        stage.entries += 1
+        yield entry
+
+
+class _Route:
+    """One consumer of a dispatch point (a publisher or a branch), with its own channel and thread."""
+    def __init__(self, name: str, channel: SinkChannel, stage: StageMetrics, run: Callable[[Iterator[Entry]], Any],
+                 accepts: Optional[Predicate], publishers: List[PublishPlugin], positions: Set[int], mutates: bool):
+        self.name = name
+        self.channel = channel
+        self.stage = stage
+        self.run = run
+        self.accepts = accepts
+        self.publishers = publishers
+        self.positions = positions
+        self.mutates = mutates
+
+    def consume(self):
+        try:
+            self.run(iter(self.channel))
+        except BaseException as e:
+            logger.error("'%s' failed: %s", self.name, e)
+            self.channel.fail(e)
+        else:
+            # The route may return before the end of its stream.
+            self.channel.detach()
+
+
+def dispatch(entries: Iterator[Entry], publishers: List[PublishPlugin], branches: Sequence[Branch],
+             global_config: Dict[str, Any], metrics: PipelineMetrics,
+             checkpointer: Optional[Checkpointer] = None,
+             dead_letters: Optional[DeadLetterQueue] = None, path: str = "",
+             routing: Optional[RouteStore] = None):
+    """
+    Sends a stream to the publishers and the branches of one node of the
+    graph, each on its own thread behind a bounded channel (global.fanout).
+
+    Entries go to every publisher and to the branches they match; a branch
+    that filters entries gets its own copy whenever the entry goes
+    elsewhere too. With `routing`, a branch the entry no longer matches but
+    was routed to before gets a tombstone (see `Predicate.withdraws`).
+    Checkpoints record the entries a branch
+    was not sent as done by its publishers, and replayed dead letters only
+    go down the branch holding the stage they failed in.
+    """
+    if not branches:
+        publish(entries, publishers, global_config, metrics, checkpointer, dead_letters, prefix=path)
+        return
+
+    fanout_config = global_config.get("fanout") or {}
+
+    def channel(name: str) -> SinkChannel:
+        return SinkChannel(name, max_queue=int(fanout_config.get("max_queue", 1000)),
+                           policy=fanout_config.get("on_slow_sink", "block"),
+                           spill_dir=fanout_config.get("spill_dir"))
+
+    def position(plugin) -> int:
+        return dead_letters.position(plugin) if dead_letters is not None else -1
+
+    routes: List[_Route] = []
+    for publisher in publishers:
+        stage = metrics.stage(f"{path}{publisher.name}", "publish")
+        consume = publisher_consumer(publisher, checkpointer, dead_letters)
+        routes.append(_Route(
+            f"{path}{publisher.name}", channel(f"{len(routes)}-{publisher.name}"), stage,
+            lambda received, consume=consume, stage=stage: measure_consumer(consume, received, stage),
+            None, [publisher], {position(publisher)}, mutates=False,
+        ))
+    for branch in branches:
+        stage = metrics.stage(f"{path}{branch.name}", "branch")
+        filters, branch_publishers = branch.plugins()
+
+        def run(received: Iterator[Entry], branch: Branch = branch, stage: StageMetrics = stage):
+            prefix = f"{path}{branch.name}/"
+            stream, _ = apply_filters(_received(received, stage), branch.filters, metrics, [stage],
+                                      dead_letters, prefix=prefix)
+            dispatch(stream, branch.publishers, branch.branches, global_config, metrics,
+                     checkpointer, dead_letters, path=prefix, routing=routing)
+
+        routes.append(_Route(
+            f"{path}{branch.name}", channel(f"{len(routes)}-{branch.name}"), stage, run,
+            branch.when, branch_publishers, {position(plugin) for plugin in filters + branch_publishers},
+            mutates=bool(filters),
+        ))
+
+    threads = [
+        threading.Thread(target=route.consume, name=f"branch-{route.channel.name}", daemon=True)
+        for route in routes
+    ]
+    for thread in threads:
+        thread.start()
+
+    replaying = dead_letters is not None and dead_letters.replaying
+    try:
+        for entry in entries:
+            target = dead_letters.replay_position(entry) if replaying else None
+            live = 0
+            receivers: List[_Route] = []
+            withdrawn: List[_Route] = []
+            for route in routes:
+                if route.channel.error is not None:
+                    continue
+                live += 1
+                if target is not None:
+                    wanted = target in route.positions
+                else:
+                    wanted = route.accepts is None or route.accepts(entry)
+                if wanted:
+                    receivers.append(route)
+                    if routing is not None and route.accepts is not None:
+                        if entry.is_tombstone:
+                            routing.forget(route.name, entry.id)
+                        else:
+                            routing.route(route.name, entry.id)
+                elif (target is None and routing is not None and route.accepts.withdraws(entry)
+                        and routing.withdraw(route.name, entry.id)):
+                    withdrawn.append(route)
+                elif checkpointer is not None:
+                    for publisher in route.publishers:
+                        checkpointer.skip(publisher, [entry.id])
+            if not live:
+                logger.error("Every branch failed. Stopping the stream.")
+                break
+
+            # Publishers share the entry; every branch that modifies it gets its
+            # own copy, unless all receivers do (then the last one keeps it).
+            owner = receivers[-1] if receivers and all(route.mutates for route in receivers) else None
+            for route in receivers:
+                route.channel.put(entry.copy() if route.mutates and route is not owner else entry)
+                route.stage.observe_queue(route.channel.depth())
+            for route in withdrawn:
+                route.channel.put(_withdrawal(entry))
+                route.stage.observe_queue(route.channel.depth())
+    finally:
+        for route in routes:
+            route.channel.close()
+        for thread in threads:
+            thread.join()
+
+    for route in routes:
+        if route.channel.discarded:
+            logger.warning("'%s' returned early: %d entries discarded.", route.name, route.channel.discarded)
+    errors = {route.name: route.channel.error for route in routes if route.channel.error is not None}
+    if errors:
+        raise RuntimeError(f"Branches failed: {', '.join(errors)}") from next(iter(errors.values()))
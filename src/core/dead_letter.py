@@ -0,0 +1,484 @@
+# src/core/dead_letter.py
+
+import logging
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from plugins.base import Entry, SubscriptionPlugin, PublishPlugin
+from core.checkpoint import Checkpointer
+from core.metrics import PipelineMetrics
+
+logger = logging.getLogger(__name__)
+
+# (entry, error) -> None; records an entry a stage could not process.
+Reject = Callable[[Entry, BaseException], None]
+
+class FailureBudgetExceeded(RuntimeError):
+    """Raised when more entries failed than global.dead_letter allows; aborts the run."""
+
+
+class DeadLetter(NamedTuple):
+    """One failure recorded in a DeadLetterStore."""
+    seq: int
+    stage: str
+    kind: str
+    key: str
+    entry: Optional[Entry]
+    error: str
+    traceback: str
+    attempts: int
+    failed_at: float
+
+
+class DeadLetterStore:
+    """
+    Durable record of the entries that failed in a pipeline stage, with the
+    error and its traceback, kept in SQLite next to the checkpoints.
+
+    Failures are keyed by stage and entry ID (or, for items a subscription
+    could not turn into entries, a reference such as a file path): an entry
+    failing again replaces its record and counts one more attempt. Entries
+    are stored as they entered the failing stage, so that a replay can start
+    from there.
+    """
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS dead_letters ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT, stage TEXT NOT NULL, kind TEXT NOT NULL,"
+            " key TEXT NOT NULL, entry BLOB, error TEXT NOT NULL, traceback TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL, failed_at REAL NOT NULL, UNIQUE (stage, key))"
+        )
+        self._conn.commit()
+
+    def add(self, stage: str, kind: str, key: str, entry: Optional[Entry], error: str, trace: str):
+        blob = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL) if entry is not None else None
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT attempts FROM dead_letters WHERE stage = ? AND key = ?", (stage, key)
+            ).fetchone()
+            # Failures are rare: each one is written (and synced) right away.
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dead_letters (stage, kind, key, entry, error, traceback, attempts, failed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (stage, kind, key, blob, error, trace, (row[0] if row else 0) + 1, time.time()),
+            )
+
+    def records(self) -> List[DeadLetter]:
+        """All recorded failures, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, stage, kind, key, entry, error, traceback, attempts, failed_at"
+                " FROM dead_letters ORDER BY seq"
+            ).fetchall()
+        return [
+            DeadLetter(seq, stage, kind, key, pickle.loads(blob) if blob is not None else None,
+                       error, trace, attempts, failed_at)
+            for seq, stage, kind, key, blob, error, trace, attempts, failed_at in rows
+        ]
+
+    def remove(self, seqs: List[int]):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM dead_letters WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _settle(pending: deque, output: Entry):
+    """
+    Forgets the inputs a filter is done with, given its latest output. An
+    output with an input's ID accounts for that input and the ones read
+    before it (which the filter dropped); any other output (a chunk, say)
+    is taken to come from the latest input.
+    """
+    if pending and pending[0].id == output.id:
+        pending.popleft()
+        return
+    for i, entry in enumerate(pending):
+        if entry.id == output.id:
+            for _ in range(i + 1):
+                pending.popleft()
+            return
+    while len(pending) > 1:
+        pending.popleft()
+
+
+def isolate_filter(plugin, entries: Iterator[Entry], reject: Reject,
+                   bypass: Optional[Callable[[Entry], bool]] = None) -> Iterator[Entry]:
+    """
+    Runs a filter with a per-entry error boundary.
+
+    The entries the filter reports through `FilterPlugin.fail` go to
+    `reject` while the filter carries on, with its state intact. An
+    exception that escapes the filter ends its `execute` generator: for
+    filters marked `restartable`, the inputs it had read but not emitted yet
+    are then retried one at a time on a fresh `execute` call (the ones that
+    succeed are emitted, the ones that fail again go to `reject`) and the
+    filter is restarted on the rest of the stream. Retried entries may be
+    emitted twice (publishers write by ID). Other filters keep state in
+    their `execute` call that a restart would lose, so the error is raised
+    as usual, as is an error no input can be blamed for. Entries for which
+    `bypass` is true skip the filter.
+    """
+    source = iter(entries)
+    pending: deque = deque()
+    skipped: deque = deque()
+
+    def feed() -> Iterator[Entry]:
+        for entry in source:
+            if bypass is not None and bypass(entry):
+                skipped.append(entry)
+                continue
+            pending.append(entry)
+            yield entry
+
+    def on_failure(entry: Entry, error: BaseException):
+        for i, candidate in enumerate(pending):
+            if candidate is entry:
+                del pending[i]
+                break
+        reject(entry, error)
+
+    plugin.on_failure = on_failure
+    try:
+        while True:
+            try:
+                for output in plugin.execute(feed()):
+                    _settle(pending, output)
+                    while skipped:
+                        yield skipped.popleft()
+                    yield output
+                break
+            except Exception:
+                if not pending or not plugin.restartable:
+                    raise
+                suspects = list(pending)
+                pending.clear()
+            logger.warning("Filter '%s' failed; retrying its %d unfinished entries one by one.",
+                           plugin.name, len(suspects))
+            for entry in suspects:
+                try:
+                    outputs = list(plugin.execute(iter([entry])))
+                except Exception as e:
+                    reject(entry, e)
+                    continue
+                yield from outputs
+        while skipped:
+            yield skipped.popleft()
+    finally:
+        plugin.on_failure = None
+
+
+def isolate_publisher(publisher: PublishPlugin, consume: Callable[[Iterator[Entry]], Any],
+                      entries: Iterator[Entry], reject: Reject,
+                      accept: Optional[Callable[[Entry], bool]] = None):
+    """
+    Runs a publisher with a per-entry error boundary.
+
+    The entries a failing publisher had not finished are the ones it had not
+    committed yet, or, for publishers that do not commit explicitly, the
+    last one it read. They are retried together in one `execute` call; if
+    that fails too, what is still unfinished is split in halves and retried
+    the same way, until the failing entries are alone and go to `reject`.
+    The publisher is then restarted on the rest of the stream.
+    `consume` is the publisher's (checkpointed) `execute`. Entries for which
+    `accept` is false are not given to this publisher.
+    """
+    source = iter(entries)
+    pending: Dict[str, Entry] = {}
+    explicit = publisher.commits_explicitly
+
+    def written(entry_ids: List[str]):
+        for entry_id in entry_ids:
+            pending.pop(entry_id, None)
+
+    def track(entries: Iterator[Entry]) -> Iterator[Entry]:
+        for entry in entries:
+            if not explicit:
+                # Asking for the next entry means the last one was published.
+                pending.clear()
+            pending[entry.id] = entry
+            yield entry
+
+    def feed() -> Iterator[Entry]:
+        return track(entry for entry in source if accept is None or accept(entry))
+
+    def retry(batch: List[Entry]):
+        remaining = iter(batch)
+        try:
+            consume(track(remaining))
+            return
+        except Exception as e:
+            error = e
+        unfinished = [*pending.values(), *remaining]
+        pending.clear()
+        if not unfinished:
+            raise error
+        if len(unfinished) == 1:
+            reject(unfinished[0], error)
+            return
+        middle = len(unfinished) // 2
+        retry(unfinished[:middle])
+        retry(unfinished[middle:])
+
+    publisher.on_written = written
+    try:
+        while True:
+            try:
+                consume(feed())
+                return
+            except Exception:
+                if not pending:
+                    raise
+                suspects = list(pending.values())
+                pending.clear()
+            logger.warning("Publisher '%s' failed; retrying its %d unfinished entries.",
+                           publisher.name, len(suspects))
+            retry(suspects)
+    finally:
+        publisher.on_written = None
+
+
+class DeadLetterQueue:
+    """
+    Where the stages of one run send the entries they fail on, so that the
+    healthy ones keep flowing.
+
+    Filters and publishers are wrapped by `filter` and `consumer`;
+    subscriptions report the items they cannot read through
+    `SubscriptionPlugin.fail`. Every failure is written to the store. Once
+    more than `max_failures` entries failed, or more than `max_failure_rate`
+    of the entries read from the subscriptions (counted from `min_entries`
+    on), FailureBudgetExceeded aborts the run.
+    """
+    def __init__(self, store: DeadLetterStore, metrics: PipelineMetrics, filters: List, publishers: List,
+                 max_failures: Optional[int] = None, max_failure_rate: Optional[float] = 0.05,
+                 min_entries: int = 100):
+        self.store = store
+        self.metrics = metrics
+        self.max_failures = max_failures
+        self.max_failure_rate = max_failure_rate
+        self.min_entries = min_entries
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._positions = {id(plugin): i for i, plugin in enumerate([*filters, *publishers])}
+        self._stage_names = [plugin.name for plugin in (*filters, *publishers)]
+        self._filter_count = len(filters)
+        # Set for replays: replayed entry (by identity) -> (entry, position
+        # of the stage it failed in).
+        self.replaying = False
+        self._targets: Dict[int, Tuple[Entry, int]] = {}
+        self._replayed: List[int] = []
+
+    # --- Recording ---
+
+    def _seen(self) -> int:
+        return sum(stage.entries for stage in self.metrics.stages if stage.kind == "subscription")
+
+    def record(self, stage: str, kind: str, key: str, entry: Optional[Entry], error: str, trace: str):
+        """Stores one failure and enforces the failure budget."""
+        self.store.add(stage, kind, key, entry, error, trace)
+        with self._lock:
+            self.failures += 1
+            failures = self.failures
+        logger.error("%s '%s' failed on %s; sent to the dead-letter queue: %s", kind.capitalize(), stage, key, error)
+
+        if self.max_failures is not None and failures > self.max_failures:
+            raise FailureBudgetExceeded(
+                f"{failures} entries failed, more than global.dead_letter.max_failures ({self.max_failures})."
+            )
+        seen = self._seen()
+        if (self.max_failure_rate is not None and seen >= self.min_entries
+                and failures > self.max_failure_rate * seen):
+            raise FailureBudgetExceeded(
+                f"{failures} of {seen} entries failed, more than global.dead_letter.max_failure_rate "
+                f"({self.max_failure_rate:.1%})."
+            )
+
+    def rejecter(self, stage: str, kind: str) -> Reject:
+        def reject(entry: Entry, error: BaseException):
+            trace = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+            self.record(stage, kind, entry.id, entry, f"{type(error).__name__}: {error}", trace)
+        return reject
+
+    def subscription_hook(self, subscription: SubscriptionPlugin) -> Callable[[str, BaseException], None]:
+        def on_failure(reference: str, error: BaseException):
+            trace = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+            self.record(subscription.name, "subscription", reference, None, f"{type(error).__name__}: {error}", trace)
+        return on_failure
+
+    # --- Stage wrappers ---
+
+    def position(self, plugin) -> int:
+        return self._positions.get(id(plugin), 0)
+
+    def _bypass(self, position: int) -> Optional[Callable[[Entry], bool]]:
+        if not self.replaying:
+            return None
+
+        def bypass(entry: Entry) -> bool:
+            target = self._targets.get(id(entry))
+            if target is None:
+                return False
+            if target[1] > position:
+                return True
+            del self._targets[id(entry)]  # from here on, an ordinary entry
+            return False
+        return bypass
+
+    def filter(self, plugin, entries: Iterator[Entry]) -> Iterator[Entry]:
+        """The output of `plugin.execute(entries)`, with failed entries dead-lettered."""
+        position = self.position(plugin)
+        return isolate_filter(plugin, entries, self.rejecter(plugin.name, "filter"), self._bypass(position))
+
+    def consumer(self, publisher: PublishPlugin, consume: Callable[[Iterator[Entry]], Any]) -> Callable[[Iterator[Entry]], Any]:
+        """Wraps a publisher's `consume` callable so that failed entries are dead-lettered."""
+        reject = self.rejecter(publisher.name, "publish")
+        accept = None
+        if self.replaying:
+            position = self.position(publisher)
+
+            def accept(entry: Entry) -> bool:
+                # A replayed publisher failure goes to that publisher only.
+                target = self._targets.get(id(entry))
+                return target is None or target[1] == position
+        return lambda entries: isolate_publisher(publisher, consume, entries, reject, accept)
+
+    # --- Replay ---
+
+    def replay_source(self) -> SubscriptionPlugin:
+        """
+        A subscription yielding the stored entries, each routed to the stage
+        it failed in. Must be created before the stages are wrapped.
+        """
+        self.replaying = True
+        return DeadLetterReplay(self)
+
+    def replay_position(self, entry: Entry) -> Optional[int]:
+        """The position of the stage a replayed entry is headed for, or None for ordinary entries."""
+        target = self._targets.get(id(entry))
+        return target[1] if target is not None else None
+
+    def _target(self, record: DeadLetter) -> int:
+        stages = self._stage_names
+        if record.kind == "publish":
+            candidates = range(self._filter_count, len(stages))
+        else:
+            candidates = range(self._filter_count)
+        for position in candidates:
+            if stages[position] == record.stage:
+                return position
+        logger.warning("Stage '%s' is no longer in the pipeline; replaying %s through every stage.",
+                       record.stage, record.key)
+        return 0
+
+    def _replay(self) -> Iterator[Entry]:
+        dropped = []
+        for record in self.store.records():
+            if record.entry is None:
+                # Nothing to replay: the subscription reads the item again on its next run.
+                dropped.append(record.seq)
+                continue
+            self._targets[id(record.entry)] = (record.entry, self._target(record))
+            self._replayed.append(record.seq)
+            yield record.entry
+        if dropped:
+            logger.info("Dropped %d subscription failures; the next run reads those items again.", len(dropped))
+            self._replayed.extend(dropped)
+
+    def complete(self):
+        """Called once a run has finished: forgets the failures it replayed."""
+        self.store.remove(self._replayed)
+        self._replayed = []
+        self._targets.clear()
+        if self.failures:
+            logger.warning("%d entries failed and were sent to the dead-letter queue %s.", self.failures, self.store.path)
+
+
+class DeadLetterReplay(SubscriptionPlugin):
+    """Feeds the entries of a dead-letter queue back into the pipeline (`main.py --replay`)."""
+    def __init__(self, queue: DeadLetterQueue):
+        super().__init__({})
+        self.name = "dead_letter_replay"
+        self.queue = queue
+
+    def execute(self) -> Iterator[Entry]:
+        return self.queue._replay()
+
+
+def publisher_consumer(publisher: PublishPlugin, checkpointer: Optional[Checkpointer] = None,
+                       dead_letters: Optional[DeadLetterQueue] = None) -> Callable[[Iterator[Entry]], Any]:
+    """The callable that drives a publisher, with checkpoints and dead-lettering if enabled."""
+    consume = checkpointer.consumer(publisher) if checkpointer else publisher.execute
+    if dead_letters is not None:
+        consume = dead_letters.consumer(publisher, consume)
+    if checkpointer is not None:
+        consume = checkpointer.feeder(publisher, consume)
+    return consume
+
+
+def open_dead_letters(config: Optional[Dict], metrics: PipelineMetrics, subscriptions: List,
+                      filters: List, publishers: List) -> Optional[DeadLetterQueue]:
+    """Builds a DeadLetterQueue from global.dead_letter, or None if failures should abort the run."""
+    if not config or not config.get("path"):
+        return None
+    max_failures = config.get("max_failures")
+    max_failure_rate = config.get("max_failure_rate", 0.05)
+    queue = DeadLetterQueue(
+        DeadLetterStore(config["path"]),
+        metrics,
+        filters,
+        publishers,
+        max_failures=int(max_failures) if max_failures is not None else None,
+        max_failure_rate=float(max_failure_rate) if max_failure_rate is not None else None,
+        min_entries=int(config.get("min_entries", 100)),
+    )
+    for subscription in subscriptions:
+        subscription.on_failure = queue.subscription_hook(subscription)
+    return queue
+
+
+def main(argv=None) -> int:
+    """Lists the failures recorded in a dead-letter queue."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="List the entries in a SHIORI dead-letter queue.")
+    parser.add_argument("path", help="Path of the queue (global.dead_letter.path)")
+    parser.add_argument("--traceback", action="store_true", help="Print the full traceback of each failure")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        print(f"{args.path}: no such dead-letter queue", file=sys.stderr)
+        return 2
+    store = DeadLetterStore(args.path)
+    try:
+        for record in store.records():
+            failed_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.failed_at))
+            print(f"{failed_at}  {record.kind:12s} {record.stage:24s} {record.key}  "
+                  f"(x{record.attempts}) {record.error}")
+            if args.traceback:
+                print(record.traceback)
+    finally:
+        store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+# src/core/fanout.py
+
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional
+
+from plugins.base import Entry, PublishPlugin
+from core.checkpoint import Checkpointer
+from core.dead_letter import DeadLetterQueue, publisher_consumer
+from core.metrics import StageMetrics, measure_consumer
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("block", "spill")
+
+class SinkChannel:
+    """
+    A bounded, single-consumer queue feeding one publisher.
+
+    When the in-memory queue is full, the `block` policy makes the producer
+    wait (backpressure), while the `spill` policy appends further entries to
+    a temporary file on disk, which the consumer drains in order once it has
+    caught up. If the consumer fails, the channel is marked failed and
+    further entries are discarded so that the other sinks keep flowing; if
+    it returns without reading to the end, the channel is detached and the
+    rest is discarded the same way, rather than blocking the producer.
+    """
+    def __init__(self, name: str, max_queue: int = 1000, policy: str = "block", spill_dir: Optional[str] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow-sink policy '{policy}'. Use one of: {', '.join(POLICIES)}")
+        self.name = name
+        self.max_queue = max(1, max_queue)
+        self.policy = policy
+        self.spill_dir = spill_dir
+        self.error: Optional[BaseException] = None
+        self.spilled_total = 0
+        self.discarded = 0
+
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._detached = False
+        self._spill_file = None
+        self._spill_write_pos = 0
+        self._spill_read_pos = 0
+        self._spill_pending = 0
+
+    def put(self, entry: Entry):
+        """Hands an entry to the consumer, applying the slow-sink policy."""
+        with self._cond:
+            if self.error is not None:
+                return
+            if self._detached:
+                self.discarded += 1
+                return
+            if self.policy == "block":
+                while len(self._queue) >= self.max_queue and self.error is None and not self._detached:
+                    self._cond.wait()
+                if self.error is not None:
+                    return
+                if self._detached:
+                    self.discarded += 1
+                    return
+                self._queue.append(entry)
+            elif self._spill_pending == 0 and len(self._queue) < self.max_queue:
+                self._queue.append(entry)
+            else:
+                # Once spilling, everything goes to disk until the consumer
+                # has drained the spill file, which keeps entries in order.
+                self._spill(entry)
+            self._cond.notify_all()
+
+    def _spill(self, entry: Entry):
+        if self._spill_file is None:
+            if self.spill_dir:
+                os.makedirs(self.spill_dir, exist_ok=True)
+            self._spill_file = tempfile.TemporaryFile(dir=self.spill_dir, prefix=f"shiori-spill-{self.name}-")
+        self._spill_file.seek(self._spill_write_pos)
+        pickle.dump(entry, self._spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._spill_write_pos = self._spill_file.tell()
+        self._spill_pending += 1
+        self.spilled_total += 1
+
+    def _unspill(self) -> Entry:
+        self._spill_file.flush()
+        self._spill_file.seek(self._spill_read_pos)
+        entry = pickle.load(self._spill_file)
+        self._spill_read_pos = self._spill_file.tell()
+        self._spill_pending -= 1
+        if self._spill_pending == 0:
+            # Fully drained: reclaim the disk space.
+            self._spill_file.truncate(0)
+            self._spill_write_pos = self._spill_read_pos = 0
+        return entry
+
+    def close(self):
+        """Signals that no more entries will be put."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _drop_buffered(self) -> int:
+        dropped = len(self._queue) + self._spill_pending
+        self._queue.clear()
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        self._spill_pending = 0
+        self._cond.notify_all()
+        return dropped
+
+    def fail(self, error: BaseException):
+        """Marks the consumer as failed and drops anything still buffered."""
+        with self._cond:
+            self.error = error
+            self._drop_buffered()
+
+    def detach(self):
+        """
+        Called once the consumer has returned: what it left unread, and
+        anything put from now on, is counted in `discarded` and dropped.
+        """
+        with self._cond:
+            self._detached = True
+            self.discarded += self._drop_buffered()
+
+    def __iter__(self) -> Iterator[Entry]:
+        while True:
+            with self._cond:
+                while not self._queue and self._spill_pending == 0 and not self._closed:
+                    self._cond.wait()
+                if self._queue:
+                    entry = self._queue.popleft()
+                elif self._spill_pending:
+                    entry = self._unspill()
+                else:
+                    return
+                self._cond.notify_all()
+            yield entry
+
+    def depth(self) -> int:
+        """Number of entries waiting for the consumer, in memory and on disk."""
+        with self._cond:
+            return len(self._queue) + self._spill_pending
+
+
+def fan_out(
+    entries: Iterator[Entry],
+    publishers: List[PublishPlugin],
+    max_queue: int = 1000,
+    policy: str = "block",
+    spill_dir: Optional[str] = None,
+    stages: Optional[List[StageMetrics]] = None,
+    checkpointer: Optional[Checkpointer] = None,
+    dead_letters: Optional[DeadLetterQueue] = None,
+) -> Dict[str, BaseException]:
+    """
+    Drives all publishers concurrently from one entry stream.
+
+    Each publisher runs in its own thread and reads from its own bounded
+    SinkChannel, so memory use does not grow with the number of entries.
+    A publisher that raises is detached and the others continue; the errors
+    are returned keyed by publisher name once every publisher has finished.
+    If `stages` is given, each publisher's metrics and queue depth are
+    recorded in the matching StageMetrics. With a `checkpointer`, each
+    publisher skips what it already committed and reports its commits.
+    With `dead_letters`, the entries a publisher fails on are dead-lettered
+    instead of detaching it.
+    """
+    channels = [
+        SinkChannel(f"{i}-{publisher.name}", max_queue=max_queue, policy=policy, spill_dir=spill_dir)
+        for i, publisher in enumerate(publishers)
+    ]
+
+    if stages is None:
+        stages = [StageMetrics(publisher.name, "publish") for publisher in publishers]
+
+    def consume(publisher: PublishPlugin, channel: SinkChannel, stage: StageMetrics):
+        try:
+            consume_entries = publisher_consumer(publisher, checkpointer, dead_letters)
+            measure_consumer(consume_entries, iter(channel), stage)
+        except BaseException as e:
+            logger.error("Publisher '%s' failed: %s", publisher.name, e)
+            channel.fail(e)
+        else:
+            # A publisher may return before the end of its stream.
+            channel.detach()
+
+    threads = [
+        threading.Thread(target=consume, args=(publisher, channel, stage), name=f"publish-{channel.name}", daemon=True)
+        for publisher, channel, stage in zip(publishers, channels, stages)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        for entry in entries:
+            live = 0
+            for channel, stage in zip(channels, stages):
+                channel.put(entry)
+                if channel.error is None:
+                    live += 1
+                    stage.observe_queue(channel.depth())
+            if not live:
+                logger.error("All publishers failed. Stopping the stream.")
+                break
+    finally:
+        for channel in channels:
+            channel.close()
+        for thread in threads:
+            thread.join()
+
+    for publisher, channel in zip(publishers, channels):
+        if channel.spilled_total:
+            logger.warning("Publisher '%s' was slow: %d entries spilled to disk.", publisher.name, channel.spilled_total)
+        if channel.discarded:
+            logger.warning("Publisher '%s' returned early: %d entries discarded.", publisher.name, channel.discarded)
+
+    return {
+        channel.name: channel.error
+        for channel in channels
+        if channel.error is not None
+    }
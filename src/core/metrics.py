@@ -0,0 +1,266 @@
+# src/core/metrics.py
+
+import bisect
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets: 50us .. ~100s.
+LATENCY_BUCKETS = [5e-5 * (2 ** i) for i in range(22)]
+
+class Histogram:
+    """A fixed-bucket latency histogram with approximate quantiles."""
+    def __init__(self, bounds: List[float] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> float:
+        """Returns the upper bound of the bucket holding the q-quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class StageMetrics:
+    """
+    Counters for one pipeline stage.
+
+    `busy_seconds` is the time spent inside the stage itself. The stage's
+    `upstream_wait_seconds` is time spent waiting for its input, and
+    `downstream_wait_seconds` is time its output sat waiting for the
+    consumer. The stage with the most busy time is the bottleneck.
+    """
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.entries = 0
+        self.errors = 0
+        self.pull_seconds = 0.0
+        self.busy_seconds = 0.0
+        self.upstream_wait_seconds = 0.0
+        self.downstream_wait_seconds = 0.0
+        self.latency = Histogram()
+        self.queue_max_depth = 0
+        self.queue_depth_total = 0
+        self.queue_samples = 0
+
+    def observe_queue(self, depth: int):
+        self.queue_max_depth = max(self.queue_max_depth, depth)
+        self.queue_depth_total += depth
+        self.queue_samples += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "entries": self.entries,
+            "errors": self.errors,
+            "entries_per_second": self.entries / self.busy_seconds if self.busy_seconds else 0.0,
+            "busy_seconds": self.busy_seconds,
+            "upstream_wait_seconds": self.upstream_wait_seconds,
+            "downstream_wait_seconds": self.downstream_wait_seconds,
+            "latency_seconds": self.latency.to_dict(),
+            "queue_max_depth": self.queue_max_depth,
+            "queue_mean_depth": self.queue_depth_total / self.queue_samples if self.queue_samples else 0.0,
+        }
+
+
+def instrument(iterator: Iterator, stage: StageMetrics, upstream: Sequence[StageMetrics] = ()) -> Iterator:
+    """
+    Wraps a stage's output iterator and records its metrics.
+
+    Each `next()` on the stage includes the time the stage spent pulling from
+    its (also instrumented) upstream stages; that part is subtracted to get
+    the stage's own per-entry latency.
+    """
+    clock = time.perf_counter
+
+    def upstream_pulls() -> float:
+        return sum(s.pull_seconds for s in upstream)
+
+    while True:
+        upstream_before = upstream_pulls()
+        started = clock()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            elapsed = clock() - started
+            waited = upstream_pulls() - upstream_before
+            stage.pull_seconds += elapsed
+            stage.busy_seconds += max(0.0, elapsed - waited)
+            stage.upstream_wait_seconds += waited
+            return
+        except Exception:
+            stage.errors += 1
+            raise
+        elapsed = clock() - started
+        waited = upstream_pulls() - upstream_before
+        own = max(0.0, elapsed - waited)
+        stage.pull_seconds += elapsed
+        stage.busy_seconds += own
+        stage.upstream_wait_seconds += waited
+        stage.entries += 1
+        stage.latency.observe(own)
+
+        handed_off = clock()
+        yield item
+        stage.downstream_wait_seconds += clock() - handed_off
+
+
+def measure_consumer(consume: Callable[[Iterator], Any], entries: Iterator, stage: StageMetrics) -> Any:
+    """
+    Runs a consuming stage (a publisher) and records its metrics: time spent
+    waiting in `next()` on its input is upstream wait, the rest is busy time,
+    and the time between consecutive pulls is the per-entry latency.
+    """
+    clock = time.perf_counter
+
+    def metered() -> Iterator:
+        while True:
+            started = clock()
+            try:
+                item = next(entries)
+            except StopIteration:
+                return
+            finally:
+                stage.upstream_wait_seconds += clock() - started
+            stage.entries += 1
+            handed_off = clock()
+            yield item
+            stage.latency.observe(clock() - handed_off)
+
+    started = clock()
+    try:
+        return consume(metered())
+    except Exception:
+        stage.errors += 1
+        raise
+    finally:
+        stage.busy_seconds += max(0.0, clock() - started - stage.upstream_wait_seconds)
+
+
+class PipelineMetrics:
+    """Collects the metrics of every stage of one run and renders reports."""
+    def __init__(self):
+        self.stages: List[StageMetrics] = []
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def stage(self, name: str, kind: str) -> StageMetrics:
+        metrics = StageMetrics(name, kind)
+        self.stages.append(metrics)
+        return metrics
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def report(self) -> Dict[str, Any]:
+        end = self.finished if self.finished is not None else time.perf_counter()
+        stages = [stage.to_dict() for stage in self.stages]
+        busiest = max(stages, key=lambda s: s["busy_seconds"], default=None)
+        return {
+            "wall_seconds": end - self.started,
+            "bottleneck": busiest["name"] if busiest else None,
+            "stages": stages,
+        }
+
+    def write_json(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def to_prometheus(self) -> str:
+        """Renders the metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples):
+            lines.append(f"# HELP shiori_{name} {help_text}")
+            lines.append(f"# TYPE shiori_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"shiori_{name}{{{label_text}}} {value}")
+
+        def labels(stage: StageMetrics, **extra):
+            return {"stage": stage.name, "kind": stage.kind, **extra}
+
+        metric("stage_entries_total", "counter", "Entries emitted by the stage.",
+               [(labels(s), s.entries) for s in self.stages])
+        metric("stage_errors_total", "counter", "Errors raised by the stage.",
+               [(labels(s), s.errors) for s in self.stages])
+        metric("stage_busy_seconds_total", "counter", "Time spent inside the stage.",
+               [(labels(s), s.busy_seconds) for s in self.stages])
+        metric("stage_upstream_wait_seconds_total", "counter", "Time the stage waited for input.",
+               [(labels(s), s.upstream_wait_seconds) for s in self.stages])
+        metric("stage_downstream_wait_seconds_total", "counter", "Time the stage's output waited for the consumer.",
+               [(labels(s), s.downstream_wait_seconds) for s in self.stages])
+        metric("stage_queue_max_depth", "gauge", "Largest observed queue depth in front of the stage.",
+               [(labels(s), s.queue_max_depth) for s in self.stages if s.queue_samples])
+
+        histogram_samples = []
+        for s in self.stages:
+            cumulative = 0
+            for bound, count in zip(s.latency.bounds, s.latency.counts):
+                cumulative += count
+                histogram_samples.append((labels(s, le=f"{bound:g}"), cumulative))
+            histogram_samples.append((labels(s, le="+Inf"), s.latency.count))
+        lines.append("# HELP shiori_stage_latency_seconds Per-entry latency of the stage.")
+        lines.append("# TYPE shiori_stage_latency_seconds histogram")
+        for label_values, value in histogram_samples:
+            label_text = ",".join(f'{k}="{v}"' for k, v in label_values.items())
+            lines.append(f"shiori_stage_latency_seconds_bucket{{{label_text}}} {value}")
+        for s in self.stages:
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels(s).items())
+            lines.append(f"shiori_stage_latency_seconds_sum{{{label_text}}} {s.latency.total}")
+            lines.append(f"shiori_stage_latency_seconds_count{{{label_text}}} {s.latency.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        # Written atomically, as expected by the node_exporter textfile collector.
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def log_summary(self):
+        report = self.report()
+        for stage in report["stages"]:
+            logger.info("stage metrics %s", json.dumps(stage))
+        logger.info("Run finished in %.2fs; bottleneck: %s", report["wall_seconds"], report["bottleneck"])
+
+    def write(self, config: Dict[str, Any]):
+        """Emits the report to every sink configured under global.metrics."""
+        self.finish()
+        self.log_summary()
+        if config.get("json_path"):
+            self.write_json(config["json_path"])
+        if config.get("prometheus_path"):
+            self.write_prometheus(config["prometheus_path"])
@@ -0,0 +1,286 @@
+# src/core/sharded.py
+
+import importlib
+import logging
+import multiprocessing
+import os
+import pickle
+import struct
+import threading
+import traceback
+import zlib
+from array import array
+from multiprocessing.connection import Connection, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from plugins.base import Entry, SHARD_ENV, vector_bytes
+from core.checkpoint import Checkpointer
+from core.dead_letter import DeadLetterQueue, isolate_filter
+from core.metrics import PipelineMetrics, instrument
+from core.sync_runner import apply_filters, publish, require_sync_plugins, run_sync_pipeline, subscribe
+
+logger = logging.getLogger(__name__)
+
+# Message types on the pipes; an empty message ends a stream.
+_BATCH = b"B"
+_ERROR = b"E"
+_DEAD_LETTER = b"D"
+_HEADER = struct.Struct("<cI")
+
+def shard_of(entry_id: str, shards: int) -> int:
+    """The shard an entry ID belongs to; stable across processes and runs."""
+    return zlib.crc32(entry_id.encode("utf-8")) % shards
+
+
+def encode_batch(entries: List[Entry]) -> bytes:
+    """
+    Serializes entries for a pipe. The small fields are pickled together;
+    vectors follow as raw float32 bytes, so they are never pickled.
+    """
+    fields = []
+    vectors = []
+    for entry in entries:
+        vector = vector_bytes(entry.vector)
+        fields.append((entry.id, entry.source, entry.content, entry.metadata, entry.timestamp, len(vector)))
+        vectors.append(vector)
+    head = pickle.dumps(fields, protocol=pickle.HIGHEST_PROTOCOL)
+    return b"".join([_HEADER.pack(_BATCH, len(head)), head, *vectors])
+
+
+def decode_batch(data: bytes) -> List[Entry]:
+    view = memoryview(data)
+    _, size = _HEADER.unpack_from(view)
+    offset = _HEADER.size + size
+    entries = []
+    for entry_id, source, content, metadata, timestamp, nbytes in pickle.loads(view[_HEADER.size:offset]):
+        vector = array('f')
+        vector.frombytes(view[offset:offset + nbytes])
+        offset += nbytes
+        entries.append(Entry(entry_id, source, content, vector, metadata, timestamp))
+    return entries
+
+
+def split_filters(filters: List) -> Tuple[List, List, List]:
+    """
+    Splits the filter chain into the filters that run in the parent before
+    the shards, the run of shardable filters executed by the workers, and
+    the filters that run in the parent after the results are merged.
+    """
+    start = 0
+    while start < len(filters) and not filters[start].shardable:
+        start += 1
+    end = start
+    while end < len(filters) and filters[end].shardable:
+        end += 1
+    return filters[:start], filters[start:end], filters[end:]
+
+
+def _shard_worker(index: int, shards: int, specs: List[Tuple[str, str, Dict[str, Any]]],
+                  inbox: Connection, outbox: Connection, batch_size: int, log_level: int,
+                  isolate: bool = False):
+    """
+    Runs the sharded filters on one worker process, between two pipes. With
+    `isolate`, entries a filter fails on are sent back to be dead-lettered.
+    """
+    os.environ[SHARD_ENV] = f"{index}/{shards}"
+    logging.basicConfig(level=log_level, format="%(asctime)s %(levelname)s %(processName)s %(name)s: %(message)s")
+    try:
+        filters = [
+            getattr(importlib.import_module(module), qualname)(config)
+            for module, qualname, config in specs
+        ]
+        pending: List[Entry] = []
+
+        def flush():
+            if pending:
+                outbox.send_bytes(encode_batch(pending))
+                pending.clear()
+
+        def source() -> Iterator[Entry]:
+            while True:
+                # Whatever is ready goes out before waiting for more input.
+                flush()
+                data = inbox.recv_bytes()
+                if not data:
+                    return
+                yield from decode_batch(data)
+
+        def rejecter(stage: str):
+            def reject(entry: Entry, error: BaseException):
+                trace = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+                record = (stage, "filter", entry.id, entry, f"{type(error).__name__}: {error}", trace)
+                outbox.send_bytes(_DEAD_LETTER + pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+            return reject
+
+        stream = source()
+        for filter_plugin in filters:
+            if isolate:
+                stream = isolate_filter(filter_plugin, stream, rejecter(filter_plugin.name))
+            else:
+                stream = filter_plugin.execute(stream)
+        for entry in stream:
+            pending.append(entry)
+            if len(pending) >= batch_size:
+                flush()
+        flush()
+        outbox.send_bytes(b"")
+    except BaseException as e:
+        message = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+        try:
+            outbox.send_bytes(_ERROR + message.encode("utf-8"))
+        except OSError:
+            pass
+    finally:
+        outbox.close()
+
+
+class ShardPool:
+    """
+    Worker processes running the same filter chain on disjoint shards of
+    the entry stream, connected to the parent by one pipe in each direction.
+    """
+    def __init__(self, filters: List, shards: int, batch_size: int = 256, start_method: str = "spawn",
+                 dead_letters: Optional[DeadLetterQueue] = None):
+        self.shards = shards
+        self.batch_size = batch_size
+        self.dead_letters = dead_letters
+        # Workers build their own instances from the same configs.
+        specs = [(type(f).__module__, type(f).__qualname__, f.config) for f in filters]
+        context = multiprocessing.get_context(start_method)
+        self.processes = []
+        self.inboxes: List[Connection] = []
+        self.outboxes: List[Connection] = []
+        self.error: Optional[BaseException] = None
+        for index in range(shards):
+            inbox_reader, inbox_writer = context.Pipe(duplex=False)
+            outbox_reader, outbox_writer = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_shard_worker,
+                args=(index, shards, specs, inbox_reader, outbox_writer, batch_size,
+                      logging.getLogger().getEffectiveLevel(), dead_letters is not None),
+                name=f"shiori-shard-{index}",
+                daemon=True,
+            )
+            process.start()
+            inbox_reader.close()
+            outbox_writer.close()
+            self.processes.append(process)
+            self.inboxes.append(inbox_writer)
+            self.outboxes.append(outbox_reader)
+        self._dispatcher: Optional[threading.Thread] = None
+
+    def _dispatch(self, entries: Iterator[Entry]):
+        buffers: List[List[Entry]] = [[] for _ in range(self.shards)]
+        try:
+            for entry in entries:
+                shard = shard_of(entry.id, self.shards)
+                buffer = buffers[shard]
+                buffer.append(entry)
+                if len(buffer) >= self.batch_size:
+                    self.inboxes[shard].send_bytes(encode_batch(buffer))
+                    buffers[shard] = []
+            for shard, buffer in enumerate(buffers):
+                if buffer:
+                    self.inboxes[shard].send_bytes(encode_batch(buffer))
+        except BaseException as e:
+            self.error = e
+        finally:
+            for inbox in self.inboxes:
+                try:
+                    inbox.send_bytes(b"")
+                    inbox.close()
+                except OSError:
+                    pass  # the worker is gone; the merge reports why
+
+    def map(self, entries: Iterator[Entry]) -> Iterator[Entry]:
+        """
+        Feeds `entries` to the workers from a background thread and yields
+        their output as it arrives. Entries with the same ID keep their
+        order; otherwise shards are interleaved.
+        """
+        self._dispatcher = threading.Thread(target=self._dispatch, args=(entries,), name="shiori-shard-dispatch", daemon=True)
+        self._dispatcher.start()
+
+        live = {outbox: index for index, outbox in enumerate(self.outboxes)}
+        while live:
+            for outbox in wait(list(live)):
+                index = live[outbox]
+                try:
+                    data = outbox.recv_bytes()
+                except EOFError:
+                    self.processes[index].join(1.0)
+                    raise RuntimeError(
+                        f"Shard {index} exited unexpectedly (exit code {self.processes[index].exitcode})."
+                    )
+                if not data:
+                    del live[outbox]
+                elif data[:1] == _ERROR:
+                    raise RuntimeError(f"Shard {index} failed: {data[1:].decode('utf-8', 'replace')}")
+                elif data[:1] == _DEAD_LETTER:
+                    self.dead_letters.record(*pickle.loads(data[1:]))
+                else:
+                    yield from decode_batch(data)
+
+        self._dispatcher.join()
+        if self.error is not None:
+            raise self.error
+
+    def close(self, abort: bool = False):
+        """Stops the workers: waits for them to exit, or kills them on `abort`."""
+        for process in self.processes:
+            if not abort:
+                process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        for outbox in self.outboxes:
+            outbox.close()
+        # Terminated workers break the pipes, which unblocks the dispatcher.
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout=5.0)
+
+
+def run_sharded_pipeline(subscriptions: List, filters: List, publishers: List,
+                         global_config: Dict[str, Any], metrics: PipelineMetrics,
+                         checkpointer: Optional[Checkpointer] = None,
+                         dead_letters: Optional[DeadLetterQueue] = None):
+    """
+    Runs the CPU-bound part of the filter chain on several processes.
+
+    Subscriptions run in this process; their output is partitioned by a hash
+    of the entry ID across `sharded.workers` processes, each running its own
+    instances of the shardable filters. The results are merged back here for
+    any remaining filters and the publishers, so checkpoints work as usual.
+    """
+    require_sync_plugins(subscriptions, filters, publishers)
+    config = global_config.get("sharded") or {}
+    shards = int(config.get("workers") or os.cpu_count() or 1)
+    before, sharded, after = split_filters(filters)
+    if not sharded or shards < 2:
+        logger.warning("Nothing to shard (%d workers, %d shardable filters); running in one process.",
+                       shards, len(sharded))
+        run_sync_pipeline(subscriptions, filters, publishers, global_config, metrics, checkpointer, dead_letters)
+        return
+
+    entry_stream, upstream = subscribe(subscriptions, metrics, checkpointer)
+    entry_stream, upstream = apply_filters(entry_stream, before, metrics, upstream, dead_letters)
+
+    logger.info("Sharding %s across %d processes", ", ".join(f.name for f in sharded), shards)
+    pool = ShardPool(
+        sharded,
+        shards,
+        batch_size=int(config.get("batch_size", 256)),
+        start_method=config.get("start_method", "spawn"),
+        dead_letters=dead_letters,
+    )
+    aborted = True
+    try:
+        # Upstream stages are pulled by the dispatcher thread, so their time
+        # cannot be told apart from this stage's.
+        stage = metrics.stage(f"shards[{','.join(f.name for f in sharded)}]", "filter")
+        entry_stream = instrument(pool.map(entry_stream), stage)
+        entry_stream, upstream = apply_filters(entry_stream, after, metrics, [stage], dead_letters)
+        publish(entry_stream, publishers, global_config, metrics, checkpointer, dead_letters)
+        aborted = False
+    finally:
+        pool.close(abort=aborted)
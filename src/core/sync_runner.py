@@ -0,0 +1,117 @@
+# src/core/sync_runner.py
+
+import logging
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from plugins.base import (
+    Entry, SubscriptionPlugin,
+    AsyncSubscriptionPlugin, AsyncFilterPlugin, AsyncPublishPlugin,
+)
+from core.checkpoint import Checkpointer
+from core.dead_letter import DeadLetterQueue, publisher_consumer
+from core.fanout import fan_out
+from core.metrics import PipelineMetrics, StageMetrics, instrument, measure_consumer
+
+logger = logging.getLogger(__name__)
+
+def run_sync_pipeline(subscriptions: List, filters: List, publishers: List,
+                      global_config: Dict[str, Any], metrics: PipelineMetrics,
+                      checkpointer: Optional[Checkpointer] = None,
+                      dead_letters: Optional[DeadLetterQueue] = None, branches: Sequence = (),
+                      routing=None):
+    """
+    Runs the pipeline as a chain of generators, instrumenting every stage.
+    With `branches` (core.dag.Branch), entries leaving the filters are also
+    routed to the branches whose predicate they match (and recorded in
+    `routing`, a core.dag.RouteStore, if given).
+    """
+    if branches:
+        from core.dag import dispatch, flatten
+        require_sync_plugins(subscriptions, filters, publishers, *flatten(branches))
+    else:
+        require_sync_plugins(subscriptions, filters, publishers)
+
+    # 1. Chain all subscription plugin iterators
+    entry_stream, upstream = subscribe(subscriptions, metrics, checkpointer)
+
+    # 2. Pass the stream through all filter plugins
+    entry_stream, upstream = apply_filters(entry_stream, filters, metrics, upstream, dead_letters)
+
+    # 3. Send the final stream to all publish plugins (and branches)
+    if branches:
+        dispatch(entry_stream, publishers, branches, global_config, metrics, checkpointer, dead_letters,
+                 routing=routing)
+    else:
+        publish(entry_stream, publishers, global_config, metrics, checkpointer, dead_letters)
+
+def require_sync_plugins(*plugin_lists: List):
+    async_plugins = [
+        p.name for plugins in plugin_lists for p in plugins
+        if isinstance(p, (AsyncSubscriptionPlugin, AsyncFilterPlugin, AsyncPublishPlugin))
+    ]
+    if async_plugins:
+        raise ValueError(
+            f"Async plugins {', '.join(async_plugins)} require 'execution: async' in the global config."
+        )
+
+def subscribe(subscriptions: List, metrics: PipelineMetrics,
+              checkpointer: Optional[Checkpointer] = None) -> Tuple[Iterator[Entry], List[StageMetrics]]:
+    """Chains the subscriptions' output; returns the stream and its stages."""
+    upstream = [metrics.stage(sub.name, "subscription") for sub in subscriptions]
+    def source(sub: SubscriptionPlugin) -> Iterator[Entry]:
+        return checkpointer.track(sub.name, sub.execute()) if checkpointer else sub.execute()
+
+    entry_stream: Iterator[Entry] = chain(*(
+        instrument(source(sub), stage) for sub, stage in zip(subscriptions, upstream)
+    ))
+    return entry_stream, upstream
+
+def apply_filters(entry_stream: Iterator[Entry], filters: List, metrics: PipelineMetrics,
+                  upstream: List[StageMetrics],
+                  dead_letters: Optional[DeadLetterQueue] = None,
+                  prefix: str = "") -> Tuple[Iterator[Entry], List[StageMetrics]]:
+    """
+    Passes the stream through filters in this process, instrumenting each one.
+    Stage names start with `prefix` (the branch path, if any).
+    """
+    for filter_plugin in filters:
+        stage = metrics.stage(f"{prefix}{filter_plugin.name}", "filter")
+        if dead_letters is not None:
+            output = dead_letters.filter(filter_plugin, entry_stream)
+        else:
+            output = filter_plugin.execute(entry_stream)
+        entry_stream = instrument(output, stage, upstream)
+        upstream = [stage]
+    return entry_stream, upstream
+
+def publish(entry_stream: Iterator[Entry], publishers: List, global_config: Dict[str, Any],
+            metrics: PipelineMetrics, checkpointer: Optional[Checkpointer] = None,
+            dead_letters: Optional[DeadLetterQueue] = None, prefix: str = ""):
+    """Drives the publishers from the end of the filter chain."""
+    if not publishers:
+        logger.info("No publish plugins. Draining stream to activate pipeline...")
+        for _ in entry_stream: pass # Consume the iterator
+        return
+
+    publisher_stages = [metrics.stage(f"{prefix}{publisher.name}", "publish") for publisher in publishers]
+    if len(publishers) == 1:
+        consume = publisher_consumer(publishers[0], checkpointer, dead_letters)
+        measure_consumer(consume, entry_stream, publisher_stages[0])
+    else:
+        # If multiple publishers, drive them concurrently from bounded queues
+        fanout_config = global_config.get("fanout") or {}
+        logger.info("Dispatching stream to %d publishers concurrently", len(publishers))
+        errors = fan_out(
+            entry_stream,
+            publishers,
+            max_queue=int(fanout_config.get("max_queue", 1000)),
+            policy=fanout_config.get("on_slow_sink", "block"),
+            spill_dir=fanout_config.get("spill_dir"),
+            stages=publisher_stages,
+            checkpointer=checkpointer,
+            dead_letters=dead_letters,
+        )
+        if errors:
+            failed = ", ".join(errors)
+            raise RuntimeError(f"Publishers failed: {failed}") from next(iter(errors.values()))
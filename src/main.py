@@ -1,110 +1,187 @@
 # src/main.py
 
-import yaml
-import importlib
+import argparse
+import json
+import logging
 import sys
 import os
-import re
-from itertools import chain, tee
-from typing import List, Dict, Any, Iterator
+from functools import partial
+from typing import Any, Dict, List
 
 # Add the 'src' directory to the Python path to allow sibling imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
 
-from plugins.base import Entry, SubscriptionPlugin, FilterPlugin, PublishPlugin
-
-def to_snake_case(name: str) -> str:
-    """Converts a CamelCase name to snake_case."""
-    # More specific regex to avoid adding underscore where not needed (e.g., after another underscore)
-    name = re.sub('([a-zA-Z0-9])([A-Z][a-z]+)', r'\1_\2', name)
-    return re.sub('([a-z0-9])([A-Z])', r'\1_\2', name).lower()
-
-def load_plugin(plugin_config: Dict[str, Any]):
-    """Dynamically loads and instantiates a plugin based on its config."""
-    module_str = plugin_config.get("module")
-    if not module_str:
-        raise ValueError("Plugin config must have a 'module' key.")
-
-    try:
-        # Get the part of the name after the first '::' (e.g., "GoogleKeep", "LLM::Vectorize")
-        name_part = module_str.split("::", 1)[1]
-        # Handle names with multiple '::' like 'LLM::Vectorize'
-        module_identifier = "_".join(name_part.split("::"))
-        # Convert the identifier to snake_case for the filename (e.g., "llm_vectorize")
-        module_filename = to_snake_case(module_identifier)
-
-        # This logic is based on the assumption that a plugin like 'Publish::BigQuery'
-        # will correspond to a file named 'plugins/big_query.py'.
-        # We will create/rename this file in a later step if needed.
-        if module_filename == "bigquery": # Handle this specific case for now
-            module_filename = "bigquery"
-
-        module_path = f"plugins.{module_filename}"
-
-        print(f"Loading plugin: '{module_str}' from '{module_path}'")
-
-        plugin_module = importlib.import_module(module_path)
-        plugin_class = plugin_module.Plugin
-
-        return plugin_class(plugin_config.get("config", {}))
-
-    except (ValueError, ImportError, AttributeError) as e:
-        print(f"FATAL: Error loading plugin '{module_str}'. Module path '{module_path}.py' might be incorrect. Error: {e}")
-        raise e
-
-def run_pipeline(config_path: str):
-    """Loads config and runs the full data pipeline."""
-    try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
-    except (IOError, yaml.YAMLError) as e:
-        print(f"Error loading or parsing {config_path}: {e}")
-        return
-
-    plugin_configs = config.get("plugins", [])
-    if not plugin_configs:
-        print("No plugins defined in config. Exiting.")
-        return
+# Only the light modules are imported here: the engine and the plugins (with
+# their SDKs) are imported once a pipeline actually runs, which keeps
+# --validate and --dry-run fast.
+from core.config import load_config, validate_config
+from plugins.registry import create_plugin, resolve
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'rag.yaml')
+
+def configure_logging(level_name: str = "info"):
+    """Configures leveled logging for the whole pipeline from global.log_level."""
+    level = getattr(logging, str(level_name).upper(), None)
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log_level '{level_name}'.")
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.getLogger().setLevel(level)
+
+def describe_plan(config: Dict[str, Any]) -> List[str]:
+    """Lists the plugins a config would run, in order, without importing them."""
+    global_config = config.get("global") or {}
+    lines = [f"execution: {global_config.get('execution', 'sync')}"]
+    for plugin_config in config.get("plugins") or []:
+        spec = resolve(plugin_config["module"])
+        lines.append(f"  {spec.kind:12s} {spec.name:32s} {spec.target}")
+    lines += _describe_branches(config.get("branches") or [], "  ")
+    checkpoint = global_config.get("checkpoint") or {}
+    if checkpoint.get("path"):
+        lines.append(f"checkpoint: {checkpoint['path']}")
+    dead_letter = global_config.get("dead_letter") or {}
+    if dead_letter.get("path"):
+        lines.append(f"dead letters: {dead_letter['path']}")
+    routing = global_config.get("routing") or {}
+    if routing.get("path") and config.get("branches"):
+        lines.append(f"routes: {routing['path']}")
+    return lines
+
+def _describe_branches(branches: List[Dict[str, Any]], indent: str) -> List[str]:
+    lines = []
+    for branch in branches:
+        when = json.dumps(branch.get("when"), ensure_ascii=False) if branch.get("when") else "every entry"
+        lines.append(f"{indent}branch {branch['name']} (when: {when})")
+        for plugin_config in branch.get("plugins") or []:
+            spec = resolve(plugin_config["module"])
+            lines.append(f"{indent}  {spec.kind:12s} {spec.name:32s} {spec.target}")
+        lines += _describe_branches(branch.get("branches") or [], indent + "  ")
+    return lines
+
+def run_pipeline(config: Dict[str, Any], replay: bool = False):
+    """
+    Runs the full data pipeline described by an already validated config.
+    With `replay`, the entries of the dead-letter queue are pushed back
+    through the stages they failed in, instead of reading the subscriptions.
+    """
+    from core.async_runner import run_async_pipeline
+    from core.checkpoint import open_checkpointer
+    from core.dag import build_branches, flatten, open_routing
+    from core.dead_letter import open_dead_letters
+    from core.metrics import PipelineMetrics
+    from core.sharded import run_sharded_pipeline
+    from core.sync_runner import run_sync_pipeline
+
+    global_config = config.get("global") or {}
 
     # Load and categorize plugins
-    subscriptions, filters, publishers = [], [], []
-    for conf in plugin_configs:
-        instance = load_plugin(conf)
-        if isinstance(instance, SubscriptionPlugin): subscriptions.append(instance)
-        elif isinstance(instance, FilterPlugin): filters.append(instance)
-        elif isinstance(instance, PublishPlugin): publishers.append(instance)
-
-    # --- Execute the Pipeline ---
-    print("\\n--- Starting Pipeline Execution ---")
-
-    # 1. Chain all subscription plugin iterators
-    entry_stream: Iterator[Entry] = chain(*(sub.execute() for sub in subscriptions))
-
-    # 2. Pass the stream through all filter plugins
-    for filter_plugin in filters:
-        entry_stream = filter_plugin.execute(entry_stream)
-
-    # 3. Send the final stream to all publish plugins
-    if not publishers:
-        print("No publish plugins. Draining stream to activate pipeline...")
-        for _ in entry_stream: pass # Consume the iterator
-        return
-
-    if len(publishers) == 1:
-        publishers[0].execute(entry_stream)
+    plugins: Dict[str, List] = {"subscription": [], "filter": [], "publish": []}
+    for conf in config["plugins"]:
+        plugins[resolve(conf["module"]).kind].append(create_plugin(conf))
+    subscriptions, filters, publishers = plugins["subscription"], plugins["filter"], plugins["publish"]
+    # Branches route entries to their own filters and publishers
+    branches = build_branches(config.get("branches"))
+    branch_filters, branch_publishers = flatten(branches)
+    all_filters, all_publishers = filters + branch_filters, publishers + branch_publishers
+
+    execution = global_config.get("execution", "sync")
+    metrics = PipelineMetrics()
+
+    # Isolate failing entries in a dead-letter queue, if enabled
+    dead_letters = open_dead_letters(global_config.get("dead_letter"), metrics, subscriptions,
+                                     all_filters, all_publishers)
+    checkpointer = None
+    if replay:
+        if dead_letters is None:
+            raise ValueError("--replay needs global.dead_letter.path in the config.")
+        # Replays are small and route entries by identity: always one process.
+        subscriptions = [dead_letters.replay_source()]
+        execution = "sync"
     else:
-        # If multiple publishers, tee the stream so each gets all entries
-        publisher_streams = tee(entry_stream, len(publishers))
-        for i, publisher in enumerate(publishers):
-            print(f"Dispatching stream to publisher {i+1}/{len(publishers)} ({publisher.name})")
-            publisher.execute(publisher_streams[i])
+        # Resume an interrupted run from the last committed position, if enabled
+        checkpointer = open_checkpointer(global_config.get("checkpoint"), all_publishers)
+    # Remember what each branch received, to withdraw entries that stop matching
+    routing = open_routing(global_config.get("routing")) if branches else None
+    if checkpointer is not None:
+        for sub in subscriptions:
+            sub.committed = partial(checkpointer.is_committed, sub.name)
 
-    print("--- Pipeline Execution Finished ---")
+    # --- Execute the Pipeline ---
+    logger.info("--- Starting Pipeline Execution (%s%s) ---", execution, ", replay" if replay else "")
+    try:
+        if execution == "async":
+            # Every stage runs concurrently; sync plugins are adapted to threads
+            async_config = global_config.get("async") or {}
+            run_async_pipeline(subscriptions, filters, publishers,
+                               queue_size=int(async_config.get("queue_size", 100)),
+                               metrics=metrics, checkpointer=checkpointer, dead_letters=dead_letters)
+        elif execution == "sharded":
+            # CPU-bound filters run on worker processes, one shard of the entries each
+            run_sharded_pipeline(subscriptions, filters, publishers, global_config, metrics,
+                                 checkpointer, dead_letters)
+        else:
+            run_sync_pipeline(subscriptions, filters, publishers, global_config, metrics,
+                              checkpointer, dead_letters, branches, routing)
+        for sub in subscriptions:
+            sub.complete()
+        if checkpointer is not None:
+            checkpointer.complete()
+        if routing is not None:
+            routing.complete()
+        if dead_letters is not None:
+            dead_letters.complete()
+    finally:
+        if checkpointer is not None:
+            # Keeps the commits of a failed run, so the next one resumes.
+            checkpointer.store.close()
+        if routing is not None:
+            routing.close()
+        if dead_letters is not None:
+            dead_letters.store.close()
+        # Written even when the run fails, to help find out where and why.
+        metrics.write(global_config.get("metrics") or {})
+
+    logger.info("--- Pipeline Execution Finished ---")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the SHIORI pipeline described by rag.yaml.")
+    parser.add_argument("config", nargs="?", default=DEFAULT_CONFIG_PATH,
+                        help="Path to the pipeline config (default: rag.yaml next to src/)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--validate", action="store_true",
+                      help="Check the config and exit, without importing any plugin")
+    mode.add_argument("--dry-run", action="store_true",
+                      help="Check the config and print the pipeline it would run")
+    mode.add_argument("--replay", action="store_true",
+                      help="Push the entries of the dead-letter queue (global.dead_letter) back through the pipeline")
+    args = parser.parse_args(argv)
 
-def main():
-    # Assume rag.yaml is in the parent directory of 'src'
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'rag.yaml')
-    run_pipeline(config_path)
+    try:
+        config = load_config(args.config)
+    except (OSError, ValueError) as e:
+        print(f"Error loading {args.config}: {e}", file=sys.stderr)
+        return 2
+
+    errors = validate_config(config)
+    if errors:
+        print(f"{args.config} is invalid:", file=sys.stderr)
+        for error in errors:
+            print(f"  - {error}", file=sys.stderr)
+        return 1
+    if args.validate:
+        print(f"{args.config}: OK")
+        return 0
+    if args.dry_run:
+        print("\n".join(describe_plan(config)))
+        return 0
+    if args.replay and not ((config.get("global") or {}).get("dead_letter") or {}).get("path"):
+        print(f"{args.config}: --replay needs global.dead_letter.path.", file=sys.stderr)
+        return 1
+
+    configure_logging((config.get("global") or {}).get("log_level", "info"))
+    run_pipeline(config, replay=args.replay)
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,191 @@
+# src/plugins/attachments.py
+
+"""
+Attachment handling shared by Subscription::GoogleKeep and
+Filter::ImageDescription: streamed hashing, bounded-memory loading of
+images, and an image describer that describes each distinct image once.
+"""
+
+import base64
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+from .cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 16
+# Gemini accepts larger inline images, but nothing is gained past ~1 MP.
+DEFAULT_MAX_SIDE = 1024
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+def file_sha256(path: str) -> str:
+    """Hashes a file in fixed-size chunks, without reading it whole."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_pillow = None
+
+def _import_pillow():
+    """Returns PIL.Image if Pillow is installed (it is optional), else None."""
+    global _pillow
+    if _pillow is None:
+        try:
+            from PIL import Image
+            _pillow = Image
+        except ImportError:
+            _pillow = False
+    return _pillow or None
+
+
+def load_image(path: str, mimetype: str, max_side: int = DEFAULT_MAX_SIDE,
+               max_bytes: int = DEFAULT_MAX_BYTES) -> Tuple[bytes, str]:
+    """
+    Returns the bytes and MIME type of an image to send to a model.
+
+    Images within `max_side` pixels and `max_bytes` are sent as they are.
+    Larger ones are downscaled with Pillow, if installed: JPEGs are decoded
+    directly at a reduced scale, so a 50 MP photo never needs its full-size
+    bitmap in memory. Without Pillow, images over `max_bytes` are refused.
+    """
+    size = os.path.getsize(path)
+    Image = _import_pillow()
+    if Image is not None:
+        try:
+            with Image.open(path) as image:  # reads the header only
+                if size > max_bytes or max(image.size) > max_side:
+                    image.draft("RGB", (max_side, max_side))
+                    image = image.convert("RGB")
+                    image.thumbnail((max_side, max_side))
+                    out = io.BytesIO()
+                    image.save(out, "JPEG", quality=85)
+                    return out.getvalue(), "image/jpeg"
+        except OSError as e:
+            logger.debug("Pillow cannot read %s (%s); sending it as is.", path, e)
+    if size > max_bytes:
+        raise ValueError(
+            f"{path} is {size} bytes, more than max_image_bytes ({max_bytes}); install Pillow to downscale it."
+        )
+    with open(path, 'rb') as f:
+        return f.read(), mimetype
+
+
+class ImageDescriber:
+    """
+    Describes images with a multimodal model (`backend: vertex`, through the
+    shared LLM client) or a mock.
+
+    Images are identified by a hash of their content: an image that is
+    attached to several notes, or copied under several names, is described
+    once. Descriptions are kept in memory for the run (`memo_size` images)
+    and, with a ResultCache, across runs. Concurrent requests for the same
+    image wait for the first one. Thread-safe.
+    """
+    def __init__(self, backend: str = "mock", model: str = "gemini-1.5-flash",
+                 prompt: str = "Describe this image in one or two sentences.",
+                 llm: Optional[Dict[str, Any]] = None, cache: Optional[ResultCache] = None,
+                 max_side: int = DEFAULT_MAX_SIDE, max_bytes: int = DEFAULT_MAX_BYTES,
+                 mock_latency: float = 0.0, memo_size: int = 10000):
+        if backend not in ("mock", "vertex"):
+            raise ValueError(f"Unknown image backend '{backend}'. Use 'mock' or 'vertex'.")
+        self.backend = backend
+        self.model = model
+        self.prompt = prompt
+        self.llm = llm or {}
+        self.cache = cache
+        self.max_side = max_side
+        self.max_bytes = max_bytes
+        self.mock_latency = mock_latency
+        self.memo_size = memo_size
+        self.stats = {"described": 0, "deduplicated": 0, "cached": 0, "failed": 0}
+        self._lock = threading.Lock()
+        self._memo: "OrderedDict[str, str]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _call_model(self, path: str, mimetype: str) -> Optional[str]:
+        if self.backend == "vertex":
+            from .llm_client import shared_client
+            data, mimetype = load_image(path, mimetype, self.max_side, self.max_bytes)
+            payload = base64.b64encode(data).decode("ascii")
+            del data
+            return shared_client(self.llm).generate(self.model, [
+                {"text": self.prompt},
+                {"inlineData": {"mimeType": mimetype, "data": payload}},
+            ]).strip() or None
+
+        logger.debug("[Gemini MOCK] Describing image at: %s", path)
+        if self.mock_latency:
+            time.sleep(self.mock_latency)
+        return f"This is a mock description for the image '{os.path.basename(path)}'."
+
+    def _describe_new(self, key: str, path: str, mimetype: str) -> Optional[str]:
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._count("cached")
+                return cached.decode("utf-8")
+        from .llm_client import LLMError
+        try:
+            description = self._call_model(path, mimetype)
+        except (OSError, ValueError, LLMError) as e:
+            logger.warning("Could not describe image %s: %s", path, e)
+            self._count("failed")
+            return None
+        self._count("described")
+        if description and self.cache is not None:
+            self.cache.put(key, description.encode("utf-8"))
+        return description
+
+    def describe(self, path: str, mimetype: str = "image/jpeg") -> Optional[str]:
+        """Returns a description of the image at `path`, or None if it cannot be described."""
+        try:
+            digest = file_sha256(path)
+        except OSError as e:
+            logger.warning("Could not read image %s: %s", path, e)
+            self._count("failed")
+            return None
+        key = ResultCache.make_key(digest, self.model, self.prompt)
+
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                self.stats["deduplicated"] += 1
+                return self._memo[key]
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+        if not owner:
+            self._count("deduplicated")
+            return future.result()
+
+        try:
+            description = self._describe_new(key, path, mimetype)
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            if description:  # failures are retried by later requests
+                self._memo[key] = description
+                if len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+        future.set_result(description)
+        return description
@@ -1,20 +1,114 @@
 # src/plugins/base.py
 
-from dataclasses import dataclass, field
-from typing import List, Dict, Any, Iterator
+import copy
+from array import array
+from typing import List, Dict, Any, Callable, Iterable, Iterator, AsyncIterator, Optional, Sequence, Union
+
+# Metadata key marking an entry as a tombstone: the record it refers to was
+# deleted at the source and should be removed by publishers.
+TOMBSTONE_KEY = "deleted"
+
+# Set to "<index>/<count>" in the worker processes of a sharded run, so that
+# plugins can divide process-wide resources (such as API quotas) between them.
+SHARD_ENV = "SHIORI_SHARD"
+
+# A contiguous float32 buffer: array('f'), a 'f'-format memoryview or a
+# float32 NumPy array. Lists and other sequences are converted on assignment.
+Vector = Union[array, memoryview, Sequence[float]]
+
+def as_float32(values: Vector) -> Vector:
+    """
+    Returns `values` as a contiguous float32 buffer.
+    Buffers that already are one (array('f'), memoryviews of mmap'ed files,
+    float32 NumPy arrays) are kept as-is, without copying.
+    """
+    if isinstance(values, array) and values.typecode == 'f':
+        return values
+    try:
+        view = memoryview(values)
+    except TypeError:
+        return array('f', values)
+    if view.format == 'f' and view.ndim == 1 and view.c_contiguous:
+        return values
+    return array('f', view.tolist())
+
+
+def vector_bytes(values: Vector) -> memoryview:
+    """Returns a zero-copy byte view of a float32 vector, for serialization."""
+    return memoryview(as_float32(values)).cast('B')
+
 
-@dataclass
 class Entry:
     """
     Represents a single piece of data processed by the pipeline.
     This is the common data structure passed between plugins.
+
+    Entries use __slots__ and store their vector as a contiguous float32
+    buffer, so a 768-dimensional vector costs 3 KB rather than a list of
+    boxed floats. Assigning a list still works: it is converted once.
     """
-    id: str
-    source: str
-    content: str
-    vector: List[float] = field(default_factory=list)
-    metadata: Dict[str, Any] = field(default_factory=dict)
-    timestamp: int = 0
+    __slots__ = ("id", "source", "content", "_vector", "metadata", "timestamp")
+
+    def __init__(
+        self,
+        id: str,
+        source: str,
+        content: str,
+        vector: Optional[Vector] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        timestamp: int = 0,
+    ):
+        self.id = id
+        self.source = source
+        self.content = content
+        self.vector = vector if vector is not None else array('f')
+        self.metadata = metadata if metadata is not None else {}
+        self.timestamp = timestamp
+
+    @property
+    def vector(self) -> Vector:
+        return self._vector
+
+    @vector.setter
+    def vector(self, values: Vector):
+        self._vector = as_float32(values)
+
+    @property
+    def is_tombstone(self) -> bool:
+        """True if this entry announces the deletion of a previously published entry."""
+        return bool(self.metadata.get(TOMBSTONE_KEY))
+
+    def copy(self) -> "Entry":
+        """
+        Returns a copy that can be modified independently, such as one sent
+        down a second branch of the pipeline. The metadata is copied deeply;
+        the vector buffer is shared, since stages replace vectors rather than
+        write into them.
+        """
+        return Entry(self.id, self.source, self.content, self._vector,
+                     copy.deepcopy(self.metadata), self.timestamp)
+
+    def __reduce__(self):
+        # memoryviews cannot be pickled; send vectors as compact arrays instead.
+        vector = self._vector
+        if not isinstance(vector, array):
+            vector = array('f', vector_bytes(vector).tobytes()) if len(vector) else array('f')
+        return (Entry, (self.id, self.source, self.content, vector, self.metadata, self.timestamp))
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Entry):
+            return NotImplemented
+        return (self.id == other.id
+                and self.source == other.source
+                and self.content == other.content
+                and self.metadata == other.metadata
+                and self.timestamp == other.timestamp
+                and vector_bytes(self._vector) == vector_bytes(other._vector))
+
+    def __repr__(self) -> str:
+        return (f"Entry(id={self.id!r}, source={self.source!r}, content={self.content[:40]!r}, "
+                f"vector=<{len(self._vector)} x float32>, metadata={self.metadata!r}, "
+                f"timestamp={self.timestamp!r})")
 
 
 class BasePlugin:
@@ -31,6 +125,37 @@ class BasePlugin:
 
 class SubscriptionPlugin(BasePlugin):
     """Base class for plugins that subscribe to data sources."""
+    # Set by the engine when resuming an interrupted run; see `is_committed`.
+    committed: Optional[Callable[[str, Optional[str]], bool]] = None
+    # Set by the engine when failures go to a dead-letter queue; see `fail`.
+    on_failure: Optional[Callable[[str, BaseException], None]] = None
+
+    def is_committed(self, entry_id: str, version: Optional[str] = None) -> bool:
+        """
+        True if every publisher already committed this entry in an interrupted
+        run, at `version` (the entry's `content_hash`) if given. Plugins that
+        know an entry's ID, or better its version, before parsing it may skip it.
+        """
+        return self.committed is not None and self.committed(entry_id, version)
+
+    def fail(self, reference: str, error: BaseException) -> bool:
+        """
+        Reports an item of the source (a file, a message) that could not be
+        turned into an entry. Returns True if it was sent to the dead-letter
+        queue; otherwise the plugin decides whether to skip it or raise.
+        """
+        if self.on_failure is None:
+            return False
+        self.on_failure(reference, error)
+        return True
+
+    def complete(self):
+        """
+        Called once the whole run succeeded, every publisher having returned.
+        Subscriptions that keep state between runs (such as a change
+        manifest) write it here, so that a failed run is read again.
+        """
+
     def execute(self) -> Iterator[Entry]:
         """Subscribes to a data source and yields Entry objects."""
         raise NotImplementedError(
@@ -40,7 +165,36 @@ class SubscriptionPlugin(BasePlugin):
 
 
 class FilterPlugin(BasePlugin):
-    """Base class for plugins that filter or transform entries."""
+    """
+    Base class for plugins that filter or transform entries.
+
+    In sharded runs, filters are re-created in each worker process and see
+    only the entries whose ID hashes to that worker. Filters that compare
+    entries with each other, or keep state in a single file, set
+    `shardable = False` and run in the parent process instead.
+
+    When failures go to a dead-letter queue, filters report the entries they
+    cannot process through `fail` and go on with the next one. An exception
+    that escapes `execute` ends the generator: only filters that set
+    `restartable` (a fresh `execute` call on the rest of the stream gives the
+    same result) are then restarted; for the others it aborts the run.
+    """
+    shardable = True
+    restartable = False
+    # Set by the engine when failures go to a dead-letter queue; see `fail`.
+    on_failure: Optional[Callable[[Entry, BaseException], None]] = None
+
+    def fail(self, entry: Entry, error: BaseException) -> bool:
+        """
+        Reports an entry this filter could not process. Returns True if it was
+        sent to the dead-letter queue, in which case the filter drops it and
+        carries on; otherwise the filter should raise the error.
+        """
+        if self.on_failure is None:
+            return False
+        self.on_failure(entry, error)
+        return True
+
     def execute(self, entries: Iterator[Entry]) -> Iterator[Entry]:
         """Receives, processes, and yields Entry objects."""
         raise NotImplementedError(
@@ -50,9 +204,70 @@ class FilterPlugin(BasePlugin):
 
 
 class PublishPlugin(BasePlugin):
-    """Base class for plugins that publish entries to a destination."""
+    """
+    Base class for plugins that publish entries to a destination.
+
+    Publishers that buffer writes set `commits_explicitly` and call `commit`
+    once entries are durably written, so that checkpoints never get ahead of
+    the destination. Otherwise an entry counts as committed as soon as the
+    publisher asks for the next one.
+    """
+    commits_explicitly = False
+    # Set by the engine when checkpoints are enabled.
+    on_commit: Optional[Callable[[List[str]], None]] = None
+    # Set by the engine when failures go to a dead-letter queue, to tell the
+    # entries a failing publisher had written from the ones it had not.
+    on_written: Optional[Callable[[List[str]], None]] = None
+
+    def commit(self, entry_ids: Iterable[str]):
+        """Reports entries as durably written to the destination."""
+        entry_ids = list(entry_ids)
+        if self.on_written is not None:
+            self.on_written(entry_ids)
+        if self.on_commit is not None:
+            self.on_commit(entry_ids)
+
     def execute(self, entries: Iterator[Entry]):
         """Receives Entry objects and publishes them."""
         raise NotImplementedError(
             f"PublishPlugin {self.name} must implement 'execute' to publish Entries."
         )
+
+
+class AsyncSubscriptionPlugin(BasePlugin):
+    """Base class for subscription plugins implemented as async generators."""
+    def complete(self):
+        """Called once the whole run succeeded; see `SubscriptionPlugin.complete`."""
+
+    async def execute(self) -> AsyncIterator[Entry]:
+        """Subscribes to a data source and yields Entry objects asynchronously."""
+        raise NotImplementedError(
+            f"AsyncSubscriptionPlugin {self.name} must implement 'execute' to yield Entries."
+        )
+        yield
+
+
+class AsyncFilterPlugin(BasePlugin):
+    """
+    Base class for filter plugins that process one entry per coroutine.
+    The async runner keeps up to `concurrency` calls to `process` in flight
+    and emits the results in input order.
+    """
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.concurrency = int(self.config.get("concurrency", 8))
+
+    async def process(self, entry: Entry) -> Optional[Entry]:
+        """Processes one entry. Returning None drops it from the stream."""
+        raise NotImplementedError(
+            f"AsyncFilterPlugin {self.name} must implement 'process'."
+        )
+
+
+class AsyncPublishPlugin(BasePlugin):
+    """Base class for publish plugins that consume an async stream of entries."""
+    async def execute(self, entries: AsyncIterator[Entry]):
+        """Receives Entry objects asynchronously and publishes them."""
+        raise NotImplementedError(
+            f"AsyncPublishPlugin {self.name} must implement 'execute' to publish Entries."
+        )
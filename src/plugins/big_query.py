@@ -1,39 +1,254 @@
-# src/plugins/bigquery.py
+# src/plugins/big_query.py
 
+import io
 import json
-from typing import Dict, Any, Iterator
+import logging
+import random
+import time
+from typing import Dict, Any, Iterable, Iterator, List, Tuple
 from .base import Entry, PublishPlugin
 
+logger = logging.getLogger(__name__)
+
+# HTTP status codes that are worth retrying.
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+class TransientError(Exception):
+    """A retryable failure, raised by the fake client to simulate outages."""
+    code = 503
+
+
+class RowsRejected(Exception):
+    """
+    Raised once the accepted rows of a streamed batch are committed, if
+    BigQuery rejected the others (invalid rows are not retried by `_with_retries`).
+    """
+    def __init__(self, errors: List[Dict[str, Any]], rows: int):
+        super().__init__(f"BigQuery rejected {len(errors)} of {rows} rows: {errors[:3]}")
+        self.errors = errors
+
+
+class FakeBigQueryClient:
+    """
+    An offline stand-in for `google.cloud.bigquery.Client`.
+    It implements the two write paths used by the publisher and keeps the
+    rows it receives in memory. `fail_first` makes the first N calls raise a
+    TransientError, to exercise the retry logic, and `latency` (seconds) is
+    added to every call to simulate the network round trip. Streamed rows
+    whose `id` is in `reject_ids` are rejected, as invalid rows are.
+    """
+    def __init__(self, fail_first: int = 0, latency: float = 0.0, reject_ids: Iterable[str] = ()):
+        self.fail_first = fail_first
+        self.latency = latency
+        self.reject_ids = set(reject_ids)
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.calls = 0
+
+    def _maybe_fail(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_first > 0:
+            self.fail_first -= 1
+            raise TransientError("Simulated transient failure")
+
+    def insert_rows_json(self, table: str, json_rows: List[Dict[str, Any]], row_ids=None) -> List[Dict[str, Any]]:
+        self._maybe_fail()
+        errors = [{"index": i, "errors": [{"reason": "invalid"}]}
+                  for i, row in enumerate(json_rows) if row.get("id") in self.reject_ids]
+        rejected = {error["index"] for error in errors}
+        self.tables.setdefault(table, []).extend(row for i, row in enumerate(json_rows) if i not in rejected)
+        return errors
+
+    def load_table_from_file(self, file_obj, destination: str, job_config=None):
+        self._maybe_fail()
+        rows = [json.loads(line) for line in file_obj.read().splitlines() if line]
+        self.tables.setdefault(destination, []).extend(rows)
+        return _FakeLoadJob()
+
+
+class _FakeLoadJob:
+    def result(self):
+        return self
+
+
 class Plugin(PublishPlugin):
     """
     A publish plugin to send entries to Google BigQuery.
+
+    Entries are buffered into batches bounded by row count and serialized
+    size. Each row is serialized once, as compact newline-delimited JSON, and
+    every batch is flushed either through the streaming insert API
+    (`mode: streaming`) or as a load job (`mode: load`), with jittered
+    exponential backoff on transient failures. Tombstones are written as rows
+    with `deleted = true`. Entries are reported as committed only once the
+    batch holding them has been written; rows the streaming API rejects
+    raise RowsRejected, so that they are retried and, with a dead-letter
+    queue, isolated there. Rows go to BigQuery through the SDK
+    unless `client: fake` asks for the in-memory stand-in (tests, benchmarks).
     """
+    commits_explicitly = True
+
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.table_id = self.config.get("table_id")
         if not self.table_id:
             raise ValueError("Config for BigQuery plugin must contain a 'table_id'.")
 
+        self.project_id = self.config.get("project_id")
+        self.dataset = self.config.get("dataset")
+        self.mode = self.config.get("mode", "streaming")
+        if self.mode not in ("streaming", "load"):
+            raise ValueError(f"Unknown BigQuery write mode '{self.mode}'. Use 'streaming' or 'load'.")
+        self.max_batch_rows = int(self.config.get("max_batch_rows", 500))
+        self.max_batch_bytes = int(self.config.get("max_batch_bytes", 9 * 1024 * 1024))
+        self.max_retries = int(self.config.get("max_retries", 5))
+        self.retry_backoff = float(self.config.get("retry_backoff", 0.5))
+        self.client_kind = self.config.get("client", "bigquery")
+        if self.client_kind not in ("bigquery", "fake"):
+            raise ValueError(f"Unknown BigQuery client '{self.client_kind}'. Use 'bigquery' or 'fake'.")
+        if self.client_kind == "fake":
+            logger.warning("BigQuery plugin '%s' uses the in-memory fake client: NOTHING is written to %s.",
+                           self.name, self.destination)
+        self.client = None
+        self.metrics: Dict[str, Any] = {}
+
+    @property
+    def destination(self) -> str:
+        if self.project_id and self.dataset:
+            return f"{self.project_id}.{self.dataset}.{self.table_id}"
+        return self.table_id
+
+    def _make_client(self):
+        if self.client_kind == "fake":
+            return FakeBigQueryClient(latency=float(self.config.get("mock_latency", 0.0)))
+        # Imported lazily so offline runs do not need the SDK installed.
+        from google.cloud import bigquery
+        return bigquery.Client(project=self.project_id)
+
+    def _load_job_config(self):
+        if self.client_kind != "bigquery":
+            return None
+        from google.cloud import bigquery
+        return bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        )
+
+    @staticmethod
+    def to_row(entry: Entry) -> Dict[str, Any]:
+        """Converts an Entry to a BigQuery row."""
+        return {
+            "id": entry.id,
+            "source": entry.source,
+            "content": entry.content,
+            "timestamp": entry.timestamp,
+            # Stored in a JSON column, so it is sent as a string.
+            "metadata": json.dumps(entry.metadata, ensure_ascii=False, separators=(",", ":")),
+            "vector": entry.vector.tolist(),
+            "deleted": entry.is_tombstone,
+        }
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        code = getattr(error, "code", None)
+        return code in RETRYABLE_CODES or isinstance(error, (ConnectionError, TimeoutError))
+
+    def _with_retries(self, operation):
+        """Runs `operation`, retrying transient failures with jittered exponential backoff."""
+        attempt = 0
+        while True:
+            try:
+                return operation()
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    raise
+                delay = self.retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning("BigQueryPlugin: transient error (%s), retrying in %.2fs...", e, delay)
+                self.metrics["retries"] += 1
+                attempt += 1
+                time.sleep(delay)
+
+    def _flush(self, batch: List[Tuple[str, Dict[str, Any], bytes]], batch_bytes: int):
+        """Writes one batch of (row id, row, serialized row) tuples."""
+        started = time.perf_counter()
+
+        if self.mode == "streaming":
+            # The streaming API takes row objects; row_ids let BigQuery
+            # de-duplicate rows re-sent by a retry.
+            rows = [row for _, row, _ in batch]
+            row_ids = [row_id for row_id, _, _ in batch]
+            errors = self._with_retries(
+                lambda: self.client.insert_rows_json(self.destination, rows, row_ids=row_ids)
+            )
+            rejected = {error.get("index") for error in errors}
+            self.commit(row_id for i, (row_id, _, _) in enumerate(batch) if i not in rejected)
+            if errors:
+                self.metrics["failed_rows"] += len(errors)
+                raise RowsRejected(errors, len(batch))
+        else:
+            payload = b"".join(line for _, _, line in batch)
+            job_config = self._load_job_config()
+            self._with_retries(
+                lambda: self.client.load_table_from_file(
+                    io.BytesIO(payload), self.destination, job_config=job_config
+                ).result()
+            )
+            self.commit(row_id for row_id, _, _ in batch)
+
+        latency = time.perf_counter() - started
+        self.metrics["flushes"] += 1
+        self.metrics["rows"] += len(batch)
+        self.metrics["bytes"] += batch_bytes
+        self.metrics["flush_seconds"] += latency
+        self.metrics["max_flush_latency"] = max(self.metrics["max_flush_latency"], latency)
+
     def execute(self, entries: Iterator[Entry]):
         """
-        Receives Entry objects and prints them to stdout for now.
-        The actual implementation will send data to BigQuery.
+        Receives Entry objects and writes them to BigQuery in bounded batches.
         """
-        print(
-            f"Executing BigQueryPlugin: Pretending to send to '{self.table_id}'..."
+        logger.info(
+            "Executing BigQueryPlugin: Sending to '%s' (%s, client '%s')...",
+            self.destination, self.mode, self.client_kind,
         )
-        count = 0
+        if self.client is None:
+            self.client = self._make_client()
+
+        self.metrics = {
+            "rows": 0, "bytes": 0, "flushes": 0, "retries": 0, "failed_rows": 0,
+            "flush_seconds": 0.0, "max_flush_latency": 0.0,
+        }
+        started = time.perf_counter()
+
+        batch: List[Tuple[str, Dict[str, Any], bytes]] = []
+        batch_bytes = 0
         for entry in entries:
-            # Convert dataclass to a dict for printing
-            entry_dict = {
-                "id": entry.id,
-                "source": entry.source,
-                "content": entry.content,
-                "timestamp": entry.timestamp,
-                "metadata": entry.metadata,
-                "vector_preview": f"{str(entry.vector)[:50]}..."
-            }
-            print(json.dumps(entry_dict, indent=2, ensure_ascii=False))
-            count += 1
-
-        print(f"BigQueryPlugin: Processed {count} entries.")
+            row = self.to_row(entry)
+            line = (json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+            if batch and batch_bytes + len(line) > self.max_batch_bytes:
+                self._flush(batch, batch_bytes)
+                batch, batch_bytes = [], 0
+
+            batch.append((entry.id, row, line))
+            batch_bytes += len(line)
+            if len(batch) >= self.max_batch_rows:
+                self._flush(batch, batch_bytes)
+                batch, batch_bytes = [], 0
+
+        if batch:
+            self._flush(batch, batch_bytes)
+
+        elapsed = time.perf_counter() - started
+        metrics = self.metrics
+        metrics["elapsed_seconds"] = elapsed
+        metrics["rows_per_second"] = metrics["rows"] / elapsed if elapsed else 0.0
+        metrics["bytes_per_second"] = metrics["bytes"] / elapsed if elapsed else 0.0
+        metrics["mean_flush_latency"] = (
+            metrics["flush_seconds"] / metrics["flushes"] if metrics["flushes"] else 0.0
+        )
+        logger.info(
+            "BigQueryPlugin: Published %d rows (%d bytes) in %d batches; %.1f rows/s, "
+            "%.0f bytes/s, mean flush latency %.1f ms.",
+            metrics['rows'], metrics['bytes'], metrics['flushes'], metrics['rows_per_second'],
+            metrics['bytes_per_second'], metrics['mean_flush_latency'] * 1000,
+        )
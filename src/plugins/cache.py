@@ -0,0 +1,169 @@
+# src/plugins/cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+class ResultCache:
+    """
+    A persistent, content-addressed cache for model results, backed by SQLite.
+
+    Keys are derived from the content hash, the model and the prompt, so an
+    unchanged entry maps to the same key across runs. The cache is bounded by
+    entry count and/or total value size; when a bound is exceeded the least
+    recently used rows are evicted.
+    """
+    def __init__(self, path: str, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL with NORMAL sync keeps commits cheap: no fsync per write.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)")
+        self._conn.commit()
+
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        self._count = count
+        self._total_bytes = total
+
+    @staticmethod
+    def make_key(content: str, model: str, prompt: str = "") -> str:
+        """Builds a cache key from the content hash, model and prompt."""
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{model}\0{prompt}\0{content_hash}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns the cached value for a key, or None on a miss."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        """Looks up several keys at once and returns the ones that were found."""
+        if not keys:
+            return {}
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit.
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update((key, bytes(value)) for key, value in rows)
+
+            if found:
+                now = time.time_ns()
+                self._conn.executemany(
+                    "UPDATE cache SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, key: str, value: bytes):
+        """Stores a single value."""
+        self.put_many([(key, value)])
+
+    def put_many(self, items: Iterable[Tuple[str, bytes]]):
+        """Stores several values in one transaction and evicts if over budget."""
+        items = list(items)
+        if not items:
+            return
+        with self._lock:
+            now = time.time_ns()
+            for key, value in items:
+                row = self._conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+                if row:
+                    self._count -= 1
+                    self._total_bytes -= row[0]
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, sqlite3.Binary(value), len(value), now),
+                )
+                self._count += 1
+                self._total_bytes += len(value)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Removes least recently used rows until the cache is within its bounds."""
+        while ((self.max_entries is not None and self._count > self.max_entries)
+               or (self.max_bytes is not None and self._total_bytes > self.max_bytes and self._count > 0)):
+            excess = 1
+            if self.max_entries is not None and self._count > self.max_entries:
+                excess = self._count - self.max_entries
+            rows = self._conn.execute(
+                "SELECT key, size FROM cache ORDER BY last_access LIMIT ?", (excess,)
+            ).fetchall()
+            if not rows:
+                break
+            self._conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key, _ in rows])
+            self._count -= len(rows)
+            self._total_bytes -= sum(size for _, size in rows)
+            self.evictions += len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss/eviction counters and the current cache size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": self._count,
+            "bytes": self._total_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_shared_caches: Dict[str, ResultCache] = {}
+_shared_lock = threading.Lock()
+
+def open_cache(config: Optional[Dict[str, Any]]) -> Optional[ResultCache]:
+    """
+    Returns the cache described by a plugin's `cache` config section, or None
+    if caching is not configured. Plugins that point at the same path share
+    one instance, and therefore one set of counters.
+    """
+    if not config:
+        return None
+    path = config.get("path")
+    if not path:
+        raise ValueError("Cache config must contain a 'path'.")
+
+    key = os.path.abspath(path)
+    with _shared_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = ResultCache(
+                path,
+                max_entries=config.get("max_entries"),
+                max_bytes=config.get("max_bytes"),
+            )
+            _shared_caches[key] = cache
+        return cache
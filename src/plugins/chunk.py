@@ -0,0 +1,230 @@
+# src/plugins/chunk.py
+
+import json
+import logging
+import math
+import os
+import re
+from collections import deque
+from typing import Dict, Any, Generator, Iterator, Optional, Tuple
+
+from .base import Entry, FilterPlugin, TOMBSTONE_KEY
+from .tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Sentence ends: Japanese and Western terminal punctuation (with closing
+# quotes or brackets), a period followed by whitespace, or line breaks.
+SENTENCE_END = re.compile(r'[。！？!?．]+[」』）)"\']*\s*|\.(?:\s+|$)|\n+')
+
+def iter_sentences(text: str) -> Iterator[Tuple[int, int]]:
+    """Yields the (start, end) offsets of each sentence; together they cover the text."""
+    position = 0
+    for match in SENTENCE_END.finditer(text):
+        end = match.end()
+        if end > position:
+            yield position, end
+            position = end
+    if position < len(text):
+        yield position, len(text)
+
+
+def split_long(text: str, start: int, end: int, max_tokens: int) -> Iterator[Tuple[int, int]]:
+    """
+    Splits text[start:end] into pieces of at most `max_tokens`, preferring to
+    cut after whitespace when the text has any (it rarely does in Japanese).
+    """
+    piece_start = start
+    tokens = 0.0
+    last_space = -1
+    for i in range(start, end):
+        ch = text[i]
+        tokens += 0.25 if ch < '\x80' else 1.0
+        if ch.isspace():
+            last_space = i + 1
+        if tokens > max_tokens:
+            cut = last_space if last_space > piece_start + (i - piece_start) // 2 else i
+            yield piece_start, cut
+            piece_start = cut
+            tokens = float(estimate_tokens(text[cut:i + 1]))
+            last_space = -1
+    if piece_start < end:
+        yield piece_start, end
+
+
+def iter_chunks(text: str, max_tokens: int, overlap_tokens: int = 0) -> Iterator[Tuple[int, int]]:
+    """
+    Yields (start, end) offsets of sentence-aligned chunks of at most
+    `max_tokens`, where consecutive chunks share about `overlap_tokens` of
+    trailing sentences.
+
+    The chunk size targets an even split of the whole text, so the last
+    chunk is not a small remainder. Offsets are produced one chunk at a
+    time; only the sentences of the current chunk are held in memory.
+    """
+    total = estimate_tokens(text)
+    step = max_tokens - overlap_tokens
+    count = max(1, math.ceil(max(0, total - overlap_tokens) / step))
+    target = min(max_tokens, math.ceil(max(0, total - overlap_tokens) / count) + overlap_tokens)
+
+    def units() -> Iterator[Tuple[int, int, int]]:
+        for start, end in iter_sentences(text):
+            tokens = estimate_tokens(text[start:end])
+            if tokens <= max_tokens:
+                yield start, end, tokens
+            else:
+                # Overlong sentences are cut at the target size, keeping chunks even.
+                for piece_start, piece_end in split_long(text, start, end, target):
+                    yield piece_start, piece_end, estimate_tokens(text[piece_start:piece_end])
+
+    window: deque = deque()
+    window_tokens = 0
+    fresh = False  # whether the window holds anything not yet emitted
+    for unit in units():
+        if window and window_tokens + unit[2] > max_tokens:
+            if fresh:
+                yield window[0][0], window[-1][1]
+                fresh = False
+            # Keep trailing sentences as the overlap, if they leave room.
+            while window and (window_tokens > overlap_tokens or window_tokens + unit[2] > max_tokens):
+                window_tokens -= window.popleft()[2]
+        window.append(unit)
+        window_tokens += unit[2]
+        fresh = True
+        if window_tokens >= target:
+            yield window[0][0], window[-1][1]
+            fresh = False
+            while window and window_tokens > overlap_tokens:
+                window_tokens -= window.popleft()[2]
+    if fresh:
+        yield window[0][0], window[-1][1]
+
+
+class Plugin(FilterPlugin):
+    """
+    A filter plugin that splits long entries into overlapping chunks.
+
+    Entries estimated at more than `max_tokens` are replaced by sub-entries
+    `<id>#<n>` holding sentence-aligned chunks of similar size, each sharing
+    about `overlap_tokens` with the previous one and linked to the original
+    through `parent_id` metadata. Shorter entries pass through unchanged.
+
+    With `state_path`, the number of chunks per entry (0 for entries passed
+    through whole) is remembered across runs, so that tombstones and
+    shrinking notes also delete stale chunks, and an entry published whole
+    is deleted once it grows long enough to be chunked.
+    """
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.max_tokens = int(self.config.get("max_tokens", 512))
+        self.overlap_tokens = int(self.config.get("overlap_tokens", 64))
+        if not 0 <= self.overlap_tokens <= self.max_tokens // 2:
+            raise ValueError("'overlap_tokens' must be between 0 and half of 'max_tokens'.")
+        self.state_path = self.config.get("state_path")
+        # The state is one file, rewritten as a whole at the end of a run.
+        self.shardable = not self.state_path
+
+    def _load_state(self) -> Dict[str, int]:
+        if not self.state_path:
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_state(self, state: Dict[str, int]):
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def _tombstone(entry: Entry) -> Entry:
+        return Entry(id=entry.id, source=entry.source, content="", metadata={TOMBSTONE_KEY: True})
+
+    @staticmethod
+    def _chunk_tombstone(parent: Entry, index: int) -> Entry:
+        return Entry(
+            id=f"{parent.id}#{index}",
+            source=parent.source,
+            content="",
+            metadata={TOMBSTONE_KEY: True, "parent_id": parent.id},
+        )
+
+    def _chunks(self, entry: Entry) -> Iterator[Entry]:
+        text = entry.content
+        for index, (start, end) in enumerate(iter_chunks(text, self.max_tokens, self.overlap_tokens)):
+            metadata = dict(entry.metadata)
+            metadata.update({
+                "parent_id": entry.id,
+                "chunk_index": index,
+                "chunk_start": start,
+                "chunk_end": end,
+            })
+            yield Entry(
+                id=f"{entry.id}#{index}",
+                source=entry.source,
+                content=text[start:end].strip(),
+                metadata=metadata,
+                timestamp=entry.timestamp,
+            )
+
+    def _cut(self, entry: Entry) -> Generator[Entry, None, Optional[int]]:
+        """
+        Yields the chunks of a long entry as they are cut and returns their
+        count, or None if cutting failed and the entry was reported through `fail`.
+        """
+        chunks = self._chunks(entry)
+        count = 0
+        while True:
+            try:
+                chunk = next(chunks, None)
+            except Exception as e:
+                if self.fail(entry, e):
+                    return None
+                raise
+            if chunk is None:
+                return count
+            count += 1
+            yield chunk
+
+    def execute(self, entries: Iterator[Entry]) -> Iterator[Entry]:
+        """
+        Receives entries and yields them, with long ones replaced by chunks.
+        """
+        logger.info("Executing ChunkPlugin (max %d tokens, overlap %d)...", self.max_tokens, self.overlap_tokens)
+        state = self._load_state()
+        chunked = produced = 0
+
+        for entry in entries:
+            if entry.is_tombstone or estimate_tokens(entry.content) <= self.max_tokens:
+                count = 0
+                yield entry
+            else:
+                count = yield from self._cut(entry)
+                if count is None:
+                    # The state is only updated once the entry is fully
+                    # chunked: it went to the dead-letter queue, the run goes on.
+                    continue
+            previous = state.get(entry.id)
+            if count:
+                chunked += 1
+                produced += count
+                state[entry.id] = count
+            elif entry.is_tombstone or not self.state_path:
+                state.pop(entry.id, None)
+            else:
+                state[entry.id] = 0
+            if count and previous == 0:
+                # Published whole until now: replaced by its chunks.
+                yield self._tombstone(entry)
+            # Chunks the entry had before but no longer has are deleted.
+            for index in range(count, previous or 0):
+                yield self._chunk_tombstone(entry, index)
+
+        if self.state_path:
+            self._save_state(state)
+        logger.info("ChunkPlugin: split %d entries into %d chunks.", chunked, produced)
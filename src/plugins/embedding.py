@@ -0,0 +1,164 @@
+# src/plugins/embedding.py
+
+import hashlib
+import struct
+import time
+from array import array
+from typing import Dict, Any, Iterator, List, Callable, Optional
+
+from .base import Entry, Vector
+from .tokens import estimate_tokens
+
+class EmbeddingBackend:
+    """
+    Base class for embedding backends.
+    A backend receives a batch of texts and returns one vector per text, in
+    order. Returning array('f') vectors avoids a conversion on assignment.
+    """
+    def __init__(self, model: str, config: Dict[str, Any]):
+        self.model = model
+        self.config = config
+
+    @property
+    def settings(self) -> str:
+        """
+        The backend settings, besides the model, that change the vectors it
+        returns (such as their dimension), for cache keys. Empty if none.
+        """
+        return ""
+
+    def embed(self, texts: List[str]) -> List[Vector]:
+        raise NotImplementedError(
+            f"EmbeddingBackend {self.__class__.__name__} must implement 'embed'."
+        )
+
+
+class MockEmbeddingBackend(EmbeddingBackend):
+    """
+    [MOCK] Returns the same fixed-size dummy vector for every text.
+    A real text-embedding-004 vector would have 768 dimensions.
+    `mock_latency` (seconds) simulates the round trip of each batch call.
+    """
+    def __init__(self, model: str, config: Dict[str, Any]):
+        super().__init__(model, config)
+        self._template = array('f', [0.1, 0.2, 0.3] * 256)
+        self.latency = float(self.config.get("mock_latency", 0.0))
+
+    def embed(self, texts: List[str]) -> List[Vector]:
+        if self.latency:
+            time.sleep(self.latency)
+        # Each entry gets its own copy, so in-place edits do not leak between entries.
+        return [array('f', self._template) for _ in texts]
+
+
+class HashEmbeddingBackend(EmbeddingBackend):
+    """
+    A deterministic local stand-in that derives a unit vector from the text's hash.
+    Different texts get different vectors, which makes it useful for exercising
+    similarity search and caching without calling a real model.
+    """
+    def __init__(self, model: str, config: Dict[str, Any]):
+        super().__init__(model, config)
+        self.dimensions = int(self.config.get("dimensions", 768))
+
+    @property
+    def settings(self) -> str:
+        return f"dimensions={self.dimensions}"
+
+    def _embed_one(self, text: str) -> Vector:
+        values: List[float] = []
+        counter = 0
+        while len(values) < self.dimensions:
+            digest = hashlib.sha256(f"{counter}:{text}".encode()).digest()
+            # Map each 4-byte word to a float in [-1, 1)
+            for (word,) in struct.iter_unpack(">I", digest):
+                values.append(word / 2**31 - 1.0)
+            counter += 1
+        values = values[:self.dimensions]
+        norm = sum(v * v for v in values) ** 0.5 or 1.0
+        return array('f', [v / norm for v in values])
+
+    def embed(self, texts: List[str]) -> List[Vector]:
+        return [self._embed_one(text) for text in texts]
+
+
+class VertexEmbeddingBackend(EmbeddingBackend):
+    """
+    Embeds texts with a Vertex AI text embedding model through the shared
+    LLM client (`llm` config section), which enforces the quotas configured
+    for the model. Batches larger than `max_instances` are split.
+    """
+    def __init__(self, model: str, config: Dict[str, Any]):
+        super().__init__(model, config)
+        from .llm_client import shared_client
+        self.client = shared_client(self.config.get("llm") or {})
+        self.max_instances = int(self.config.get("max_instances", 250))
+
+    def embed(self, texts: List[str]) -> List[Vector]:
+        vectors: List[Vector] = []
+        for start in range(0, len(texts), self.max_instances):
+            values = self.client.embed(self.model, texts[start:start + self.max_instances])
+            vectors.extend(array('f', vector) for vector in values)
+        return vectors
+
+
+BACKENDS: Dict[str, Callable[[str, Dict[str, Any]], EmbeddingBackend]] = {
+    "mock": MockEmbeddingBackend,
+    "hash": HashEmbeddingBackend,
+    "vertex": VertexEmbeddingBackend,
+}
+
+def get_backend(name: str, model: str, config: Dict[str, Any]) -> EmbeddingBackend:
+    """Instantiates the embedding backend registered under `name`."""
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown embedding backend '{name}'. Available: {', '.join(sorted(BACKENDS))}"
+        )
+    return backend_class(model, config)
+
+
+def iter_batches(
+    entries: Iterator[Entry],
+    max_size: int = 32,
+    max_tokens: Optional[int] = None,
+    max_wait: Optional[float] = None,
+    clock: Callable[[], float] = time.monotonic,
+) -> Iterator[List[Entry]]:
+    """
+    Groups an entry stream into batches, preserving the original order.
+
+    A batch is closed when it holds `max_size` entries, when adding the next
+    entry would exceed `max_tokens` (estimated from the content), or when
+    `max_wait` seconds have passed since the batch was opened. The wait limit
+    is checked as entries arrive, so a slow upstream still receives partial
+    batches promptly once it produces its next entry. An entry that alone
+    exceeds `max_tokens` is sent as a batch of its own.
+    """
+    if max_size < 1:
+        raise ValueError("Batch 'max_size' must be at least 1.")
+
+    batch: List[Entry] = []
+    batch_tokens = 0
+    batch_started = 0.0
+
+    for entry in entries:
+        tokens = estimate_tokens(entry.content) if max_tokens else 0
+        if batch and max_tokens and batch_tokens + tokens > max_tokens:
+            yield batch
+            batch, batch_tokens = [], 0
+
+        if not batch:
+            batch_started = clock()
+        batch.append(entry)
+        batch_tokens += tokens
+
+        if (len(batch) >= max_size
+                or (max_tokens and batch_tokens >= max_tokens)
+                or (max_wait is not None and clock() - batch_started >= max_wait)):
+            yield batch
+            batch, batch_tokens = [], 0
+
+    if batch:
+        yield batch
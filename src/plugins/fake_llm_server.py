@@ -0,0 +1,190 @@
+# src/plugins/fake_llm_server.py
+
+"""
+A local stand-in for the Vertex AI model REST API, for tests and benchmarks.
+
+    python -m plugins.fake_llm_server --port 8089 --qpm 600 --tpm 200000   (from src/)
+
+Point an `llm` config at it with `endpoint: http://127.0.0.1:8089`. It
+answers `:predict` (text embeddings) and `:generateContent` (Gemini)
+requests with deterministic fake results, and enforces per-minute request
+and token quotas the way Vertex AI does: over quota, it answers 429 with a
+Retry-After header.
+"""
+
+import argparse
+import hashlib
+import json
+import struct
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from .tokens import estimate_tokens
+
+def _fake_vector(text: str, dimensions: int):
+    values = []
+    counter = 0
+    while len(values) < dimensions:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend(word / 2**31 - 1.0 for (word,) in struct.iter_unpack(">I", digest))
+        counter += 1
+    return values[:dimensions]
+
+
+class FakeLLMServer:
+    """
+    Serves the fake API on a background thread. Quotas are checked over a
+    sliding window of `window` seconds (60 like the real API; tests shorten
+    it, scaling `qpm` and `tpm` accordingly). `latency` seconds are added to
+    every accepted request.
+    """
+    def __init__(self, qpm: Optional[float] = None, tpm: Optional[float] = None, window: float = 60.0,
+                 latency: float = 0.0, dimensions: int = 768, host: str = "127.0.0.1", port: int = 0):
+        self.request_limit = qpm * window / 60 if qpm else None
+        self.token_limit = tpm * window / 60 if tpm else None
+        self.window = window
+        self.latency = latency
+        self.dimensions = dimensions
+        self.requests = 0
+        self.throttled = 0
+        self.connections = 0
+        self.bodies: Counter = Counter()
+        self._recent: deque = deque()  # (time, tokens) of accepted requests
+        self._recent_tokens = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _admit(self, tokens: int) -> Optional[float]:
+        """Records an accepted request, or returns the seconds to wait if over quota."""
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and self._recent[0][0] <= now - self.window:
+                self._recent_tokens -= self._recent.popleft()[1]
+            over_requests = self.request_limit is not None and len(self._recent) + 1 > self.request_limit
+            over_tokens = (self.token_limit is not None and self._recent
+                           and self._recent_tokens + tokens > self.token_limit)
+            if over_requests or over_tokens:
+                self.throttled += 1
+                return max(0.0, self._recent[0][0] + self.window - now) if self._recent else self.window
+            self._recent.append((now, tokens))
+            self._recent_tokens += tokens
+            return None
+
+    def handle(self, path: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any], Optional[float]]:
+        """Returns (status, JSON response, Retry-After) for one request."""
+        model, _, method = path.rsplit("/", 1)[-1].partition(":")
+        with self._lock:
+            self.requests += 1
+            self.bodies[json.dumps([model, method, body], sort_keys=True)] += 1
+
+        if method == "predict":
+            texts = [instance.get("content", "") for instance in body.get("instances", [])]
+            tokens = sum(estimate_tokens(text) for text in texts)
+        elif method == "generateContent":
+            parts = [part for content in body.get("contents", []) for part in content.get("parts", [])]
+            tokens = sum(estimate_tokens(part.get("text", "")) for part in parts)
+        else:
+            return 404, {"error": {"code": 404, "message": f"Unknown method '{method}'."}}, None
+
+        wait = self._admit(tokens)
+        if wait is not None:
+            return 429, {"error": {"code": 429, "message": "Quota exceeded.", "status": "RESOURCE_EXHAUSTED"}}, wait
+        if self.latency:
+            time.sleep(self.latency)
+
+        if method == "predict":
+            return 200, {"predictions": [
+                {"embeddings": {"values": _fake_vector(text, self.dimensions)}} for text in texts
+            ]}, None
+
+        images = sum(1 for part in parts if "inlineData" in part)
+        if body.get("generationConfig", {}).get("responseMimeType") == "application/json":
+            text = json.dumps({"tags": ["fake", model], "intent": "fake_intent"})
+        elif images:
+            text = f"A fake description of {images} image(s)."
+        else:
+            text = f"A fake answer from {model}."
+        return 200, {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}, None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    status, response, retry_after = 400, {"error": {"code": 400, "message": "Invalid JSON."}}, None
+                else:
+                    status, response, retry_after = server.handle(self.path, body)
+                payload = json.dumps(response).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if retry_after is not None:
+                    self.send_header("Retry-After", f"{retry_after:.3f}")
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a fake Vertex AI model API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--qpm", type=float, help="Requests per minute before answering 429")
+    parser.add_argument("--tpm", type=float, help="Input tokens per minute before answering 429")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--dimensions", type=int, default=768)
+    args = parser.parse_args(argv)
+
+    server = FakeLLMServer(qpm=args.qpm, tpm=args.tpm, latency=args.latency,
+                           dimensions=args.dimensions, host=args.host, port=args.port)
+    print(f"Serving a fake model API on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
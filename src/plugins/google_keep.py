@@ -1,90 +1,272 @@
 # src/plugins/google_keep.py
 
 import os
+import base64
 import json
 import hashlib
-from typing import Dict, Any, Iterator, Optional
+import logging
+import time
+from typing import Dict, Any, Iterator, Optional, Tuple
 
-from .base import Entry, SubscriptionPlugin
+from .attachments import load_image
+from .base import Entry, SubscriptionPlugin, TOMBSTONE_KEY
+from .manifest import Manifest
+from .parallel import bounded_map
+
+logger = logging.getLogger(__name__)
 
 class Plugin(SubscriptionPlugin):
     """
     A subscription plugin to fetch data from Google Keep Takeout JSON files.
     It extracts content and rich metadata for later retrieval.
+
+    In incremental mode a manifest of (mtime, size, content hash) per file is
+    kept between runs: only new or modified notes are yielded, and deleted
+    notes are announced with tombstone entries. The manifest is only written
+    once the whole run succeeded (`complete`): publishers may still buffer
+    entries when the subscription ends, and a failed run must read them
+    again (with checkpoints, the notes they committed are then skipped).
+
+    Reading, parsing and image description run on a bounded worker pool
+    (`workers`, `executor`), yielding notes in directory order unless
+    `ordered` is false. With `describe_images: false`, attachments are only
+    listed in `metadata["attachments"]` (with their local paths), for
+    Filter::ImageDescription to describe in a stage of its own.
     """
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.source_path = self.config.get("path")
         if not self.source_path:
             raise ValueError("Config for GoogleKeep plugin must contain a 'path'.")
+        self.incremental = bool(self.config.get("incremental", False))
+        self.manifest_path = self.config.get(
+            "manifest_path", os.path.join(self.source_path, ".shiori_manifest")
+        )
+        self.workers = int(self.config.get("workers", 1))
+        self.executor = self.config.get("executor", "thread")
+        self.ordered = bool(self.config.get("ordered", True))
+        self.max_in_flight = self.config.get("max_in_flight")
+        # Simulated latency of each image description call, for benchmarks.
+        self.mock_latency = float(self.config.get("mock_latency", 0.0))
+        # "mock" or "vertex" (Gemini through the shared LLM client, `llm` section)
+        self.image_backend = self.config.get("image_backend", "mock")
+        if self.image_backend not in ("mock", "vertex"):
+            raise ValueError(f"Unknown image backend '{self.image_backend}'. Use 'mock' or 'vertex'.")
+        self.describe_images = bool(self.config.get("describe_images", True))
+        self.image_model = self.config.get("image_model", "gemini-1.5-flash")
+        self.image_prompt = self.config.get("image_prompt", "Describe this image in one or two sentences.")
+        # The manifest of the last `execute`, written by `complete`.
+        self._manifest: Optional[Manifest] = None
 
-    def _describe_image_with_gemini(self, image_path: str) -> Optional[str]:
+    def _describe_image_with_gemini(self, image_path: str, mimetype: str = "image/jpeg") -> Optional[str]:
         """
-        [MOCK] Describes the content of an image using a multimodal model.
-        In a real implementation, this would call the Vertex AI Gemini API.
+        Describes the content of an image using a multimodal model.
+        The mock backend returns a placeholder description instead.
         """
-        print(f"  [Gemini MOCK] Describing image at: {image_path}")
+        if self.image_backend == "vertex":
+            # Looked up per call rather than kept on the plugin, which is
+            # pickled to the workers of a process pool.
+            from .llm_client import LLMError, shared_client
+            try:
+                # Large photos are downscaled rather than read whole.
+                data, mimetype = load_image(os.path.join(self.source_path, image_path), mimetype)
+                payload = base64.b64encode(data).decode("ascii")
+                return shared_client(self.config.get("llm") or {}).generate(self.image_model, [
+                    {"text": self.image_prompt},
+                    {"inlineData": {"mimeType": mimetype, "data": payload}},
+                ]).strip() or None
+            except (OSError, ValueError, LLMError) as e:
+                logger.warning("Could not describe image %s: %s", image_path, e)
+                return None
+
+        logger.debug("[Gemini MOCK] Describing image at: %s", image_path)
+        if self.mock_latency:
+            time.sleep(self.mock_latency)
         # This is a placeholder response.
         return f"This is a mock description for the image '{os.path.basename(image_path)}'."
 
+    @staticmethod
+    def _entry_id(filename: str) -> str:
+        # Use a hash of the filename as a stable ID, so that edits to a note
+        # update the same entry and deletions can be matched by tombstones.
+        return hashlib.sha256(filename.encode()).hexdigest()
+
+    def _parse_note(self, filename: str, raw: bytes, content_hash: str) -> Entry:
+        """Converts the raw bytes of one Takeout JSON file into an Entry."""
+        data = json.loads(raw)
+
+        content = data.get('textContent', '')
+        title = data.get('title', '')
+        if title:
+            content = f"{title}\\n\\n{content}" # Prepend title to content
+
+        # Extract desired metadata
+        metadata = {
+            "created_timestamp_usec": data.get("createdTimestampUsec"),
+            "is_archived": data.get("isArchived", False),
+            "color": data.get("color", "DEFAULT").lower(),
+            "source_file": filename,
+            "content_hash": content_hash,
+        }
+
+        # Check for image attachments and get descriptions
+        image_descriptions = []
+        if 'attachments' in data and not self.describe_images:
+            # Local paths: only recorded for Filter::ImageDescription, which removes them.
+            metadata["attachments"] = [
+                {"path": os.path.join(self.source_path, attachment["filePath"]),
+                 "mimetype": attachment.get("mimetype", "")}
+                for attachment in data['attachments'] if attachment.get("filePath")
+            ]
+        elif 'attachments' in data:
+            for attachment in data['attachments']:
+                image_path = attachment.get('filePath')
+                # Attachments without a file in the export are skipped.
+                if image_path and attachment.get('mimetype', '').startswith('image/'):
+                    description = self._describe_image_with_gemini(image_path, attachment['mimetype'])
+                    if description:
+                        image_descriptions.append(description)
+
+        if image_descriptions:
+            metadata["image_content_description"] = "\\n".join(image_descriptions)
+
+        return Entry(
+            id=self._entry_id(filename),
+            source=self.name,
+            content=content.strip(),
+            timestamp=int(data.get("createdTimestampUsec", 0) / 1000), # to millis
+            metadata=metadata,
+        )
+
+    def _tombstone(self, filename: str) -> Entry:
+        """Builds an entry announcing that a previously seen note was deleted."""
+        return Entry(
+            id=self._entry_id(filename),
+            source=self.name,
+            content="",
+            metadata={TOMBSTONE_KEY: True, "source_file": filename},
+        )
+
+    def _load_file(self, task: Tuple[str, str, Optional[str]]) -> Tuple[str, Optional[Entry]]:
+        """
+        Reads, hashes and parses one Takeout file. Runs on the worker pool.
+        Returns the content hash and the parsed Entry, or None for the entry
+        if the content matches `previous_hash`.
+        """
+        filename, file_path, previous_hash = task
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        content_hash = hashlib.sha256(raw).hexdigest()
+        if content_hash == previous_hash:
+            return content_hash, None
+        return content_hash, self._parse_note(filename, raw, content_hash)
+
     def execute(self) -> Iterator[Entry]:
         """
         Reads JSON files from the specified Google Keep takeout directory,
         parses them, extracts metadata, and yields them as Entry objects.
         """
-        print(f"Executing GoogleKeepPlugin: Reading from '{self.source_path}'...")
+        mode = "incremental" if self.incremental else "full"
+        logger.info("Executing GoogleKeepPlugin: Reading from '%s' (%s, %d workers)...", self.source_path, mode, self.workers)
 
         if not os.path.isdir(self.source_path):
-            print(f"Warning: Directory not found: {self.source_path}. Skipping.")
+            logger.warning("Directory not found: %s. Skipping.", self.source_path)
             return
 
-        for filename in os.listdir(self.source_path):
-            if not filename.endswith('.json'):
-                continue
+        manifest = Manifest(self.manifest_path) if self.incremental else None
+        self._manifest = manifest
+        seen = set()
+        stats: Dict[str, os.stat_result] = {}
+        skipped = 0
+        resumed = 0
 
-            file_path = os.path.join(self.source_path, filename)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-
-                content = data.get('textContent', '')
-                title = data.get('title', '')
-                if title:
-                    content = f"{title}\\n\\n{content}" # Prepend title to content
-
-                # Use a hash of the filename as a stable ID
-                entry_id = hashlib.sha256(filename.encode()).hexdigest()
-
-                # Extract desired metadata
-                metadata = {
-                    "created_timestamp_usec": data.get("createdTimestampUsec"),
-                    "is_archived": data.get("isArchived", False),
-                    "color": data.get("color", "DEFAULT").lower(),
-                    "source_file": filename,
-                }
-
-                # Check for image attachments and get descriptions
-                image_descriptions = []
-                if 'attachments' in data:
-                    for attachment in data['attachments']:
-                        if attachment.get('mimetype', '').startswith('image/'):
-                            # In a real scenario, we might need a full path
-                            image_path = attachment.get('filePath')
-                            description = self._describe_image_with_gemini(image_path)
-                            if description:
-                                image_descriptions.append(description)
-
-                if image_descriptions:
-                    metadata["image_content_description"] = "\\n".join(image_descriptions)
-
-                yield Entry(
-                    id=entry_id,
-                    source=self.name,
-                    content=content.strip(),
-                    timestamp=int(data.get("createdTimestampUsec", 0) / 1000), # to millis
-                    metadata=metadata,
-                )
+        def tasks() -> Iterator[Tuple[str, str, Optional[str]]]:
+            """Lists candidate files, dropping the ones the manifest proves unchanged."""
+            nonlocal skipped, resumed
+            with os.scandir(self.source_path) as it:
+                for dirent in it:
+                    filename = dirent.name
+                    if not filename.endswith('.json') or not dirent.is_file():
+                        continue
+                    try:
+                        stat = dirent.stat()
+                    except OSError as e:
+                        logger.error("Error reading or parsing %s: %s", dirent.path, e)
+                        continue
+                    seen.add(filename)
+                    entry_id = self._entry_id(filename)
+                    if self.is_committed(entry_id):
+                        # Published by an interrupted run: hashed, but not parsed
+                        # again unless the note was edited since.
+                        try:
+                            with open(dirent.path, 'rb') as f:
+                                content_hash = hashlib.sha256(f.read()).hexdigest()
+                        except OSError:
+                            content_hash = None
+                        if content_hash is not None and self.is_committed(entry_id, content_hash):
+                            resumed += 1
+                            if manifest is not None:
+                                manifest.record(filename, stat, content_hash)
+                            continue
+                    if manifest is None:
+                        yield filename, dirent.path, None
+                        continue
+                    if manifest.is_unchanged(filename, stat):
+                        skipped += 1
+                        continue
+                    stats[filename] = stat
+                    previous = manifest.get(filename)
+                    yield filename, dirent.path, previous["sha256"] if previous else None
 
+        results = bounded_map(
+            self._load_file,
+            tasks(),
+            workers=self.workers,
+            ordered=self.ordered,
+            max_in_flight=self.max_in_flight,
+            executor=self.executor,
+        )
+        for (filename, file_path, _), future in results:
+            try:
+                content_hash, entry = future.result()
             except (IOError, json.JSONDecodeError) as e:
-                print(f"Error reading or parsing {file_path}: {e}")
+                # Not recorded: the note is read again on the next run.
+                stats.pop(filename, None)
+                if not self.fail(file_path, e):
+                    logger.error("Error reading or parsing %s: %s", file_path, e)
+                continue
+            except Exception as e:
+                stats.pop(filename, None)
+                # An unexpected note shape: skipped only with a dead-letter queue.
+                if not self.fail(file_path, e):
+                    raise
+                continue
+
+            if entry is None:
+                # Touched but not modified: refresh mtime, skip parsing.
+                manifest.record(filename, stats.pop(filename), content_hash)
+                skipped += 1
                 continue
+
+            yield entry
+            # Saved only if the run succeeds: consumed is not yet published.
+            if manifest is not None:
+                manifest.record(filename, stats.pop(filename), content_hash)
+
+        if resumed:
+            logger.info("GoogleKeepPlugin: %d notes already published by an interrupted run.", resumed)
+        if manifest is None:
+            return
+
+        deleted = sorted(manifest.names() - seen)
+        for filename in deleted:
+            yield self._tombstone(filename)
+            manifest.remove(filename)
+
+        logger.info("GoogleKeepPlugin: %d unchanged notes skipped, %d deletions detected.", skipped, len(deleted))
+
+    def complete(self):
+        """Writes the manifest, every publisher having committed the notes it records."""
+        if self._manifest is not None:
+            self._manifest.save()
+            self._manifest = None
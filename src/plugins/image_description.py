@@ -0,0 +1,89 @@
+# src/plugins/image_description.py
+
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List
+
+from .attachments import DEFAULT_MAX_BYTES, DEFAULT_MAX_SIDE, ImageDescriber
+from .base import Entry, FilterPlugin
+from .cache import open_cache
+
+logger = logging.getLogger(__name__)
+
+DESCRIPTION_KEY = "image_content_description"
+
+class Plugin(FilterPlugin):
+    """
+    A filter plugin that describes the images attached to entries
+    (`metadata["attachments"]`, as recorded by GoogleKeep with
+    `describe_images: false`).
+
+    Images are described on a pool of `workers` threads, all images of an
+    entry at once, while later entries keep arriving: up to `max_in_flight`
+    entries are in progress, and they are yielded in order. Each distinct
+    image is described once (see ImageDescriber), with the results kept in
+    `cache` across runs. Large images are streamed and downscaled to
+    `max_image_side` pixels before they are sent to the model. The
+    attachment list, which holds local paths, is removed from the entries
+    it yields.
+    """
+    # Descriptions are memoized on the instance: a fresh execute resumes cleanly.
+    restartable = True
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.workers = max(1, int(self.config.get("workers", 8)))
+        self.max_in_flight = max(1, int(self.config.get("max_in_flight") or self.workers * 4))
+        self.describer = ImageDescriber(
+            backend=self.config.get("backend", "mock"),
+            model=self.config.get("model", "gemini-1.5-flash"),
+            prompt=self.config.get("prompt", "Describe this image in one or two sentences."),
+            llm=self.config.get("llm"),
+            cache=open_cache(self.config.get("cache")),
+            max_side=int(self.config.get("max_image_side", DEFAULT_MAX_SIDE)),
+            max_bytes=int(self.config.get("max_image_bytes", DEFAULT_MAX_BYTES)),
+            # Simulated model latency per call, for benchmarks.
+            mock_latency=float(self.config.get("mock_latency", 0.0)),
+        )
+
+    @staticmethod
+    def _images(entry: Entry) -> List[Dict[str, str]]:
+        if entry.is_tombstone or DESCRIPTION_KEY in entry.metadata:
+            return []
+        return [
+            attachment for attachment in entry.metadata.get("attachments") or []
+            if attachment.get("path") and attachment.get("mimetype", "").startswith("image/")
+        ]
+
+    @staticmethod
+    def _finish(entry: Entry, futures: List[Future]) -> Entry:
+        descriptions = [description for description in (future.result() for future in futures) if description]
+        if descriptions:
+            # Joined like the descriptions GoogleKeep adds inline.
+            entry.metadata[DESCRIPTION_KEY] = "\\n".join(descriptions)
+        entry.metadata.pop("attachments", None)
+        return entry
+
+    def execute(self, entries: Iterator[Entry]) -> Iterator[Entry]:
+        """
+        Receives entries and yields them, with their images described.
+        """
+        logger.info("Executing ImageDescriptionPlugin (%s, %d workers)...", self.describer.backend, self.workers)
+        window: deque = deque()
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="describe-image")
+        try:
+            for entry in entries:
+                futures = [
+                    pool.submit(self.describer.describe, image["path"], image["mimetype"])
+                    for image in self._images(entry)
+                ]
+                window.append((entry, futures))
+                # Entries without images leave as soon as the ones before them have.
+                while window and (len(window) > self.max_in_flight or all(f.done() for f in window[0][1])):
+                    yield self._finish(*window.popleft())
+            while window:
+                yield self._finish(*window.popleft())
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        logger.info("ImageDescriptionPlugin: %s", self.describer.stats)
@@ -0,0 +1,570 @@
+# src/plugins/lexical_index.py
+
+import argparse
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import struct
+import sys
+import unicodedata
+import zlib
+from array import array
+from collections import Counter, defaultdict, deque
+from itertools import accumulate, chain, compress, count, groupby, repeat
+from operator import add, and_, ge, itemgetter, lshift, or_, rshift, sub
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple
+
+from .base import Entry, PublishPlugin, Vector
+from .vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "lexical.sqlite3"
+
+# Scripts written without spaces: kana, CJK ideographs (and the 々 mark), Hangul.
+_CJK = "々぀-ヿ㐀-䶿一-鿿豈-﫿가-힯"
+_TOKEN_RE = re.compile(f"([{_CJK}]+)|[^\\W_{_CJK}]+")
+MAX_WORD_CHARS = 64
+# Term frequencies are stored in one byte; BM25 saturates long before that.
+MAX_TF = 255
+# Document lengths below this are stored exactly, longer ones in 4% steps.
+_EXACT_LENGTHS = 32
+_LENGTH_STEP = math.log(1.04)
+# Postings lists shorter than this (in bytes) are not worth deflating.
+_DEFLATE_MIN_BYTES = 512
+# Most terms occur in one document of a segment.
+_SINGLE = struct.Struct("=BIH")
+# Queries matching at least one posting per this many document numbers are
+# scored in a list indexed by document rather than in a dict.
+_DENSE_QUERY = 4
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into index terms.
+
+    Text is NFKC-normalized (full-width Latin and half-width kana become
+    their usual forms) and lower-cased. Latin, digits and other scripts
+    with spaces give one term per word; runs of kana, kanji or Hangul give
+    overlapping character bigrams ("東京都" -> "東京", "京都"), so words
+    are found without a dictionary. A run of a single character is kept
+    as a unigram.
+    """
+    terms: List[str] = []
+    for match in _TOKEN_RE.finditer(unicodedata.normalize("NFKC", text).lower()):
+        run = match.group()
+        if match.group(1) is None:
+            terms.append(run[:MAX_WORD_CHARS])
+        elif len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend([run[i:i + 2] for i in range(len(run) - 1)])
+    return terms
+
+
+def length_bucket(length: int) -> int:
+    """Quantizes a document length to one byte, like Lucene's norms."""
+    if length < _EXACT_LENGTHS:
+        return length
+    return min(255, _EXACT_LENGTHS + int(math.log(length / _EXACT_LENGTHS) / _LENGTH_STEP))
+
+
+def bucket_length(bucket: int) -> float:
+    """Returns the (approximate) document length a bucket stands for."""
+    if bucket < _EXACT_LENGTHS:
+        return float(bucket)
+    return _EXACT_LENGTHS * math.exp((bucket - _EXACT_LENGTHS) * _LENGTH_STEP)
+
+
+def encode_postings(docs: Sequence[int], codes: Sequence[int]) -> bytes:
+    """
+    Encodes a postings list: ascending document numbers as gaps, then a
+    16-bit code per document (term frequency << 8 | length bucket). Lists
+    of a few postings, most of them, are stored as they are; longer ones
+    are deflated, which squeezes the small gaps to about a byte each.
+    Decoding runs in C (zlib, array, itertools), unlike a varint loop.
+    """
+    if len(docs) == 1:
+        return _SINGLE.pack(0, docs[0], next(iter(codes)))
+    raw = array('I', map(sub, docs, chain((0,), docs))).tobytes() + array('H', codes).tobytes()
+    if len(raw) < _DEFLATE_MIN_BYTES:
+        return b"\0" + raw
+    return b"\1" + zlib.compress(raw)
+
+
+def decode_postings(data: bytes, count: int) -> Tuple[array, array]:
+    """Returns the (document numbers, codes) of an encoded postings list."""
+    if count == 1:
+        _, doc, code = _SINGLE.unpack(data)
+        return array('I', (doc,)), array('H', (code,))
+    raw = zlib.decompress(data[1:]) if data[0] else data[1:]
+    gaps, codes = array('I'), array('H')
+    gaps.frombytes(raw[:4 * count])
+    codes.frombytes(raw[4 * count:])
+    return array('I', accumulate(gaps)), codes
+
+
+class LexicalIndex:
+    """
+    A persistent BM25 inverted index over entry text, backed by SQLite.
+
+    Each entry gets a document number. Postings are written in immutable
+    segments, one per `flush`, so indexing is incremental and appends
+    rather than rewriting. Segments are merged in tiers: once
+    `merge_factor` segments of one level exist, they become one segment of
+    the next level, dropping the postings of deleted and superseded entries.
+
+    A posting carries the term frequency and the quantized length of its
+    document, so a query computes BM25 once per distinct (tf, length) pair
+    of a term and does the per-document work with dict and set operations,
+    in C. Terms are taken rarest first; once the remaining terms cannot lift
+    an unseen document into the top k (max-score pruning), they only add to
+    the scores of documents already found. Queries whose terms match a
+    large share of the index are summed in a list indexed by document
+    instead, which costs less per posting than a dict.
+    """
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75, merge_factor: int = 10):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.merge_factor = max(2, merge_factor)
+        os.makedirs(path, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(path, INDEX_FILE), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            " doc INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, length INTEGER NOT NULL, record TEXT NOT NULL)"
+        )
+        # Keyed by segment first, so that a flush appends to the table.
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " segment INTEGER NOT NULL, term TEXT NOT NULL, count INTEGER NOT NULL, data BLOB NOT NULL,"
+            " PRIMARY KEY (segment, term)) WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " segment INTEGER PRIMARY KEY, level INTEGER NOT NULL, first_doc INTEGER NOT NULL, last_doc INTEGER NOT NULL)"
+        )
+        # Deleted documents whose postings are still in a segment.
+        self._conn.execute("CREATE TABLE IF NOT EXISTS deleted (doc INTEGER PRIMARY KEY)")
+        self._conn.commit()
+
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        self._next_doc = meta.get("next_doc", 0)
+        self._next_segment = meta.get("next_segment", 0)
+        self._segments = [row[0] for row in self._conn.execute("SELECT segment FROM segments ORDER BY segment")]
+        # Per-document lengths in terms (0 for deleted documents), for BM25.
+        self._lengths = array('I', bytes(4 * self._next_doc))
+        for doc, length in self._conn.execute("SELECT doc, length FROM docs"):
+            self._lengths[doc] = length
+        self._live = self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+        self._total_length = sum(self._lengths)
+        self._deleted = {row[0] for row in self._conn.execute("SELECT doc FROM deleted")}
+        # Postings added since the last flush, as doc << 16 | code per term.
+        self._buffer: Dict[str, List[int]] = defaultdict(list)
+        self._buffer_first_doc = self._next_doc
+
+    def __len__(self) -> int:
+        return self._live
+
+    @property
+    def segments(self) -> int:
+        return len(self._segments)
+
+    # --- Writing ---
+
+    def _remove(self, entry_id: str) -> bool:
+        row = self._conn.execute("SELECT doc FROM docs WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            return False
+        doc = row[0]
+        self._conn.execute("DELETE FROM docs WHERE doc = ?", (doc,))
+        self._conn.execute("INSERT INTO deleted (doc) VALUES (?)", (doc,))
+        self._live -= 1
+        self._total_length -= self._lengths[doc]
+        self._lengths[doc] = 0
+        self._deleted.add(doc)
+        return True
+
+    def add(self, entry: Entry, text_fields: Sequence[str] = (), metadata_fields: Sequence[str] = (),
+            snippet_chars: int = 200) -> bool:
+        """
+        Indexes an entry's content and `text_fields` of its metadata,
+        replacing any previous version; tombstones remove the entry.
+        Returns True if the entry was indexed.
+        """
+        self._remove(entry.id)
+        if entry.is_tombstone:
+            return False
+        texts = [entry.content]
+        for field in text_fields:
+            value = entry.metadata.get(field)
+            if isinstance(value, (list, tuple)):
+                texts.extend(str(item) for item in value)
+            elif value is not None:
+                texts.append(str(value))
+        terms = Counter(tokenize("\n".join(texts)))
+        if not terms:
+            return False
+
+        doc = self._next_doc
+        self._next_doc += 1
+        length = sum(terms.values())
+        record = {
+            "source": entry.source,
+            "timestamp": entry.timestamp,
+            "metadata": {k: entry.metadata[k] for k in metadata_fields if k in entry.metadata},
+            "snippet": entry.content[:snippet_chars],
+        }
+        self._conn.execute("INSERT INTO docs (doc, id, length, record) VALUES (?, ?, ?, ?)",
+                           (doc, entry.id, length, json.dumps(record, ensure_ascii=False)))
+        self._lengths.append(length)
+        self._live += 1
+        self._total_length += length
+
+        tfs = terms.values()
+        if max(tfs) > MAX_TF:
+            tfs = [min(tf, MAX_TF) for tf in tfs]
+        # One posting per term, appended through map() to keep the loop in C.
+        base = doc << 16 | length_bucket(length)
+        postings = map(or_, repeat(base), map(lshift, tfs, repeat(8)))
+        deque(map(list.append, map(self._buffer.__getitem__, terms), postings), 0)
+        return True
+
+    def flush(self):
+        """Writes the buffered postings as a new segment and commits everything added so far."""
+        if self._buffer:
+            segment = self._new_segment(0, self._buffer_first_doc, self._next_doc - 1)
+            self._conn.executemany(
+                "INSERT INTO postings (segment, term, count, data) VALUES (?, ?, ?, ?)",
+                ((segment, term, len(packed), encode_postings(
+                    array('I', map(rshift, packed, repeat(16))), map(and_, packed, repeat(0xffff))))
+                 for term, packed in sorted(self._buffer.items())),
+            )
+            self._buffer.clear()
+            self._merge_full_tiers()
+        self._buffer_first_doc = self._next_doc
+        self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                               [("next_doc", self._next_doc), ("next_segment", self._next_segment)])
+        self._conn.commit()
+
+    def _new_segment(self, level: int, first_doc: int, last_doc: int) -> int:
+        segment = self._next_segment
+        self._next_segment += 1
+        self._conn.execute("INSERT INTO segments (segment, level, first_doc, last_doc) VALUES (?, ?, ?, ?)",
+                           (segment, level, first_doc, last_doc))
+        self._segments.append(segment)
+        return segment
+
+    def _merge_full_tiers(self):
+        while True:
+            full = self._conn.execute(
+                "SELECT level FROM segments GROUP BY level HAVING COUNT(*) >= ? ORDER BY level LIMIT 1",
+                (self.merge_factor,),
+            ).fetchone()
+            if full is None:
+                return
+            segments = [row[0] for row in self._conn.execute(
+                "SELECT segment FROM segments WHERE level = ? ORDER BY segment", full)]
+            self._merge(segments, full[0] + 1)
+
+    def _merge(self, segments: List[int], level: int):
+        placeholders = ",".join("?" * len(segments))
+        first_doc, last_doc = self._conn.execute(
+            f"SELECT MIN(first_doc), MAX(last_doc) FROM segments WHERE segment IN ({placeholders})", segments
+        ).fetchone()
+        deleted = {doc for doc in self._deleted if first_doc <= doc <= last_doc}
+        merged = self._new_segment(level, first_doc, last_doc)
+
+        # Segments are sorted by term; merge them as sorted streams. Segments
+        # cover consecutive document ranges, so lists concatenate in order.
+        streams = [self._conn.execute("SELECT term, count, data FROM postings WHERE segment = ? ORDER BY term",
+                                      (segment,)) for segment in segments]
+        out = []
+        for term, group in groupby(heapq.merge(*streams, key=itemgetter(0)), key=itemgetter(0)):
+            group = list(group)
+            if len(group) == 1 and not deleted:
+                out.append((merged, term, group[0][1], group[0][2]))
+            else:
+                docs, codes = array('I'), array('H')
+                for _, count, data in group:
+                    segment_docs, segment_codes = decode_postings(data, count)
+                    docs.extend(segment_docs)
+                    codes.extend(segment_codes)
+                if deleted:
+                    kept = [i for i, doc in enumerate(docs) if doc not in deleted]
+                    docs, codes = [docs[i] for i in kept], [codes[i] for i in kept]
+                if docs:
+                    out.append((merged, term, len(docs), encode_postings(docs, codes)))
+            if len(out) >= 10000:
+                self._conn.executemany("INSERT INTO postings (segment, term, count, data) VALUES (?, ?, ?, ?)", out)
+                out = []
+        self._conn.executemany("INSERT INTO postings (segment, term, count, data) VALUES (?, ?, ?, ?)", out)
+
+        self._conn.execute(f"DELETE FROM postings WHERE segment IN ({placeholders})", segments)
+        self._conn.execute(f"DELETE FROM segments WHERE segment IN ({placeholders})", segments)
+        self._conn.executemany("DELETE FROM deleted WHERE doc = ?", ((doc,) for doc in deleted))
+        self._segments = [segment for segment in self._segments if segment not in segments]
+        self._deleted -= deleted
+        logger.debug("Merged %d lexical index segments into segment %d.", len(segments), merged)
+
+    def optimize(self):
+        """Merges every segment into one, e.g. before serving a finished index."""
+        self.flush()
+        if len(self._segments) > 1:
+            level = self._conn.execute("SELECT MAX(level) FROM segments").fetchone()[0]
+            self._merge(list(self._segments), level + 1)
+            self._conn.commit()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    # --- Reading ---
+
+    def _postings(self, term: str) -> List[Tuple[int, bytes]]:
+        segments = ",".join(map(str, self._segments))
+        if len(term) == 1 and _TOKEN_RE.fullmatch(term).group(1) is not None:
+            # A lone kana or kanji also matches the bigrams it starts.
+            return self._conn.execute(
+                f"SELECT count, data FROM postings WHERE segment IN ({segments}) AND term >= ? AND term <= ?",
+                (term, term + "\U0010ffff"),
+            ).fetchall()
+        return self._conn.execute(
+            f"SELECT count, data FROM postings WHERE segment IN ({segments}) AND term = ?", (term,)
+        ).fetchall()
+
+    def _term_scores(self, weight: float, postings: List[Tuple[int, bytes]],
+                     avgdl: float) -> Tuple[List[Tuple[Sequence[int], Iterator[float]]], float]:
+        """
+        Returns a term's BM25 scores as (documents, scores) parts, one per
+        posting row, and the highest score. Where several bigrams matched a
+        lone character, a document is in several parts: it counts once, with
+        the score of the last one.
+        """
+        k1, b = self.k1, self.b
+        parts = []
+        bound = 0.0
+        for count, data in postings:
+            docs, codes = decode_postings(data, count)
+            table = {}
+            for code in set(codes):
+                tf = code >> 8
+                norm = k1 * (1 - b + b * bucket_length(code & 255) / avgdl)
+                table[code] = weight * tf * (k1 + 1) / (tf + norm)
+            bound = max(bound, max(table.values()))
+            parts.append((docs, map(table.__getitem__, codes)))
+        return parts, bound
+
+    def _scores(self, terms: List[str], k: int, prune: bool) -> Tuple[List[int], List[float]]:
+        """Returns the matching documents and their scores, as parallel lists."""
+        n = self._live
+        avgdl = self._total_length / n
+        weighted = []
+        matched = 0
+        for term, repeats in Counter(terms).items():
+            postings = self._postings(term)
+            df = sum(count for count, _ in postings)
+            if df:
+                weight = repeats * math.log(1 + (n - df + 0.5) / (df + 0.5))
+                weighted.append((df, *self._term_scores(weight, postings, avgdl)))
+                matched += df
+        weighted.sort(key=itemgetter(0))
+        if matched * _DENSE_QUERY >= self._next_doc:
+            return self._dense_scores([parts for _, parts, _ in weighted], k, prune)
+        bounds = list(accumulate(bound for _, _, bound in reversed(weighted)))[::-1]
+
+        # Accumulated per term, with set and dict operations that run in C:
+        # each term only touches the documents it matches.
+        scores: Dict[int, float] = {}
+        pruned = False
+        for (_, parts, _), remaining in zip(weighted, bounds):
+            found: Dict[int, float] = {}
+            for docs, term_scores in parts:
+                found.update(zip(docs, term_scores))
+            shared = found.keys() & scores.keys()
+            summed = zip(shared, map(add, map(scores.__getitem__, shared), map(found.__getitem__, shared)))
+            if pruned:
+                # The top k only rises and the bound of unseen documents only
+                # falls: once pruned, no new document can get in.
+                scores.update(summed)
+                continue
+            found.update(summed)
+            if prune and len(scores) >= k:
+                scores.update(zip(shared, map(found.__getitem__, shared)))
+                if heapq.nlargest(k, scores.values())[-1] >= remaining:
+                    # No unseen document can reach the top k any more.
+                    pruned = True
+                    continue
+            for doc in found.keys() & self._deleted:
+                del found[doc]
+            scores.update(found)
+        return list(scores), list(scores.values())
+
+    def _dense_scores(self, terms: List[List[Tuple[Sequence[int], Iterator[float]]]], k: int,
+                      top_only: bool) -> Tuple[List[int], List[float]]:
+        """
+        `_scores` for a query that matches much of the index: each term is
+        scattered into a list indexed by document number and added to the
+        totals element-wise, a C call or two per posting. With `top_only`,
+        only the documents reaching the k-th score are returned.
+        """
+        totals: Optional[List[float]] = None
+        for parts in terms:
+            column = [0.0] * self._next_doc
+            for docs, scores in parts:
+                deque(map(column.__setitem__, docs, scores), maxlen=0)
+            totals = column if totals is None else list(map(add, totals, column))
+        for doc in self._deleted:
+            totals[doc] = 0.0
+        threshold = heapq.nlargest(k, totals)[-1] if top_only and k else 0.0
+        if threshold > 0.0:
+            docs = list(compress(count(), map(ge, totals, repeat(threshold))))
+        else:
+            docs = list(compress(count(), totals))
+        return docs, list(map(totals.__getitem__, docs))
+
+    def _record(self, doc: int) -> Optional[Tuple[str, Dict[str, Any]]]:
+        row = self._conn.execute("SELECT id, record FROM docs WHERE doc = ?", (doc,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def search(self, text: str, k: int = 10, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Returns the top-k entries for a text query by BM25 score, best first."""
+        terms = tokenize(text)
+        if not terms or not self._live:
+            return []
+        # Pruning assumes every document may be returned, so not with filters.
+        docs, scores = self._scores(terms, k, prune=not filters)
+        ranked = zip(scores, docs)
+        ranked = sorted(ranked, reverse=True) if filters else heapq.nlargest(k, ranked)
+
+        results = []
+        for score, doc in ranked:
+            if len(results) >= k:
+                break
+            found = self._record(doc)
+            if found is None:
+                continue
+            entry_id, record = found
+            if not VectorIndex._matches({"id": entry_id, **record}, filters):
+                continue
+            results.append({"id": entry_id, "score": score, **record})
+        return results
+
+
+def hybrid_search(
+    lexical: LexicalIndex,
+    vectors: Optional[VectorIndex],
+    text: str,
+    vector: Optional[Vector] = None,
+    k: int = 10,
+    filters: Optional[Dict[str, Any]] = None,
+    depth: Optional[int] = None,
+    rrf_k: int = 60,
+    approximate: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Fuses lexical (BM25) and vector (cosine) results with reciprocal rank
+    fusion: each entry scores the sum of 1 / (rrf_k + rank) over the lists
+    it appears in, taking the top `depth` of each. Ranks, unlike raw
+    scores, are comparable between the two. Results carry `lexical_rank`
+    and `vector_rank` (None where absent), best first.
+    """
+    depth = depth or max(50, 5 * k)
+    ranked = [("lexical_rank", lexical.search(text, depth, filters))]
+    if vectors is not None and vector is not None:
+        ranked.append(("vector_rank", vectors.search(vector, depth, filters, approximate=approximate)))
+
+    fused: Dict[str, Dict[str, Any]] = {}
+    for rank_key, results in ranked:
+        for rank, result in enumerate(results, 1):
+            hit = fused.get(result["id"])
+            if hit is None:
+                hit = fused[result["id"]] = {**result, "score": 0.0, "lexical_rank": None, "vector_rank": None}
+            hit["score"] += 1.0 / (rrf_k + rank)
+            hit[rank_key] = rank
+    return heapq.nlargest(k, fused.values(), key=itemgetter("score"))
+
+
+class Plugin(PublishPlugin):
+    """
+    A publish plugin that maintains a local BM25 index over entry content
+    and the `text_fields` of their metadata, for exact-term and hybrid
+    retrieval next to Publish::VectorIndex (see `hybrid_search`).
+    The index is flushed, and its entries committed, every `flush_every` entries.
+    """
+    commits_explicitly = True
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.path = self.config.get("path")
+        if not self.path:
+            raise ValueError("Config for LexicalIndex plugin must contain a 'path'.")
+        self.text_fields = self.config.get("text_fields", ["image_content_description", "llm_tags"])
+        self.metadata_fields = self.config.get("metadata_fields", ["color", "is_archived"])
+        self.flush_every = max(1, int(self.config.get("flush_every", 1000)))
+        self.merge_factor = int(self.config.get("merge_factor", 10))
+
+    def execute(self, entries: Iterator[Entry]):
+        """
+        Receives Entry objects and adds them to the on-disk index.
+        """
+        logger.info("Executing LexicalIndexPlugin: Indexing into '%s'...", self.path)
+        index = LexicalIndex(self.path, merge_factor=self.merge_factor)
+        indexed = 0
+        pending: List[str] = []
+        try:
+            for entry in entries:
+                if index.add(entry, self.text_fields, self.metadata_fields):
+                    indexed += 1
+                pending.append(entry.id)
+                if len(pending) >= self.flush_every:
+                    index.flush()
+                    self.commit(pending)
+                    pending = []
+            index.flush()
+            self.commit(pending)
+        finally:
+            index.close()
+        logger.info("LexicalIndexPlugin: Indexed %d entries (%d live in the index).", indexed, len(index))
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command-line query interface: python -m plugins.lexical_index PATH --text ..."""
+    parser = argparse.ArgumentParser(description="Query a local SHIORI lexical index, optionally fused with a vector index.")
+    parser.add_argument("path", help="Index directory (the LexicalIndex plugin's 'path').")
+    parser.add_argument("--text", required=True, help="Query text.")
+    parser.add_argument("-k", type=int, default=10, help="Number of results.")
+    parser.add_argument("--filter", action="append", default=[], metavar="KEY=VALUE",
+                        help="Metadata filter, e.g. color=blue or source=google_keep.")
+    parser.add_argument("--vector-index", help="Also search this vector index and fuse the results.")
+    parser.add_argument("--approximate", action="store_true", help="Use the vector index's IVF clusters.")
+    parser.add_argument("--backend", default="hash", help="Embedding backend for the vector query.")
+    parser.add_argument("--model", default="text-embedding-004")
+    args = parser.parse_args(argv)
+
+    filters = {}
+    for item in args.filter:
+        key, _, value = item.partition("=")
+        filters[key] = json.loads(value) if value in ("true", "false") else value
+
+    index = LexicalIndex(args.path)
+    if args.vector_index:
+        from .embedding import get_backend
+        vectors = VectorIndex(args.vector_index)
+        backend = get_backend(args.backend, args.model, {"dimensions": vectors.dimension})
+        results = hybrid_search(index, vectors, args.text, backend.embed([args.text])[0], k=args.k,
+                                filters=filters, approximate=args.approximate)
+    else:
+        results = index.search(args.text, k=args.k, filters=filters)
+    json.dump(results, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
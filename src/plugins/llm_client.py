@@ -0,0 +1,385 @@
+# src/plugins/llm_client.py
+
+import hashlib
+import http.client
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.parse
+from concurrent.futures import Future
+from queue import Empty, Full, LifoQueue
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .base import SHARD_ENV
+from .tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes that are worth retrying.
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+VERTEX_ENDPOINT = (
+    "https://{location}-aiplatform.googleapis.com/v1/projects/{project}"
+    "/locations/{location}/publishers/google/models"
+)
+
+# Gemini bills each image as a fixed number of input tokens.
+IMAGE_TOKENS = 258
+
+class LLMError(Exception):
+    """An error response from the model API."""
+    def __init__(self, code: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {code}: {message}")
+        self.code = code
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket refilled at `per_minute` tokens per minute.
+
+    Callers reserve tokens up front and sleep for the deficit, so concurrent
+    callers are spaced out evenly instead of all retrying at once. A request
+    larger than the bucket is admitted by running the bucket into debt.
+    """
+    def __init__(self, per_minute: float, burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if per_minute <= 0:
+            raise ValueError("Rate limits must be positive.")
+        self.rate = per_minute / 60.0
+        # No burst by default: requests are spread evenly, so no quota
+        # window ever sees more than its share.
+        self.capacity = float(burst) if burst else 1.0
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Takes `amount` tokens and returns how long to wait before using them."""
+        with self._lock:
+            now = self._clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class AdaptiveConcurrency:
+    """
+    Limits the number of requests in flight, adapting the limit to the
+    server's responses (additive increase, multiplicative decrease): every
+    success raises it by 1/limit, a throttling response halves it. Decreases
+    are at most once per `cooldown` seconds, so one burst of 429s counts once.
+    """
+    def __init__(self, maximum: int, minimum: int = 1, cooldown: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = float(self.maximum)
+        self.in_flight = 0
+        self.cooldown = cooldown
+        self._clock = clock
+        self._last_decrease = float("-inf")
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled: bool = False, succeeded: bool = False):
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                now = self._clock()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+                    logger.info("LLM client: throttled, concurrency lowered to %d.", int(self.limit))
+            elif succeeded:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+
+class HttpTransport:
+    """
+    Posts JSON to a REST endpoint over a pool of keep-alive connections.
+
+    Idle connections are reused most-recently-used first, so a steady
+    request rate runs on a few warm connections; at most `pool_size` idle
+    connections are kept. `headers` is called per request (for auth tokens).
+    """
+    def __init__(self, base_url: str, pool_size: int = 16, timeout: float = 60.0,
+                 headers: Optional[Callable[[], Dict[str, str]]] = None):
+        url = urllib.parse.urlsplit(base_url)
+        if url.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported LLM endpoint '{base_url}'.")
+        self.base_url = base_url
+        self._connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        self._netloc = url.netloc
+        self._base_path = url.path.rstrip("/")
+        self._timeout = timeout
+        self._headers = headers
+        self._idle: LifoQueue = LifoQueue(maxsize=pool_size)
+        self.connections_opened = 0
+
+    def _checkout(self) -> http.client.HTTPConnection:
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            self.connections_opened += 1
+            return self._connection_class(self._netloc, timeout=self._timeout)
+
+    def _checkin(self, connection: http.client.HTTPConnection):
+        try:
+            self._idle.put_nowait(connection)
+        except Full:
+            connection.close()
+
+    def post(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        data = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self._headers is not None:
+            headers.update(self._headers())
+
+        connection = self._checkout()
+        try:
+            connection.request("POST", self._base_path + path, body=data, headers=headers)
+            response = connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            raise ConnectionError(f"Request to {self.base_url} failed: {e}") from e
+        if response.will_close:
+            connection.close()
+        else:
+            self._checkin(connection)
+
+        if response.status >= 400:
+            retry_after = response.getheader("Retry-After")
+            message = payload.decode("utf-8", "replace")[:500]
+            raise LLMError(response.status, message, float(retry_after) if retry_after else None)
+        return json.loads(payload)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                return
+
+
+class LLMClient:
+    """
+    A model API client meant to be shared by every plugin of a process.
+
+    Each request passes through per-model token buckets (requests and tokens
+    per minute), an adaptive concurrency limit and jittered exponential
+    backoff on transient errors, honouring Retry-After. Identical requests
+    issued while one is already in flight wait for its response instead of
+    being sent again; the shared response must not be modified.
+    """
+    def __init__(self, transport, max_concurrency: int = 8, max_retries: int = 5,
+                 retry_backoff: float = 0.5, max_backoff: float = 30.0, coalesce: bool = True,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.transport = transport
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.coalesce = coalesce
+        self._sleep = sleep
+        self._limits: Dict[str, Tuple[Optional[TokenBucket], Optional[TokenBucket]]] = {}
+        self._limit_values: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "coalesced": 0, "failed": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def set_limits(self, model: str, qpm: Optional[float] = None, tpm: Optional[float] = None):
+        """Sets the requests-per-minute and tokens-per-minute quota of a model."""
+        with self._lock:
+            current = self._limit_values.get(model)
+            if current is not None:
+                if current != (qpm, tpm):
+                    logger.warning("LLM client: limits for '%s' already set to %s; ignoring %s.",
+                                   model, current, (qpm, tpm))
+                return
+            self._limit_values[model] = (qpm, tpm)
+            self._limits[model] = (
+                TokenBucket(qpm) if qpm else None,
+                TokenBucket(tpm) if tpm else None,
+            )
+
+    def _throttle(self, model: str, tokens: int):
+        requests_bucket, tokens_bucket = self._limits.get(model, (None, None))
+        wait = 0.0
+        if requests_bucket is not None:
+            wait = requests_bucket.reserve(1)
+        if tokens_bucket is not None:
+            wait = max(wait, tokens_bucket.reserve(tokens))
+        if wait > 0:
+            self._sleep(wait)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        delay = min(self.max_backoff, self.retry_backoff * (2 ** attempt)) * random.uniform(0.5, 1.5)
+        retry_after = getattr(error, "retry_after", None)
+        return max(delay, retry_after) if retry_after else delay
+
+    def _send(self, model: str, method: str, body: Dict[str, Any], tokens: int) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            self._throttle(model, tokens)
+            self.concurrency.acquire()
+            self._count("requests")
+            throttled = succeeded = False
+            try:
+                response = self.transport.post(f"/{model}:{method}", body)
+                succeeded = True
+                return response
+            except (LLMError, ConnectionError, TimeoutError) as e:
+                code = getattr(e, "code", None)
+                throttled = code == 429
+                if throttled:
+                    self._count("throttled")
+                if attempt >= self.max_retries or not (code is None or code in RETRYABLE_CODES):
+                    self._count("failed")
+                    raise
+                delay = self._backoff(attempt, e)
+                logger.warning("LLM client: %s:%s failed (%s), retrying in %.2fs...", model, method, e, delay)
+            finally:
+                self.concurrency.release(throttled=throttled, succeeded=succeeded)
+            self._count("retries")
+            attempt += 1
+            self._sleep(delay)
+
+    def request(self, model: str, method: str, body: Dict[str, Any], tokens: int = 0) -> Dict[str, Any]:
+        """Calls `<model>:<method>` with a JSON body and returns the JSON response."""
+        if not self.coalesce:
+            return self._send(model, method, body, tokens)
+
+        key = hashlib.sha256(
+            json.dumps([model, method, body], sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            response = self._send(model, method, body, tokens)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        """Embeds texts with a Vertex AI text embedding model."""
+        response = self.request(
+            model, "predict",
+            {"instances": [{"content": text} for text in texts]},
+            tokens=sum(estimate_tokens(text) for text in texts),
+        )
+        return [prediction["embeddings"]["values"] for prediction in response["predictions"]]
+
+    def generate(self, model: str, parts: List[Dict[str, Any]], json_output: bool = False) -> str:
+        """Runs a Gemini model on text and inline image parts and returns the text answer."""
+        body: Dict[str, Any] = {"contents": [{"role": "user", "parts": parts}]}
+        if json_output:
+            body["generationConfig"] = {"responseMimeType": "application/json"}
+        tokens = sum(estimate_tokens(part["text"]) if "text" in part else IMAGE_TOKENS for part in parts)
+        response = self.request(model, "generateContent", body, tokens=tokens)
+        candidate = response["candidates"][0]
+        return "".join(part.get("text", "") for part in candidate["content"]["parts"])
+
+
+def _google_auth_headers() -> Callable[[], Dict[str, str]]:
+    # Imported lazily so offline runs do not need the SDK installed.
+    import google.auth
+    from google.auth.transport.requests import Request
+
+    credentials, _ = google.auth.default(scopes=["https://www.googleapis.com/auth/cloud-platform"])
+    lock = threading.Lock()
+
+    def headers() -> Dict[str, str]:
+        with lock:
+            if not credentials.valid:
+                credentials.refresh(Request())
+            return {"Authorization": f"Bearer {credentials.token}"}
+    return headers
+
+
+def endpoint_url(config: Dict[str, Any]) -> str:
+    """The models URL: `endpoint` if given, else Vertex AI for `project_id` and `location`."""
+    if config.get("endpoint"):
+        return config["endpoint"].rstrip("/")
+    if not config.get("project_id"):
+        raise ValueError("LLM config must contain an 'endpoint' or a 'project_id'.")
+    return VERTEX_ENDPOINT.format(project=config["project_id"], location=config.get("location", "us-central1"))
+
+
+def quota_share() -> float:
+    """The fraction of each quota this process may use: 1/N in the N workers of a sharded run."""
+    shard = os.environ.get(SHARD_ENV)
+    return 1.0 / int(shard.split("/")[1]) if shard else 1.0
+
+
+_clients: Dict[str, LLMClient] = {}
+_clients_lock = threading.Lock()
+
+def shared_client(config: Dict[str, Any]) -> LLMClient:
+    """
+    Returns the process-wide client for the endpoint described by an `llm`
+    config section, creating it on first use, so that every plugin calling
+    the same endpoint shares its connections, quotas and concurrency limit.
+    In the worker processes of a sharded run, each gets an equal share of
+    the quotas.
+    """
+    url = endpoint_url(config)
+    with _clients_lock:
+        client = _clients.get(url)
+        if client is None:
+            auth = config.get("auth", "none" if config.get("endpoint") else "google")
+            if auth == "google":
+                headers = _google_auth_headers()
+            elif auth == "none":
+                headers = None
+            else:
+                raise ValueError(f"Unknown LLM auth '{auth}'. Use 'google' or 'none'.")
+            transport = HttpTransport(
+                url,
+                pool_size=int(config.get("pool_size", 16)),
+                timeout=float(config.get("timeout", 60.0)),
+                headers=headers,
+            )
+            client = _clients[url] = LLMClient(
+                transport,
+                max_concurrency=int(config.get("max_concurrency", 8)),
+                max_retries=int(config.get("max_retries", 5)),
+                retry_backoff=float(config.get("retry_backoff", 0.5)),
+                max_backoff=float(config.get("max_backoff", 30.0)),
+                coalesce=bool(config.get("coalesce", True)),
+            )
+            logger.info("LLM client: connecting to %s", url)
+    share = quota_share()
+    for model, limits in (config.get("limits") or {}).items():
+        qpm, tpm = limits.get("qpm"), limits.get("tpm")
+        client.set_limits(model, qpm=qpm and qpm * share, tpm=tpm and tpm * share)
+    return client
@@ -1,36 +1,107 @@
 # src/plugins/llm_metadata_enricher.py
 
+import json
+import logging
+import time
 from typing import Dict, Any, Iterator
 from .base import Entry, FilterPlugin
+from .cache import ResultCache, open_cache
+from .parallel import bounded_map
+
+logger = logging.getLogger(__name__)
+
+# Appended to the prompt so that the model answers in a parseable shape.
+RESPONSE_FORMAT = 'Answer with a JSON object {"tags": [strings], "intent": string}.'
 
 class Plugin(FilterPlugin):
     """
     A filter plugin to enrich entry metadata using an LLM.
+    With a `cache` configured, entries whose content was already enriched with
+    the same model and prompt reuse the stored result instead of calling the model.
+
+    `backend: vertex` calls Gemini through the shared LLM client (`llm`
+    config section); `workers` entries are then enriched concurrently,
+    within the client's quotas, and yielded in order.
     """
+    # Its state (client, cache) lives on the instance: a fresh execute resumes cleanly.
+    restartable = True
+
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.model = self.config.get("model", "gemini-1.5-flash")
         self.prompt = self.config.get("prompt", "Extract tags and intent.")
+        self.backend = self.config.get("backend", "mock")
+        if self.backend not in ("mock", "vertex"):
+            raise ValueError(f"Unknown metadata backend '{self.backend}'. Use 'mock' or 'vertex'.")
+        self.workers = int(self.config.get("workers", 1))
+        self.cache = open_cache(self.config.get("cache"))
+        # Simulated model latency per call, for benchmarks.
+        self.mock_latency = float(self.config.get("mock_latency", 0.0))
+        self.client = None
+        if self.backend == "vertex":
+            from .llm_client import shared_client
+            self.client = shared_client(self.config.get("llm") or {})
 
-    def execute(self, entries: Iterator[Entry]) -> Iterator[Entry]:
+    def _enrich(self, entry: Entry) -> Dict[str, Any]:
         """
-        Receives entries, enriches their metadata, and yields them back.
-        This is a mock implementation.
+        Calls the model with entry.content and the prompt to get structured
+        metadata. The mock backend returns fixed metadata instead.
         """
-        print(f"Executing LLMMetadataEnricherPlugin (using mock for model '{self.model}')...")
+        logger.debug("Enriching metadata for entry: %.10s...", entry.id)
+        if self.client is not None:
+            answer = self.client.generate(
+                self.model,
+                [{"text": f"{self.prompt}\n{RESPONSE_FORMAT}\n\n{entry.content}"}],
+                json_output=True,
+            )
+            try:
+                data = json.loads(answer)
+                return {"llm_tags": list(data.get("tags") or []), "llm_intent": data.get("intent")}
+            except (ValueError, AttributeError):
+                logger.warning("Unparseable metadata for entry %.10s...: %.100s", entry.id, answer)
+                return {}
+
+        if self.mock_latency:
+            time.sleep(self.mock_latency)
 
-        for entry in entries:
-            # [MOCK] In a real implementation, this would call a generative AI API
-            # with entry.content and the prompt to get structured metadata.
-            print(f"  Enriching metadata for entry: {entry.id[:10]}...")
+        # Create deterministic, dummy metadata for testing.
+        return {
+            "llm_tags": ["mock_tag", "test"],
+            "llm_intent": "mock_intent_for_testing"
+        }
 
-            # Create deterministic, dummy metadata for testing.
-            dummy_metadata = {
-                "llm_tags": ["mock_tag", "test"],
-                "llm_intent": "mock_intent_for_testing"
-            }
+    def _metadata(self, entry: Entry) -> Dict[str, Any]:
+        """Returns the metadata for an entry, from the cache when possible."""
+        if self.cache is None:
+            return self._enrich(entry)
 
-            # Merge the new metadata into the existing metadata dictionary
-            entry.metadata.update(dummy_metadata)
+        key = ResultCache.make_key(entry.content, self.model, self.prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return json.loads(cached)
+        new_metadata = self._enrich(entry)
+        if new_metadata:  # unparseable answers are retried next run
+            self.cache.put(key, json.dumps(new_metadata, ensure_ascii=False).encode("utf-8"))
+        return new_metadata
 
+    def execute(self, entries: Iterator[Entry]) -> Iterator[Entry]:
+        """
+        Receives entries, enriches their metadata, and yields them back.
+        """
+        logger.info("Executing LLMMetadataEnricherPlugin (using %s for model '%s')...", self.backend, self.model)
+
+        # Tombstones carry no content; they pass through in place.
+        results = bounded_map(
+            lambda entry: None if entry.is_tombstone else self._metadata(entry),
+            entries,
+            workers=self.workers,
+        )
+        for entry, future in results:
+            new_metadata = future.result()
+            if new_metadata:
+                # Merge the new metadata into the existing metadata dictionary
+                entry.metadata.update(new_metadata)
             yield entry
+
+        if self.cache is not None:
+            logger.info("LLMMetadataEnricherPlugin: cache stats %s", self.cache.stats())
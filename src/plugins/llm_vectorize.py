@@ -1,31 +1,93 @@
 # src/plugins/llm_vectorize.py
 
-from typing import Dict, Any, Iterator
-from .base import Entry, FilterPlugin
+import logging
+from array import array
+from typing import Dict, Any, Iterator, List
+from .base import Entry, FilterPlugin, Vector, vector_bytes
+from .cache import ResultCache, open_cache
+from .embedding import get_backend, iter_batches
+
+logger = logging.getLogger(__name__)
 
 class Plugin(FilterPlugin):
     """
     A filter plugin to vectorize the content of an entry using an LLM.
+    Entries are grouped into micro-batches so that each backend call embeds
+    many entries at once. With a `cache` configured, entries whose content was
+    already embedded by the same backend, model and output settings (such as
+    the dimension) skip the backend entirely.
     """
+    # Its state (backend, cache) lives on the instance: a fresh execute resumes cleanly.
+    restartable = True
+
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.model = self.config.get("model", "text-embedding-004")
+        self.batch_size = int(self.config.get("batch_size", 32))
+        self.batch_max_tokens = self.config.get("batch_max_tokens", 16000)
+        self.batch_max_wait = self.config.get("batch_max_wait", 0.5)
+        self.backend_name = self.config.get("backend", "mock")
+        self.backend = get_backend(self.backend_name, self.model, self.config)
+        self.cache = open_cache(self.config.get("cache"))
+        # Cached vectors are only reused for the same backend, model and output settings.
+        self.cache_model = ":".join(filter(None, (self.backend_name, self.model, self.backend.settings)))
+
+    def _embed_batch(self, batch: List[Entry]) -> List[Vector]:
+        """Embeds a batch, serving what it can from the cache."""
+        if self.cache is None:
+            return self.backend.embed([entry.content for entry in batch])
+
+        keys = [
+            ResultCache.make_key(entry.content, self.cache_model, "embedding:f32")
+            for entry in batch
+        ]
+        cached = self.cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+
+        vectors: List[Vector] = [None] * len(batch)
+        for i, key in enumerate(keys):
+            if key in cached:
+                vectors[i] = array('f', cached[key])
+
+        if missing:
+            fresh = self.backend.embed([batch[i].content for i in missing])
+            if len(fresh) != len(missing):
+                raise RuntimeError(
+                    f"Embedding backend returned {len(fresh)} vectors for {len(missing)} entries."
+                )
+            to_store = []
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+                to_store.append((keys[i], vector_bytes(vector).tobytes()))
+            self.cache.put_many(to_store)
+        return vectors
 
     def execute(self, entries: Iterator[Entry]) -> Iterator[Entry]:
         """
-        Receives entries, vectorizes their content, and yields them back.
-        This is a mock implementation.
+        Receives entries, vectorizes their content in batches, and yields them
+        back in their original order.
         """
-        print(f"Executing LLMVectorizePlugin (using mock for model '{self.model}')...")
+        logger.info("Executing LLMVectorizePlugin (using '%s' backend for model '%s')...", self.backend_name, self.model)
 
-        for entry in entries:
-            # [MOCK] In a real implementation, this would call the Vertex AI API
-            # with entry.content and get back a real embedding vector.
-            print(f"  Vectorizing content for entry: {entry.id[:10]}...")
+        batches = iter_batches(
+            entries,
+            max_size=self.batch_size,
+            max_tokens=self.batch_max_tokens,
+            max_wait=self.batch_max_wait,
+        )
+        for batch in batches:
+            logger.debug("Vectorizing batch of %d entries starting at: %.10s...", len(batch), batch[0].id)
+            # Tombstones carry no content; pass them through in place.
+            live = [entry for entry in batch if not entry.is_tombstone]
+            vectors = self._embed_batch(live) if live else []
+            if len(vectors) != len(live):
+                raise RuntimeError(
+                    f"Embedding backend returned {len(vectors)} vectors for {len(live)} entries."
+                )
 
-            # Create a deterministic, fixed-size dummy vector for testing.
-            # A real text-embedding-004 vector would have 768 dimensions.
-            dummy_vector = ([0.1, 0.2, 0.3] * 256)
+            for entry, vector in zip(live, vectors):
+                entry.vector = vector
+            yield from batch
 
-            entry.vector = dummy_vector
-            yield entry
+        if self.cache is not None:
+            logger.info("LLMVectorizePlugin: cache stats %s", self.cache.stats())
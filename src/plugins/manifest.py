@@ -0,0 +1,76 @@
+# src/plugins/manifest.py
+
+import json
+import logging
+import os
+from typing import Dict, Any, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+class Manifest:
+    """
+    A change-tracking manifest for file-based subscriptions.
+
+    For every file it remembers (mtime, size, content hash) as of the last run,
+    so that unchanged files can be skipped with a single `stat` and deleted
+    files can be detected. The manifest is written atomically on `save`.
+    """
+    VERSION = 1
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (IOError, json.JSONDecodeError) as e:
+            logger.warning("Ignoring unreadable manifest %s: %s", self.path, e)
+            return
+
+        if data.get("version") != self.VERSION:
+            logger.warning("Ignoring manifest %s with unsupported version %s.", self.path, data.get('version'))
+            return
+        self.files = data.get("files", {})
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.files.get(name)
+
+    def is_unchanged(self, name: str, stat: os.stat_result) -> bool:
+        """True if the file's mtime and size match the recorded ones."""
+        record = self.files.get(name)
+        return (record is not None
+                and record["mtime_ns"] == stat.st_mtime_ns
+                and record["size"] == stat.st_size)
+
+    def record(self, name: str, stat: os.stat_result, content_hash: str):
+        self.files[name] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": content_hash,
+        }
+        self._dirty = True
+
+    def remove(self, name: str):
+        if self.files.pop(name, None) is not None:
+            self._dirty = True
+
+    def names(self) -> Set[str]:
+        return set(self.files)
+
+    def save(self):
+        """Atomically writes the manifest if anything changed."""
+        if not self._dirty:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": self.VERSION, "files": self.files}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self._dirty = False
@@ -0,0 +1,332 @@
+# src/plugins/near_duplicate.py
+
+import hashlib
+import json
+import logging
+import math
+import os
+import sqlite3
+from array import array
+from functools import partial
+from itertools import repeat
+from operator import methodcaller, mod, rshift
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple
+
+from .base import Entry, FilterPlugin, Vector, as_float32, vector_bytes
+from .parallel import bounded_map
+
+logger = logging.getLogger(__name__)
+
+# Marks an empty bin of a one-permutation MinHash signature.
+_EMPTY = 1 << 32
+# Odd constant added per rotation step when densifying empty bins.
+_ROTATION = 0x9E3779B1
+
+_blake2b64 = partial(hashlib.blake2b, digest_size=8)
+
+def shingles(text: str, size: int = 5) -> set:
+    """Character shingles of the normalized text (works for text without spaces, like Japanese)."""
+    normalized = " ".join(text.lower().split())
+    if len(normalized) <= size:
+        return {normalized} if normalized else set()
+    # Slicing through map() keeps the loop in C, which matters for long notes.
+    n = len(normalized) - size + 1
+    return set(map(normalized.__getitem__, map(slice, range(n), range(size, n + size))))
+
+
+def minhash(text: str, num_perm: int = 128, shingle_size: int = 5) -> Optional[array]:
+    """
+    Computes a MinHash signature of `num_perm` 32-bit values, or None for empty text.
+
+    Uses one-permutation hashing: every shingle is hashed once and lands in
+    one of `num_perm` bins, which keeps the minimum. Empty bins are filled
+    from the next non-empty bin (rotation densification), so the cost is
+    linear in the text length instead of `num_perm` times it.
+    """
+    shingle_set = shingles(text, shingle_size)
+    if not shingle_set:
+        return None
+
+    digests = map(methodcaller("digest"), map(_blake2b64, map(str.encode, shingle_set)))
+    hashes = sorted(map(int.from_bytes, digests, repeat("little")), reverse=True)
+    # Low bits choose the bin, high bits are the value. With the hashes in
+    # descending order, the last value written for each bin is its minimum.
+    minima = dict(zip(map(mod, hashes, repeat(num_perm)), map(rshift, hashes, repeat(32))))
+    bins = [minima.get(j, _EMPTY) for j in range(num_perm)]
+
+    if len(minima) < num_perm:
+        filled = list(bins)
+        for j in range(num_perm):
+            if filled[j] != _EMPTY:
+                continue
+            t = 1
+            while filled[(j + t) % num_perm] == _EMPTY:
+                t += 1
+            bins[j] = (filled[(j + t) % num_perm] + t * _ROTATION) & 0xFFFFFFFF
+    return array('I', bins)
+
+
+def _entry_signature(entry: Entry, num_perm: int, shingle_size: int) -> Optional[array]:
+    # Module-level, so that it can run on a process pool.
+    return None if entry.is_tombstone else minhash(entry.content, num_perm, shingle_size)
+
+
+def jaccard(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimates the Jaccard similarity of two texts from their signatures."""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def cosine(a: Vector, b: Vector) -> float:
+    a, b = as_float32(a), as_float32(b)
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def choose_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Picks (bands, rows) with bands * rows == num_perm so that the LSH
+    S-curve's midpoint, (1 / bands) ** (1 / rows), is closest to `threshold`.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        distance = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or distance < best[0]:
+            best = (distance, bands, rows)
+    return best[1], best[2]
+
+
+def band_keys(signature: array, bands: int, rows: int) -> List[int]:
+    """Hashes each band of a signature into a signed 64-bit bucket key."""
+    keys = []
+    for band in range(bands):
+        chunk = signature[band * rows:(band + 1) * rows]
+        digest = hashlib.blake2b(band.to_bytes(2, "little") + chunk.tobytes(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+class SignatureIndex:
+    """
+    A persistent LSH index of MinHash signatures, backed by SQLite.
+
+    Each entry is stored in one bucket per band, so finding candidates for a
+    new signature is one indexed lookup instead of a scan over all entries.
+    """
+    def __init__(self, path: Optional[str], num_perm: int, shingle_size: int, bands: int, rows: int):
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = rows
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS signatures ("
+            " id TEXT PRIMARY KEY, signature BLOB NOT NULL, vector BLOB)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " key INTEGER NOT NULL, id TEXT NOT NULL, PRIMARY KEY (key, id)) WITHOUT ROWID"
+        )
+
+        params = json.dumps({"num_perm": num_perm, "shingle_size": shingle_size, "bands": bands})
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+        if row is None:
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('params', ?)", (params,))
+        elif row[0] != params:
+            raise ValueError(
+                f"Near-duplicate index {path} was built with {row[0]}, not {params}. "
+                "Delete it or use the same settings."
+            )
+        self._conn.commit()
+        self._pending = 0
+
+    def _signature_of(self, entry_id: str) -> Optional[array]:
+        row = self._conn.execute("SELECT signature FROM signatures WHERE id = ?", (entry_id,)).fetchone()
+        return array('I', row[0]) if row else None
+
+    def candidates(self, keys: List[int], exclude: str) -> List[Tuple[str, array, Optional[bytes]]]:
+        """Returns (id, signature, vector) of every entry sharing a bucket with `keys`."""
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn.execute(
+            f"SELECT s.id, s.signature, s.vector FROM signatures s WHERE s.id IN ("
+            f" SELECT DISTINCT id FROM buckets WHERE key IN ({placeholders})) AND s.id != ?",
+            (*keys, exclude),
+        ).fetchall()
+        return [(entry_id, array('I', signature), vector) for entry_id, signature, vector in rows]
+
+    def add(self, entry_id: str, signature: array, keys: List[int], vector: Optional[bytes] = None):
+        """Adds an entry, replacing what was stored for its ID before."""
+        self.remove(entry_id)
+        self._conn.execute(
+            "INSERT INTO signatures (id, signature, vector) VALUES (?, ?, ?)",
+            (entry_id, signature.tobytes(), vector),
+        )
+        self._conn.executemany("INSERT OR IGNORE INTO buckets (key, id) VALUES (?, ?)",
+                               [(key, entry_id) for key in keys])
+        self._maybe_commit()
+
+    def remove(self, entry_id: str):
+        previous = self._signature_of(entry_id)
+        if previous is None:
+            return
+        old_keys = band_keys(previous, self.bands, self.rows)
+        self._conn.executemany("DELETE FROM buckets WHERE key = ? AND id = ?",
+                               [(key, entry_id) for key in old_keys])
+        self._conn.execute("DELETE FROM signatures WHERE id = ?", (entry_id,))
+        self._maybe_commit()
+
+    def _maybe_commit(self):
+        # Batch writes into transactions rather than committing per entry.
+        self._pending += 1
+        if self._pending >= 1000:
+            self.commit()
+
+    def commit(self):
+        self._conn.commit()
+        self._pending = 0
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def close(self):
+        self.commit()
+        self._conn.close()
+
+
+class Plugin(FilterPlugin):
+    """
+    A filter plugin that collapses near-duplicate notes before the expensive
+    LLM stages.
+
+    Each entry's content gets a MinHash signature; LSH banding finds earlier
+    entries (from this run or, through the persistent `index_path`, from
+    previous runs) that share a bucket, and a candidate is a duplicate if the
+    estimated Jaccard similarity reaches `threshold` and, when both entries
+    carry vectors and `vector_threshold` is set, their cosine similarity too.
+    Duplicates are dropped (`action: drop`) or passed on with `duplicate_of`
+    metadata (`action: mark`). Collapsed entries are logged and optionally
+    written to `report_path` as JSON lines.
+
+    Signatures are computed on a bounded pool of `workers` (processes by
+    default, see `executor`), as hashing the shingles dominates the cost.
+    """
+    # Duplicates have different IDs, so they would land on different shards.
+    shardable = False
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.index_path = self.config.get("index_path")
+        self.threshold = float(self.config.get("threshold", 0.8))
+        self.num_perm = int(self.config.get("num_perm", 128))
+        self.shingle_size = int(self.config.get("shingle_size", 5))
+        vector_threshold = self.config.get("vector_threshold")
+        self.vector_threshold = float(vector_threshold) if vector_threshold is not None else None
+        self.action = self.config.get("action", "drop")
+        if self.action not in ("drop", "mark"):
+            raise ValueError(f"Unknown near-duplicate action '{self.action}'. Use 'drop' or 'mark'.")
+        self.report_path = self.config.get("report_path")
+        self.workers = int(self.config.get("workers", 1))
+        self.executor = self.config.get("executor", "process")
+        if "bands" in self.config:
+            self.bands = int(self.config["bands"])
+            if self.num_perm % self.bands:
+                raise ValueError("'num_perm' must be a multiple of 'bands'.")
+            self.rows = self.num_perm // self.bands
+        else:
+            self.bands, self.rows = choose_bands(self.threshold, self.num_perm)
+        self.stats: Dict[str, int] = {}
+
+    def _find_duplicate(self, index: SignatureIndex, entry: Entry, signature: array,
+                        keys: List[int]) -> Optional[Tuple[str, float]]:
+        """Returns (id, similarity) of the most similar earlier entry above the thresholds."""
+        best = None
+        for other_id, other_signature, other_vector in index.candidates(keys, exclude=entry.id):
+            similarity = jaccard(signature, other_signature)
+            if similarity < self.threshold:
+                continue
+            if (self.vector_threshold is not None and other_vector and len(entry.vector)
+                    and cosine(entry.vector, array('f', other_vector)) < self.vector_threshold):
+                continue
+            if best is None or similarity > best[1]:
+                best = (other_id, similarity)
+        return best
+
+    def _collapse(self, index: SignatureIndex, report, entry: Entry, future) -> Optional[Entry]:
+        """Returns the entry to pass on (None for a dropped duplicate) and indexes it."""
+        if entry.is_tombstone:
+            # A deleted note must no longer absorb its copies.
+            index.remove(entry.id)
+            return entry
+
+        self.stats["entries"] += 1
+        signature = future.result()
+        if signature is None:
+            return entry
+        keys = band_keys(signature, self.bands, self.rows)
+
+        duplicate = self._find_duplicate(index, entry, signature, keys)
+        if duplicate is None:
+            vector = bytes(vector_bytes(entry.vector)) if len(entry.vector) else None
+            index.add(entry.id, signature, keys, vector)
+            return entry
+
+        original_id, similarity = duplicate
+        self.stats["duplicates"] += 1
+        logger.debug("Entry %.10s... is a near-duplicate of %.10s... (%.2f)",
+                     entry.id, original_id, similarity)
+        if report is not None:
+            report.write(json.dumps({
+                "id": entry.id,
+                "duplicate_of": original_id,
+                "similarity": round(similarity, 4),
+                "source_file": entry.metadata.get("source_file"),
+            }, ensure_ascii=False) + "\n")
+        if self.action == "mark":
+            entry.metadata["duplicate_of"] = original_id
+            entry.metadata["duplicate_similarity"] = round(similarity, 4)
+            return entry
+        return None
+
+    def execute(self, entries: Iterator[Entry]) -> Iterator[Entry]:
+        """
+        Receives entries and yields them without their near-duplicates.
+        """
+        logger.info("Executing NearDuplicatePlugin (threshold %.2f, %d bands x %d rows)...",
+                    self.threshold, self.bands, self.rows)
+        index = SignatureIndex(self.index_path, self.num_perm, self.shingle_size, self.bands, self.rows)
+        report = open(self.report_path, 'w', encoding='utf-8') if self.report_path else None
+        self.stats = {"entries": 0, "duplicates": 0}
+        signatures = bounded_map(
+            partial(_entry_signature, num_perm=self.num_perm, shingle_size=self.shingle_size),
+            entries,
+            workers=self.workers,
+            executor=self.executor,
+        )
+        try:
+            for entry, future in signatures:
+                # The index and the report belong to this call: failed entries
+                # go to the dead-letter queue without restarting the filter.
+                try:
+                    output = self._collapse(index, report, entry, future)
+                except Exception as e:
+                    if self.fail(entry, e):
+                        continue
+                    raise
+                if output is not None:
+                    yield output
+        finally:
+            signatures.close()
+            if report is not None:
+                report.close()
+            index.close()
+
+        logger.info("NearDuplicatePlugin: collapsed %d of %d entries as near-duplicates.",
+                    self.stats["duplicates"], self.stats["entries"])
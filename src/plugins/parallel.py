@@ -0,0 +1,88 @@
+# src/plugins/parallel.py
+
+from collections import deque
+from concurrent.futures import (
+    Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait,
+)
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+EXECUTORS = {
+    "thread": ThreadPoolExecutor,
+    "process": ProcessPoolExecutor,
+}
+
+def make_executor(kind: str, workers: int) -> Executor:
+    """Creates a thread or process pool with the given number of workers."""
+    try:
+        executor_class = EXECUTORS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown executor '{kind}'. Available: {', '.join(sorted(EXECUTORS))}")
+    return executor_class(max_workers=workers)
+
+
+def _completed(fn: Callable[[T], Any], item: T) -> Future:
+    """Runs `fn` inline and wraps the outcome in an already-resolved Future."""
+    future: Future = Future()
+    try:
+        future.set_result(fn(item))
+    except BaseException as e:
+        future.set_exception(e)
+    return future
+
+
+def bounded_map(
+    fn: Callable[[T], Any],
+    items: Iterable[T],
+    workers: int = 1,
+    ordered: bool = True,
+    max_in_flight: Optional[int] = None,
+    executor: str = "thread",
+) -> Iterator[Tuple[T, Future]]:
+    """
+    Applies `fn` to every item on a worker pool and yields (item, future) pairs
+    as they finish.
+
+    At most `max_in_flight` items (default: 4 per worker) are submitted but not
+    yet yielded, so memory stays bounded however long `items` is. With
+    `ordered=True` results come back in input order; otherwise they are yielded
+    as soon as they complete. Errors are not raised here: call
+    `future.result()` to get the value or the exception for each item.
+    With a single worker, `fn` runs inline without a pool.
+    """
+    if workers <= 1:
+        for item in items:
+            yield item, _completed(fn, item)
+        return
+
+    limit = max(1, max_in_flight or workers * 4)
+    pool = make_executor(executor, workers)
+    try:
+        if ordered:
+            pending: deque = deque()
+            for item in items:
+                pending.append((item, pool.submit(fn, item)))
+                if len(pending) >= limit:
+                    head_item, head_future = pending.popleft()
+                    wait([head_future])
+                    yield head_item, head_future
+            while pending:
+                head_item, head_future = pending.popleft()
+                wait([head_future])
+                yield head_item, head_future
+        else:
+            in_flight = {}
+            for item in items:
+                in_flight[pool.submit(fn, item)] = item
+                if len(in_flight) >= limit:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield in_flight.pop(future), future
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield in_flight.pop(future), future
+    finally:
+        # If the consumer stops early, drop queued work instead of finishing it.
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,131 @@
+# src/plugins/registry.py
+
+import importlib
+import json
+import logging
+import os
+import sys
+from typing import Dict, Any, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Third-party packages register plugins under this entry-point group, e.g.
+#   [project.entry-points."shiori.plugins"]
+#   "Publish::Gmail" = "shiori_gmail:Plugin"
+ENTRY_POINT_GROUP = "shiori.plugins"
+
+KINDS = {"Subscription": "subscription", "Filter": "filter", "Publish": "publish"}
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "shiori", "plugins.json",
+)
+
+class PluginSpec(NamedTuple):
+    """Where a `module:` name is implemented, resolvable without importing it."""
+    name: str
+    target: str
+    required: Tuple[str, ...] = ()
+
+    @property
+    def kind(self) -> Optional[str]:
+        return KINDS.get(self.name.split("::", 1)[0])
+
+
+BUILTIN_PLUGINS: Dict[str, PluginSpec] = {spec.name: spec for spec in [
+    PluginSpec("Subscription::GoogleKeep", "plugins.google_keep:Plugin", ("path",)),
+    PluginSpec("Subscription::Staging", "plugins.staging_subscription:Plugin", ("path",)),
+    PluginSpec("Filter::Chunk", "plugins.chunk:Plugin"),
+    PluginSpec("Filter::ImageDescription", "plugins.image_description:Plugin"),
+    PluginSpec("Filter::LLM::MetadataEnricher", "plugins.llm_metadata_enricher:Plugin"),
+    PluginSpec("Filter::LLM::Vectorize", "plugins.llm_vectorize:Plugin"),
+    PluginSpec("Filter::NearDuplicate", "plugins.near_duplicate:Plugin"),
+    PluginSpec("Publish::BigQuery", "plugins.big_query:Plugin", ("table_id",)),
+    PluginSpec("Publish::LexicalIndex", "plugins.lexical_index:Plugin", ("path",)),
+    PluginSpec("Publish::Staging", "plugins.staging_publish:Plugin", ("path",)),
+    PluginSpec("Publish::VectorIndex", "plugins.vector_index:Plugin", ("path",)),
+]}
+
+_discovered: Optional[Dict[str, PluginSpec]] = None
+
+def _fingerprint() -> list:
+    # Installing or removing a distribution changes its site directory's mtime.
+    stamps = []
+    for path in sys.path:
+        try:
+            stamps.append([path, os.stat(path or ".").st_mtime_ns])
+        except OSError:
+            continue
+    return stamps
+
+
+def discover_entry_points(cache_path: Optional[str] = DEFAULT_CACHE_PATH) -> Dict[str, PluginSpec]:
+    """
+    Returns the plugins registered through entry points.
+
+    Scanning installed distributions is slow, so the table is cached on disk
+    and only rebuilt when the import path or one of its directories changed.
+    """
+    global _discovered
+    if _discovered is not None:
+        return _discovered
+
+    fingerprint = _fingerprint()
+    if cache_path:
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get("fingerprint") == fingerprint:
+                _discovered = {name: PluginSpec(name, target) for name, target in cached["plugins"].items()}
+                return _discovered
+        except (OSError, ValueError, KeyError):
+            pass
+
+    from importlib.metadata import entry_points
+    _discovered = {ep.name: PluginSpec(ep.name, ep.value) for ep in entry_points(group=ENTRY_POINT_GROUP)}
+
+    if cache_path:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            tmp_path = f"{cache_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "fingerprint": fingerprint,
+                    "plugins": {name: spec.target for name, spec in _discovered.items()},
+                }, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.debug("Could not write the plugin cache %s: %s", cache_path, e)
+    return _discovered
+
+
+def resolve(name: str) -> PluginSpec:
+    """
+    Looks up a `module:` name such as 'Filter::LLM::Vectorize'. Built-in
+    plugins are resolved from a static table; entry points are only
+    consulted for other names.
+    """
+    spec = BUILTIN_PLUGINS.get(name)
+    if spec is None:
+        spec = discover_entry_points().get(name)
+    if spec is None:
+        available = sorted({*BUILTIN_PLUGINS, *discover_entry_points()})
+        raise ValueError(f"Unknown plugin '{name}'. Available: {', '.join(available)}")
+    return spec
+
+
+def load_class(spec: PluginSpec):
+    """Imports the plugin's module (and so its dependencies) on first use."""
+    module_name, _, attribute = spec.target.partition(":")
+    module = importlib.import_module(module_name)
+    return getattr(module, attribute or "Plugin")
+
+
+def create_plugin(plugin_config: Dict[str, Any]):
+    """Instantiates the plugin described by one entry of the `plugins:` list."""
+    module_str = plugin_config.get("module")
+    if not module_str:
+        raise ValueError("Plugin config must have a 'module' key.")
+    spec = resolve(module_str)
+    logger.info("Loading plugin: '%s' from '%s'", module_str, spec.target)
+    return load_class(spec)(plugin_config.get("config") or {})
@@ -0,0 +1,243 @@
+# src/plugins/staging.py
+
+"""
+A local, columnar staging format for entries, shared by Publish::Staging and
+Subscription::Staging.
+
+A staging directory holds append-only segment files, each an Arrow IPC file
+(`.arrow`, read memory-mapped) or a Parquet file (`.parquet`, loadable by
+BigQuery). Rows have the columns of the BigQuery table written by
+Publish::BigQuery, with vectors stored as a fixed-width float32 list column.
+Segments are written under a hidden temporary name and renamed once complete,
+so readers never see partial files.
+"""
+
+import json
+import os
+import time
+from typing import Any, Iterator, List, Optional, Tuple
+
+from .base import Entry, vector_bytes
+
+FORMATS = {"arrow": ".arrow", "parquet": ".parquet"}
+
+def import_pyarrow():
+    """Imports pyarrow, which is only needed when staging is used."""
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("The staging plugins need pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def entry_schema(dimensions: int):
+    pa = import_pyarrow()
+    return pa.schema([
+        ("id", pa.string()),
+        ("source", pa.string()),
+        ("content", pa.string()),
+        ("timestamp", pa.int64()),
+        # JSON text, like the BigQuery table's metadata column.
+        ("metadata", pa.string()),
+        ("vector", pa.list_(pa.float32(), dimensions)),
+        ("deleted", pa.bool_()),
+    ])
+
+
+def segment_paths(directory: str) -> List[str]:
+    """The complete segments of a staging directory, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(
+        name for name in os.listdir(directory)
+        if not name.startswith(".") and os.path.splitext(name)[1] in FORMATS.values()
+    )
+    return [os.path.join(directory, name) for name in names]
+
+
+class SegmentWriter:
+    """
+    Writes entries to one new segment, in record batches of up to
+    `batch_rows` rows. The vector width is fixed per segment: taken from
+    `dimensions`, or else from the first entry with a vector. Until the
+    width is known, entries are held back rather than written (a segment
+    without any vector is 0 dimensions wide).
+    """
+    def __init__(self, directory: str, format: str = "arrow", dimensions: Optional[int] = None,
+                 batch_rows: int = 10000, compression: Optional[str] = None):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown staging format '{format}'. Use one of: {', '.join(FORMATS)}")
+        self.directory = directory
+        self.format = format
+        self.dimensions = dimensions
+        self.batch_rows = batch_rows
+        self.compression = compression
+        self.rows = 0
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{time.time_ns() % 10**9:09d}-{os.getpid()}"
+        self.path = os.path.join(directory, name + FORMATS[format])
+        self._tmp_path = os.path.join(directory, f".{name}.tmp")
+        self._writer = None
+        self._schema = None
+        self._pending: List[Entry] = []
+
+    def write(self, entry: Entry):
+        self._pending.append(entry)
+        if self.dimensions is None and len(entry.vector):
+            self.dimensions = len(entry.vector)
+        if len(self._pending) >= self.batch_rows and self.dimensions is not None:
+            self._write_batch()
+
+    def _open(self):
+        pa = import_pyarrow()
+        if self.dimensions is None:
+            self.dimensions = 0
+        self._schema = entry_schema(self.dimensions)
+        if self.format == "arrow":
+            options = pa.ipc.IpcWriteOptions(compression=self.compression) if self.compression else None
+            self._writer = pa.ipc.new_file(self._tmp_path, self._schema, options=options)
+        else:
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self._tmp_path, self._schema, compression=self.compression or "snappy")
+
+    def _vector_column(self, entries: List[Entry]):
+        pa = import_pyarrow()
+        dimensions = self.dimensions
+        width = 4 * dimensions
+        padding = bytes(width)
+        flat = bytearray()
+        valid = []
+        for entry in entries:
+            view = vector_bytes(entry.vector)
+            if len(view) == width and width:
+                flat += view
+                valid.append(True)
+            elif not len(view):
+                flat += padding
+                valid.append(False)
+            else:
+                raise ValueError(
+                    f"Entry {entry.id} has a {len(view) // 4}-dimensional vector, but this staging segment "
+                    f"stores {dimensions} dimensions; set 'dimensions' in the config."
+                )
+        values = pa.Array.from_buffers(pa.float32(), len(entries) * dimensions, [None, pa.py_buffer(flat)])
+        # A boolean array's data buffer is a bitmap, laid out like a validity bitmap.
+        validity = None if all(valid) else pa.array(valid, pa.bool_()).buffers()[1]
+        return pa.Array.from_buffers(
+            pa.list_(pa.float32(), dimensions), len(entries), [validity], children=[values]
+        )
+
+    def _write_batch(self):
+        if not self._pending:
+            return
+        if self._writer is None:
+            self._open()
+        pa = import_pyarrow()
+        entries = self._pending
+        batch = pa.RecordBatch.from_arrays([
+            pa.array([e.id for e in entries], pa.string()),
+            pa.array([e.source for e in entries], pa.string()),
+            pa.array([e.content for e in entries], pa.string()),
+            pa.array([e.timestamp for e in entries], pa.int64()),
+            pa.array([json.dumps(e.metadata, ensure_ascii=False, separators=(",", ":")) for e in entries],
+                     pa.string()),
+            self._vector_column(entries),
+            pa.array([e.is_tombstone for e in entries], pa.bool_()),
+        ], schema=self._schema)
+        self._writer.write_batch(batch)
+        self.rows += len(entries)
+        self._pending = []
+
+    def close(self) -> Optional[str]:
+        """Finishes the segment and makes it visible; returns its path (None if empty)."""
+        self._write_batch()
+        if self._writer is None:
+            return None
+        self._writer.close()
+        with open(self._tmp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        """Discards a segment that could not be completed."""
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception:
+                pass
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def _open_batches(path: str, batch_rows: int) -> Iterator[Any]:
+    pa = import_pyarrow()
+    if path.endswith(FORMATS["arrow"]):
+        # Batches reference the mapped file directly; the mapping lives as
+        # long as any buffer (and so any entry vector) taken from it.
+        reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+    else:
+        import pyarrow.parquet as pq
+        yield from pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=batch_rows)
+
+
+def _float_view(values) -> memoryview:
+    """A float32 memoryview of a float array's data buffer, including its slice offset."""
+    if not len(values):
+        return memoryview(b"").cast('f')
+    floats = memoryview(values.buffers()[1]).cast('B').cast('f')
+    return floats[values.offset:values.offset + len(values)]
+
+
+def _vector_spans(column) -> Tuple[Optional[memoryview], List[int]]:
+    """
+    A float32 view of a vector column's values and the start offset of each
+    row (plus the end of the last one). Fixed-width columns are the norm;
+    variable-length lists are accepted too.
+    """
+    pa = import_pyarrow()
+    if not len(column):
+        return None, [0]
+    if pa.types.is_fixed_size_list(column.type):
+        dimensions = column.type.list_size
+        if not dimensions:
+            return None, [0] * (len(column) + 1)
+        start = column.offset * dimensions
+        return _float_view(column.values), [start + i * dimensions for i in range(len(column) + 1)]
+    return _float_view(column.values), column.offsets.to_pylist()
+
+
+def read_entries(path: str, skip=None, batch_rows: int = 10000) -> Iterator[Entry]:
+    """
+    Yields the entries of one segment. In Arrow segments, vectors are
+    memoryviews of the mapped file: nothing is copied or converted.
+    `skip(entry_id)` drops rows before they are decoded.
+    """
+    for batch in _open_batches(path, batch_rows):
+        ids = batch.column(0).to_pylist()
+        sources = batch.column(1).to_pylist()
+        contents = batch.column(2).to_pylist()
+        timestamps = batch.column(3).to_pylist()
+        metadatas = batch.column(4).to_pylist()
+        vectors = batch.column(5)
+        valid = vectors.is_valid().to_pylist() if vectors.null_count else None
+        floats, offsets = _vector_spans(vectors)
+
+        for i, entry_id in enumerate(ids):
+            if skip is not None and skip(entry_id):
+                continue
+            if floats is not None and (valid is None or valid[i]):
+                vector = floats[offsets[i]:offsets[i + 1]]
+            else:
+                vector = None
+            metadata = json.loads(metadatas[i]) if metadatas[i] else {}
+            yield Entry(
+                id=entry_id,
+                source=sources[i],
+                content=contents[i] or "",
+                vector=vector,
+                metadata=metadata,
+                timestamp=timestamps[i] or 0,
+            )
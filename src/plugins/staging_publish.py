@@ -0,0 +1,80 @@
+# src/plugins/staging_publish.py
+
+import logging
+from typing import Dict, Any, Iterator, List, Optional
+
+from .base import Entry, PublishPlugin
+from .staging import FORMATS, SegmentWriter, import_pyarrow
+
+logger = logging.getLogger(__name__)
+
+class Plugin(PublishPlugin):
+    """
+    A publish plugin that stages entries in a local columnar directory.
+
+    Entries are appended as new segments (Arrow IPC files by default, or
+    Parquet with `format: parquet`) of up to `segment_rows` rows, vectors
+    stored as fixed-width float32 columns. Subscription::Staging reads them
+    back memory-mapped, so downstream stages can be re-run without
+    re-embedding; Parquet segments can also be loaded into BigQuery as is.
+    Without `dimensions`, the vector width is that of the first vector, kept
+    for later segments. Entries are committed once the segment holding them
+    is complete.
+    """
+    commits_explicitly = True
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.path = self.config.get("path")
+        if not self.path:
+            raise ValueError("Config for Staging plugin must contain a 'path'.")
+        self.format = self.config.get("format", "arrow")
+        if self.format not in FORMATS:
+            raise ValueError(f"Unknown staging format '{self.format}'. Use one of: {', '.join(FORMATS)}")
+        dimensions = self.config.get("dimensions")
+        self.dimensions: Optional[int] = int(dimensions) if dimensions is not None else None
+        self.batch_rows = int(self.config.get("batch_rows", 10000))
+        self.segment_rows = int(self.config.get("segment_rows", 100000))
+        self.compression = self.config.get("compression")
+        # Fail at startup rather than after the upstream stages did their work.
+        import_pyarrow()
+
+    def _new_segment(self) -> SegmentWriter:
+        return SegmentWriter(self.path, self.format, self.dimensions, self.batch_rows, self.compression)
+
+    def _close(self, writer: SegmentWriter):
+        writer.close()
+        if self.dimensions is None and writer.dimensions:
+            self.dimensions = writer.dimensions
+
+    def execute(self, entries: Iterator[Entry]):
+        """
+        Receives Entry objects and appends them to the staging directory.
+        """
+        logger.info("Executing StagingPublishPlugin: Writing %s segments to '%s'...", self.format, self.path)
+        writer: Optional[SegmentWriter] = None
+        ids: List[str] = []
+        segments = rows = 0
+        try:
+            for entry in entries:
+                if writer is None:
+                    writer = self._new_segment()
+                writer.write(entry)
+                ids.append(entry.id)
+                if len(ids) >= self.segment_rows:
+                    self._close(writer)
+                    self.commit(ids)
+                    segments += 1
+                    rows += len(ids)
+                    writer, ids = None, []
+            if writer is not None:
+                self._close(writer)
+                self.commit(ids)
+                segments += 1
+                rows += len(ids)
+                writer = None
+        finally:
+            if writer is not None:
+                # Not committed: the next run writes these entries again.
+                writer.abort()
+        logger.info("StagingPublishPlugin: Wrote %d entries in %d segments.", rows, segments)
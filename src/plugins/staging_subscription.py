@@ -0,0 +1,35 @@
+# src/plugins/staging_subscription.py
+
+import logging
+from typing import Dict, Any, Iterator
+
+from .base import Entry, SubscriptionPlugin
+from .staging import import_pyarrow, read_entries, segment_paths
+
+logger = logging.getLogger(__name__)
+
+class Plugin(SubscriptionPlugin):
+    """
+    A subscription plugin that reads entries staged by Publish::Staging.
+
+    Segments are read oldest first. Arrow segments are memory-mapped and
+    their vectors are handed out as views of the mapped file, without
+    copying or converting, so re-publishing or re-indexing staged entries
+    costs little more than reading the file.
+    """
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.path = self.config.get("path")
+        if not self.path:
+            raise ValueError("Config for Staging plugin must contain a 'path'.")
+        self.batch_rows = int(self.config.get("batch_rows", 10000))
+        import_pyarrow()
+
+    def execute(self) -> Iterator[Entry]:
+        """
+        Yields the staged entries of every complete segment.
+        """
+        segments = segment_paths(self.path)
+        logger.info("Executing StagingSubscriptionPlugin: Reading %d segments from '%s'...", len(segments), self.path)
+        for path in segments:
+            yield from read_entries(path, skip=self.is_committed, batch_rows=self.batch_rows)
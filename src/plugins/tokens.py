@@ -0,0 +1,15 @@
+# src/plugins/tokens.py
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheaply estimates the number of model tokens in a text.
+    ASCII text averages roughly four characters per token, while CJK and
+    other non-ASCII characters are counted as one token each.
+    """
+    if not text:
+        return 0
+    if text.isascii():
+        return (len(text) + 3) // 4
+    # Encoding with errors='ignore' counts the ASCII characters in C.
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
@@ -0,0 +1,439 @@
+# src/plugins/vector_index.py
+
+import argparse
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import random
+import sys
+from array import array
+from typing import Dict, Any, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from .base import Entry, PublishPlugin, Vector, as_float32
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.f32"
+ROWS_FILE = "rows.jsonl"
+META_FILE = "index.json"
+CENTROIDS_FILE = "ivf_centroids.f32"
+LISTS_FILE = "ivf_lists.json"
+# Rows scored per matrix product while clustering, to bound memory.
+_ASSIGN_BLOCK = 8192
+
+def _normalized(vector: Vector) -> "np.ndarray":
+    values = np.asarray(as_float32(vector), dtype=np.float64)
+    norm = float(np.linalg.norm(values)) or 1.0
+    return (values / norm).astype(np.float32)
+
+
+def _nearest(vectors: "np.ndarray", centroids: "np.ndarray") -> "np.ndarray":
+    """The index of the closest centroid of every row of `vectors`."""
+    return np.concatenate([
+        np.argmax(vectors[start:start + _ASSIGN_BLOCK] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), _ASSIGN_BLOCK)
+    ])
+
+
+class VectorIndex:
+    """
+    An on-disk vector index over entry vectors with metadata filters.
+
+    Vectors are L2-normalized and appended to a float32 matrix file that is
+    memory-mapped for queries, so scores are cosine similarities. Row
+    metadata lives in an append-only JSON-lines log: re-adding an ID
+    supersedes its previous row and tombstones remove it.
+
+    `search` scans every row (exact), or with `approximate=True` only the
+    rows in the `nprobe` closest IVF clusters plus rows added since the
+    clusters were built. Scores are computed with NumPy over the mapped
+    matrix, without copying it.
+    """
+    def __init__(self, path: str, dimension: Optional[int] = None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.meta: Dict[str, Any] = {"dimension": dimension, "rows": 0, "ivf": None}
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                self.meta.update(json.load(f))
+            if dimension is not None and self.meta["dimension"] not in (None, dimension):
+                raise ValueError(
+                    f"Index at {path} has dimension {self.meta['dimension']}, not {dimension}."
+                )
+
+        self._rows: List[Optional[Dict[str, Any]]] = []
+        self._latest: Dict[str, int] = {}
+        self._load_rows()
+
+        self._vectors_out = None
+        self._rows_out = None
+        self._mmap = None
+        self._matrix: Optional[memoryview] = None
+        self._mapped_rows = 0
+        self._centroids: Optional[array] = None
+        self._lists: Optional[List[List[int]]] = None
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return self.meta["dimension"]
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    @property
+    def total_rows(self) -> int:
+        """Rows in the matrix file, including superseded and deleted ones."""
+        return len(self._rows)
+
+    # --- Writing ---
+
+    def _load_rows(self):
+        rows_path = os.path.join(self.path, ROWS_FILE)
+        if not os.path.exists(rows_path):
+            return
+        with open(rows_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    self._apply(json.loads(line))
+
+    def _apply(self, record: Dict[str, Any]):
+        previous = self._latest.pop(record["id"], None)
+        if previous is not None:
+            self._rows[previous] = None
+        if record.get("deleted"):
+            return
+        # Rows are numbered in the order they were appended.
+        self._rows.append(record)
+        self._latest[record["id"]] = record["row"]
+
+    def _open_writers(self):
+        if self._vectors_out is None:
+            self._vectors_out = open(os.path.join(self.path, VECTORS_FILE), 'ab')
+            self._rows_out = open(os.path.join(self.path, ROWS_FILE), 'a', encoding='utf-8')
+
+    def add(self, entry: Entry, metadata_fields: Sequence[str] = (), snippet_chars: int = 200) -> bool:
+        """Adds (or replaces, or for tombstones removes) an entry. Returns True if indexed."""
+        self._open_writers()
+        if entry.is_tombstone:
+            if entry.id in self._latest:
+                record = {"id": entry.id, "deleted": True}
+                self._rows_out.write(json.dumps(record) + "\n")
+                self._apply(record)
+            return False
+        if len(entry.vector) == 0:
+            return False
+
+        if self.meta["dimension"] is None:
+            self.meta["dimension"] = len(entry.vector)
+        if len(entry.vector) != self.meta["dimension"]:
+            raise ValueError(
+                f"Entry {entry.id} has a {len(entry.vector)}-dimensional vector; "
+                f"the index expects {self.meta['dimension']}."
+            )
+
+        self._vectors_out.write(_normalized(entry.vector).tobytes())
+        record = {
+            "row": len(self._rows),
+            "id": entry.id,
+            "source": entry.source,
+            "timestamp": entry.timestamp,
+            "metadata": {k: entry.metadata[k] for k in metadata_fields if k in entry.metadata},
+            "snippet": entry.content[:snippet_chars],
+        }
+        self._rows_out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._apply(record)
+        return True
+
+    def flush(self):
+        """Makes everything added so far durable and visible to queries."""
+        if self._vectors_out is not None:
+            # Vectors first: a row is only ever recorded after its vector.
+            self._vectors_out.flush()
+            self._rows_out.flush()
+        self.meta["rows"] = len(self._rows)
+        tmp_path = os.path.join(self.path, META_FILE + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, os.path.join(self.path, META_FILE))
+        self._unmap()
+
+    def close(self):
+        self.flush()
+        if self._vectors_out is not None:
+            self._vectors_out.close()
+            self._rows_out.close()
+            self._vectors_out = self._rows_out = None
+
+    # --- Reading ---
+
+    def _unmap(self):
+        if self._matrix is not None:
+            self._matrix.release()
+            self._matrix = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def _matrix_view(self) -> memoryview:
+        """Returns the vector matrix as a flat float32 view over the mmap'ed file."""
+        if self._matrix is not None and self._mapped_rows != len(self._rows):
+            # Rows were added since the file was mapped.
+            self._unmap()
+        if self._matrix is None:
+            if self._vectors_out is not None:
+                self._vectors_out.flush()
+            self._mapped_rows = len(self._rows)
+            vectors_path = os.path.join(self.path, VECTORS_FILE)
+            size = len(self._rows) * (self.dimension or 0) * 4
+            if size == 0:
+                return memoryview(array('f'))
+            with open(vectors_path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._matrix = memoryview(self._mmap)[:size].cast('f')
+        return self._matrix
+
+    def _matrix_array(self) -> "np.ndarray":
+        """
+        The vector matrix as a (rows, dimension) NumPy view of the mapped
+        file. Callers drop it before the index is flushed, which unmaps the file.
+        """
+        return np.frombuffer(self._matrix_view(), dtype=np.float32).reshape(-1, self.dimension)
+
+    def _load_ivf(self):
+        if self._lists is None and self.meta.get("ivf"):
+            centroids = array('f')
+            with open(os.path.join(self.path, CENTROIDS_FILE), 'rb') as f:
+                centroids.frombytes(f.read())
+            with open(os.path.join(self.path, LISTS_FILE), 'r', encoding='utf-8') as f:
+                self._lists = json.load(f)
+            self._centroids = centroids
+
+    @staticmethod
+    def _matches(record: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+        if not filters:
+            return True
+        for key, expected in filters.items():
+            actual = record.get(key) if key in ("id", "source") else record["metadata"].get(key)
+            if isinstance(expected, (list, tuple, set)):
+                if actual not in expected:
+                    return False
+            elif actual != expected:
+                return False
+        return True
+
+    def _candidate_rows(self, query: "np.ndarray", approximate: bool, nprobe: int) -> Iterator[int]:
+        if approximate:
+            self._load_ivf()
+        if not approximate or self._lists is None:
+            return iter(range(len(self._rows)))
+
+        centroids = np.frombuffer(self._centroids, dtype=np.float32).reshape(-1, self.dimension)
+        scores = centroids @ query
+        closest = np.argsort(-scores, kind="stable")[:nprobe].tolist()
+        rows = [row for c in closest for row in self._lists[c]]
+        # Rows appended after the clusters were built are always scanned.
+        rows.extend(range(self.meta["ivf"]["rows"], len(self._rows)))
+        return iter(rows)
+
+    def search(
+        self,
+        vector: Vector,
+        k: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        approximate: bool = False,
+        nprobe: int = 8,
+    ) -> List[Dict[str, Any]]:
+        """Returns the top-k live entries by cosine similarity, best first."""
+        if not self._latest:
+            return []
+        if len(vector) != self.dimension:
+            raise ValueError(f"Query has {len(vector)} dimensions; the index has {self.dimension}.")
+
+        query = _normalized(vector)
+        if approximate or filters:
+            candidates = np.fromiter(
+                (row for row in self._candidate_rows(query, approximate, nprobe)
+                 if self._rows[row] is not None and self._matches(self._rows[row], filters)),
+                dtype=np.int64,
+            )
+        else:
+            candidates = np.fromiter(self._latest.values(), dtype=np.int64, count=len(self._latest))
+        matrix = self._matrix_array()
+        if approximate:
+            scores = matrix[candidates] @ query
+        else:
+            # One product over the whole mapped matrix, rather than a copy of the candidate rows.
+            scores = (matrix @ query)[candidates]
+        del matrix
+        if not len(candidates) or k <= 0:
+            return []
+
+        if len(candidates) > k:
+            # Only the k best are sorted.
+            best = np.argpartition(scores, -k)[-k:]
+        else:
+            best = np.arange(len(candidates))
+        top = heapq.nlargest(k, zip(scores[best].tolist(), candidates[best].tolist()))
+
+        results = []
+        for score, row in top:
+            record = self._rows[row]
+            results.append({
+                "id": record["id"],
+                "score": score,
+                "source": record["source"],
+                "timestamp": record["timestamp"],
+                "metadata": record["metadata"],
+                "snippet": record["snippet"],
+            })
+        return results
+
+    def vector_of(self, entry_id: str) -> Optional[array]:
+        """Returns the stored (normalized) vector of an entry."""
+        row = self._latest.get(entry_id)
+        if row is None:
+            return None
+        start = row * self.dimension
+        return array('f', self._matrix_view()[start:start + self.dimension])
+
+    # --- Approximate index ---
+
+    def build_ivf(self, n_lists: Optional[int] = None, iterations: int = 8, seed: int = 0):
+        """
+        Clusters the live rows with spherical k-means and stores an inverted
+        file (one row list per centroid) for approximate search.
+
+        This is an explicit maintenance step (`--build-ivf` on the command
+        line), never run while publishing.
+        """
+        self.flush()
+        live = sorted(self._latest.values())
+        if not live:
+            return
+        n_lists = max(1, min(n_lists or int(math.sqrt(len(live))), len(live)))
+        # A copy of the live rows: the mapped file is released before the final flush.
+        vectors = self._matrix_array()[live]
+
+        rng = random.Random(seed)
+        centroids = vectors[rng.sample(range(len(live)), n_lists)].copy()
+        for _ in range(iterations):
+            assignment = _nearest(vectors, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, vectors)
+            norms = np.linalg.norm(sums, axis=1)
+            filled = norms > 0
+            centroids[filled] = sums[filled] / norms[filled, None]
+
+        lists: List[List[int]] = [[] for _ in range(n_lists)]
+        for row, c in zip(live, _nearest(vectors, centroids).tolist()):
+            lists[c].append(row)
+
+        with open(os.path.join(self.path, CENTROIDS_FILE), 'wb') as f:
+            f.write(centroids.astype(np.float32).tobytes())
+        with open(os.path.join(self.path, LISTS_FILE), 'w', encoding='utf-8') as f:
+            json.dump(lists, f, separators=(",", ":"))
+
+        self.meta["ivf"] = {"lists": n_lists, "rows": len(self._rows)}
+        self._centroids, self._lists = None, None
+        self.flush()
+
+
+class Plugin(PublishPlugin):
+    """
+    A publish plugin that maintains a local vector index over entry vectors,
+    for top-k retrieval without querying the warehouse.
+    The index is flushed, and its entries committed, every `flush_every` entries.
+    The IVF clusters for approximate search are built separately, with
+    `python -m plugins.vector_index PATH --build-ivf`.
+    """
+    commits_explicitly = True
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.path = self.config.get("path")
+        if not self.path:
+            raise ValueError("Config for VectorIndex plugin must contain a 'path'.")
+        self.metadata_fields = self.config.get("metadata_fields", ["color", "is_archived"])
+        self.flush_every = max(1, int(self.config.get("flush_every", 1000)))
+
+    def execute(self, entries: Iterator[Entry]):
+        """
+        Receives Entry objects and adds them to the on-disk index.
+        """
+        logger.info("Executing VectorIndexPlugin: Indexing into '%s'...", self.path)
+        index = VectorIndex(self.path)
+        indexed = 0
+        pending: List[str] = []
+        for entry in entries:
+            if index.add(entry, self.metadata_fields):
+                indexed += 1
+            pending.append(entry.id)
+            if len(pending) >= self.flush_every:
+                index.flush()
+                self.commit(pending)
+                pending = []
+        index.flush()
+        self.commit(pending)
+
+        ivf = index.meta.get("ivf")
+        if ivf and index.total_rows > 2 * ivf["rows"]:
+            # Approximate queries scan every row added since the clusters were built.
+            logger.info("VectorIndexPlugin: The IVF clusters cover %d of %d rows; rebuild them with "
+                        "`python -m plugins.vector_index %s --build-ivf`.", ivf["rows"], index.total_rows, self.path)
+        index.close()
+        logger.info("VectorIndexPlugin: Indexed %d entries (%d live in the index).", indexed, len(index))
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command-line interface: python -m plugins.vector_index PATH (--id ID | --text TEXT | --build-ivf)"""
+    parser = argparse.ArgumentParser(description="Query a local SHIORI vector index.")
+    parser.add_argument("path", help="Index directory (the VectorIndex plugin's 'path').")
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument("--id", help="Find entries similar to this indexed entry.")
+    query.add_argument("--text", help="Embed this text and find similar entries.")
+    query.add_argument("--build-ivf", action="store_true",
+                       help="(Re)build the IVF clusters used by --approximate, then exit.")
+    parser.add_argument("--lists", type=int, help="Number of IVF clusters (default: sqrt of the rows).")
+    parser.add_argument("-k", type=int, default=10, help="Number of results.")
+    parser.add_argument("--filter", action="append", default=[], metavar="KEY=VALUE",
+                        help="Metadata filter, e.g. color=blue or source=google_keep.")
+    parser.add_argument("--approximate", action="store_true", help="Use the IVF clusters.")
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--backend", default="hash", help="Embedding backend for --text.")
+    parser.add_argument("--model", default="text-embedding-004")
+    args = parser.parse_args(argv)
+
+    index = VectorIndex(args.path)
+    if args.build_ivf:
+        index.build_ivf(n_lists=args.lists)
+        index.close()
+        print(f"Built {index.meta['ivf']['lists'] if index.meta['ivf'] else 0} IVF clusters over {len(index)} entries.")
+        return
+    if args.id:
+        vector = index.vector_of(args.id)
+        if vector is None:
+            parser.error(f"Entry '{args.id}' is not in the index.")
+    else:
+        from .embedding import get_backend
+        backend = get_backend(args.backend, args.model, {"dimensions": index.dimension})
+        vector = backend.embed([args.text])[0]
+
+    filters = {}
+    for item in args.filter:
+        key, _, value = item.partition("=")
+        filters[key] = json.loads(value) if value in ("true", "false") else value
+
+    results = index.search(vector, k=args.k, filters=filters,
+                           approximate=args.approximate, nprobe=args.nprobe)
+    json.dump(results, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# tests/test_async_runner.py
+
+import unittest
+import sys
+import os
+import asyncio
+import time
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import (
+    Entry, SubscriptionPlugin, FilterPlugin, PublishPlugin,
+    AsyncSubscriptionPlugin, AsyncFilterPlugin, AsyncPublishPlugin,
+)
+from core.async_runner import run_async_pipeline
+
+class ListSubscription(SubscriptionPlugin):
+    def __init__(self, n: int):
+        super().__init__({})
+        self.n = n
+
+    def execute(self):
+        for i in range(self.n):
+            yield Entry(id=f"id_{i:03d}", source="test", content=f"content {i}")
+
+
+class AsyncListSubscription(AsyncSubscriptionPlugin):
+    def __init__(self, n: int):
+        super().__init__({})
+        self.n = n
+
+    async def execute(self):
+        for i in range(self.n):
+            yield Entry(id=f"async_{i:03d}", source="test", content=f"content {i}")
+
+
+class UpperFilter(FilterPlugin):
+    def execute(self, entries):
+        for entry in entries:
+            entry.content = entry.content.upper()
+            yield entry
+
+
+class SlowAsyncFilter(AsyncFilterPlugin):
+    """Sleeps longer for earlier entries, so completion order differs from input order."""
+    async def process(self, entry):
+        await asyncio.sleep(0.05 if entry.id.endswith(("0", "5")) else 0.01)
+        entry.metadata["seen"] = True
+        return None if entry.id == "id_007" else entry
+
+
+class FailingAsyncFilter(AsyncFilterPlugin):
+    async def process(self, entry):
+        raise RuntimeError("enrichment failed")
+
+
+class ListPublisher(PublishPlugin):
+    def __init__(self):
+        super().__init__({})
+        self.entries = []
+
+    def execute(self, entries):
+        self.entries.extend(entries)
+
+
+class AsyncListPublisher(AsyncPublishPlugin):
+    def __init__(self):
+        super().__init__({})
+        self.entries = []
+
+    async def execute(self, entries):
+        async for entry in entries:
+            self.entries.append(entry)
+
+
+class TestAsyncRunner(unittest.TestCase):
+    """
+    Unit tests for the asyncio execution mode of the pipeline.
+    """
+
+    def test_mixed_sync_and_async_plugins_preserve_order(self):
+        """
+        Tests that sync plugins are adapted, async filters keep input order,
+        and dropped entries disappear from the stream.
+        """
+        sync_publisher, async_publisher = ListPublisher(), AsyncListPublisher()
+        run_async_pipeline(
+            [ListSubscription(20)],
+            [UpperFilter({}), SlowAsyncFilter({"concurrency": 8})],
+            [sync_publisher, async_publisher],
+            queue_size=4,
+        )
+
+        expected = [f"id_{i:03d}" for i in range(20) if i != 7]
+        self.assertEqual([e.id for e in sync_publisher.entries], expected)
+        self.assertEqual([e.id for e in async_publisher.entries], expected)
+        self.assertTrue(all(e.metadata["seen"] for e in sync_publisher.entries))
+        self.assertEqual(sync_publisher.entries[0].content, "CONTENT 0")
+
+    def test_async_filter_overlaps_requests(self):
+        """
+        Tests that an async filter keeps several entries in flight, so wall
+        time is far below the sum of per-entry latencies.
+        """
+        class Sleepy(AsyncFilterPlugin):
+            async def process(self, entry):
+                await asyncio.sleep(0.02)
+                return entry
+
+        publisher = AsyncListPublisher()
+        started = time.perf_counter()
+        run_async_pipeline([AsyncListSubscription(50)], [Sleepy({"concurrency": 25})], [publisher])
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(publisher.entries), 50)
+        self.assertLess(elapsed, 50 * 0.02 / 2)
+
+    def test_stage_failure_is_raised(self):
+        """
+        Tests that an error in any stage stops the pipeline and is re-raised
+        as the original exception.
+        """
+        with self.assertRaises(RuntimeError):
+            run_async_pipeline([ListSubscription(10)], [FailingAsyncFilter({})], [ListPublisher()])
+
+
+if __name__ == '__main__':
+    unittest.main()
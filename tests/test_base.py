@@ -0,0 +1,69 @@
+# tests/test_base.py
+
+import unittest
+import sys
+import os
+import pickle
+from array import array
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import Entry, vector_bytes
+
+class TestEntry(unittest.TestCase):
+    """
+    Unit tests for the slotted Entry and its float32 vector storage.
+    """
+
+    def test_entry_is_slotted(self):
+        """
+        Tests that entries have no per-instance __dict__.
+        """
+        entry = Entry(id="a", source="s", content="c")
+        self.assertFalse(hasattr(entry, "__dict__"))
+        with self.assertRaises(AttributeError):
+            entry.unexpected_field = 1
+
+    def test_assigned_lists_are_converted_to_float32(self):
+        """
+        Tests the migration path for plugins that still assign lists.
+        """
+        entry = Entry(id="a", source="s", content="c", vector=[0.5, 1.5])
+        self.assertIsInstance(entry.vector, array)
+        self.assertEqual(entry.vector.typecode, 'f')
+        self.assertEqual(entry.vector.tolist(), [0.5, 1.5])
+
+        entry.vector = [1.0, 2.0, 3.0]
+        self.assertEqual(len(entry.vector), 3)
+        self.assertEqual(len(Entry(id="b", source="s", content="c").vector), 0)
+
+    def test_float32_buffers_are_not_copied(self):
+        """
+        Tests that float32 buffers are stored as-is and serialized without a copy.
+        """
+        vector = array('f', [0.25, 0.5])
+        entry = Entry(id="a", source="s", content="c", vector=vector)
+        self.assertIs(entry.vector, vector)
+
+        mapped = memoryview(bytearray(vector.tobytes())).cast('f')
+        entry.vector = mapped
+        self.assertIs(entry.vector, mapped)
+
+        raw = vector_bytes(entry.vector)
+        self.assertEqual(raw.nbytes, 8)
+        self.assertIs(raw.obj, mapped.obj)
+
+    def test_pickle_round_trip(self):
+        """
+        Tests that entries, including memoryview-backed ones, can be pickled.
+        """
+        entry = Entry(id="a", source="s", content="c", metadata={"k": "v"}, timestamp=5,
+                      vector=memoryview(array('f', [1.0, 2.0]).tobytes()).cast('f'))
+        restored = pickle.loads(pickle.dumps(entry))
+        self.assertEqual(restored, entry)
+        self.assertEqual(restored.vector.tolist(), [1.0, 2.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
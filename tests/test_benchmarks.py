@@ -0,0 +1,82 @@
+# tests/test_benchmarks.py
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+# Add 'src' and 'benchmarks' to path to allow direct imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from plugins.google_keep import Plugin as GoogleKeepPlugin
+from takeout_generator import generate_takeout, parse_count
+from run_benchmarks import BenchContext, compare, run_benchmarks
+
+class TestTakeoutGenerator(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_parse_count(self):
+        self.assertEqual(parse_count("1000"), 1000)
+        self.assertEqual(parse_count("1k"), 1000)
+        self.assertEqual(parse_count("100k"), 100_000)
+        self.assertEqual(parse_count("1M"), 1_000_000)
+        self.assertEqual(parse_count("2.5k"), 2500)
+
+    def test_generated_corpus_is_readable_and_deterministic(self):
+        first = os.path.join(self.tmp, "a")
+        second = os.path.join(self.tmp, "b")
+        summary = generate_takeout(first, 50, attachment_ratio=0.5, min_chars=10, max_chars=100, seed=7)
+        generate_takeout(second, 50, attachment_ratio=0.5, min_chars=10, max_chars=100, seed=7)
+
+        self.assertEqual(summary["notes"], 50)
+        self.assertTrue(10 < summary["attachments"] < 40)
+        self.assertEqual(sorted(os.listdir(first)), sorted(os.listdir(second)))
+        with open(os.path.join(first, "note_0000003.json"), 'rb') as f_a, \
+                open(os.path.join(second, "note_0000003.json"), 'rb') as f_b:
+            self.assertEqual(f_a.read(), f_b.read())
+
+        entries = list(GoogleKeepPlugin({"path": first}).execute())
+        self.assertEqual(len(entries), 50)
+        described = [e for e in entries if "image_content_description" in e.metadata]
+        self.assertEqual(len(described), summary["attachments"])
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_run_benchmarks_reports_throughput(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            corpus = os.path.join(tmp, "takeout")
+            generate_takeout(corpus, 20, max_chars=200)
+            ctx = BenchContext(corpus, tmp, mock_latency=0.0, workers=2)
+            results = run_benchmarks(ctx, ["keep_parse", "entry_pickle"], repeat=2)
+        finally:
+            shutil.rmtree(tmp)
+
+        self.assertEqual(results["keep_parse"]["items"], 20)
+        self.assertEqual(len(results["entry_pickle"]["runs_seconds"]), 2)
+        self.assertGreater(results["entry_pickle"]["items_per_second"], 0)
+
+    def test_compare_flags_regressions(self):
+        def report(**throughput):
+            return {"meta": {}, "results": {
+                name: {"items_per_second": value} for name, value in throughput.items()
+            }}
+
+        rows = compare(report(parse=1000.0, publish=500.0, gone=1.0),
+                       report(parse=850.0, publish=480.0, new=1.0), threshold=0.1)
+        by_name = {row["name"]: row for row in rows}
+        self.assertEqual(set(by_name), {"parse", "publish"})
+        self.assertTrue(by_name["parse"]["regression"])
+        self.assertAlmostEqual(by_name["parse"]["change"], -0.15)
+        self.assertFalse(by_name["publish"]["regression"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+# tests/test_big_query.py
+
+import unittest
+import sys
+import os
+import json
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import Entry
+from plugins.big_query import Plugin as BigQueryPlugin, FakeBigQueryClient, RowsRejected, TransientError
+from core.dead_letter import isolate_publisher
+
+def make_entries(n: int):
+    return [
+        Entry(id=f"id_{i}", source="test_source", content=f"メモ {i}",
+              vector=[0.5, 0.25], metadata={"color": "blue"}, timestamp=i)
+        for i in range(n)
+    ]
+
+class TestBigQueryPlugin(unittest.TestCase):
+    """
+    Unit tests for the BigQuery publish plugin, run against the fake client.
+    """
+
+    def _plugin(self, client=None, **config):
+        plugin = BigQueryPlugin({"table_id": "entries", "client": "fake", "retry_backoff": 0, **config})
+        plugin.client = client or FakeBigQueryClient()
+        return plugin
+
+    def test_streaming_batches_are_bounded_by_rows(self):
+        """
+        Tests that rows are flushed in batches of at most `max_batch_rows`,
+        in order, with compact serialization.
+        """
+        plugin = self._plugin(max_batch_rows=4)
+        plugin.execute(iter(make_entries(10)))
+
+        rows = plugin.client.tables["entries"]
+        self.assertEqual([row["id"] for row in rows], [f"id_{i}" for i in range(10)])
+        self.assertEqual(plugin.client.calls, 3)
+        self.assertEqual(plugin.metrics["flushes"], 3)
+        self.assertEqual(json.loads(rows[0]["metadata"]), {"color": "blue"})
+        self.assertEqual(rows[0]["vector"], [0.5, 0.25])
+        self.assertFalse(rows[0]["deleted"])
+
+    def test_load_batches_are_bounded_by_bytes(self):
+        """
+        Tests that the load-job path splits batches on the byte budget.
+        """
+        row_size = len(json.dumps(BigQueryPlugin.to_row(make_entries(1)[0]),
+                                  ensure_ascii=False, separators=(",", ":")).encode()) + 1
+        plugin = self._plugin(mode="load", max_batch_bytes=row_size * 3)
+        plugin.execute(iter(make_entries(7)))
+
+        self.assertEqual(len(plugin.client.tables["entries"]), 7)
+        self.assertEqual(plugin.metrics["flushes"], 3)
+        self.assertGreater(plugin.metrics["bytes_per_second"], 0)
+
+    def test_transient_failures_are_retried(self):
+        """
+        Tests that transient errors are retried and that retries are bounded.
+        """
+        plugin = self._plugin(client=FakeBigQueryClient(fail_first=2))
+        plugin.execute(iter(make_entries(3)))
+        self.assertEqual(len(plugin.client.tables["entries"]), 3)
+        self.assertEqual(plugin.metrics["retries"], 2)
+
+        plugin = self._plugin(client=FakeBigQueryClient(fail_first=5), max_retries=1)
+        with self.assertRaises(TransientError):
+            plugin.execute(iter(make_entries(3)))
+
+    def test_tombstones_are_marked_deleted(self):
+        """
+        Tests that tombstones are published as rows with `deleted = true`.
+        """
+        plugin = self._plugin()
+        tombstone = Entry(id="gone", source="test_source", content="", metadata={"deleted": True})
+        plugin.execute(iter([tombstone]))
+        self.assertTrue(plugin.client.tables["entries"][0]["deleted"])
+
+    def test_commits_follow_flushes(self):
+        """
+        Tests that entries are reported as committed only after their batch was written.
+        """
+        plugin = self._plugin(max_batch_rows=4)
+        commits = []
+        plugin.on_commit = lambda entry_ids: commits.append((entry_ids, plugin.client.calls))
+        plugin.execute(iter(make_entries(6)))
+        self.assertEqual(commits, [
+            ([f"id_{i}" for i in range(4)], 1),
+            (["id_4", "id_5"], 2),
+        ])
+
+    def test_rejected_rows_are_not_dropped(self):
+        """
+        Tests that rows the streaming API rejects raise once the others are
+        committed, so that a dead-letter queue isolates exactly those rows.
+        """
+        client = FakeBigQueryClient(reject_ids={"id_1", "id_4"})
+        plugin = self._plugin(client=client, max_batch_rows=4)
+        commits = []
+        plugin.on_commit = commits.extend
+        with self.assertRaises(RowsRejected):
+            plugin.execute(iter(make_entries(6)))
+        self.assertEqual(commits, ["id_0", "id_2", "id_3"])
+
+        client = FakeBigQueryClient(reject_ids={"id_1", "id_4"})
+        plugin = self._plugin(client=client, max_batch_rows=4)
+        rejected = []
+        isolate_publisher(plugin, plugin.execute, iter(make_entries(6)),
+                          lambda entry, error: rejected.append(entry.id))
+        self.assertEqual(sorted(rejected), ["id_1", "id_4"])
+        self.assertEqual(sorted(row["id"] for row in client.tables["entries"]),
+                         ["id_0", "id_2", "id_3", "id_5"])
+
+    def test_the_real_client_is_the_default(self):
+        """
+        Tests that rows go to BigQuery unless the fake client is asked for,
+        and that the fake one is announced loudly.
+        """
+        self.assertEqual(BigQueryPlugin({"table_id": "entries"}).client_kind, "bigquery")
+        with self.assertLogs("plugins.big_query", level="WARNING") as logs:
+            BigQueryPlugin({"table_id": "entries", "client": "fake"})
+        self.assertIn("NOTHING is written to entries", logs.output[0])
+        with self.assertRaises(ValueError):
+            BigQueryPlugin({"table_id": "entries", "client": "bq"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+# tests/test_cache.py
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import Entry
+from plugins.cache import ResultCache, open_cache
+from plugins.embedding import MockEmbeddingBackend
+from plugins.llm_metadata_enricher import Plugin as MetadataEnricherPlugin
+from plugins.llm_vectorize import Plugin as VectorizePlugin
+
+class CountingBackend(MockEmbeddingBackend):
+    """A mock backend that records how many texts it was asked to embed."""
+    def __init__(self, model, config):
+        super().__init__(model, config)
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += len(texts)
+        return super().embed(texts)
+
+
+class TestResultCache(unittest.TestCase):
+    """
+    Unit tests for the persistent result cache shared by the LLM filters.
+    """
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.test_dir, "cache.sqlite3")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_key_depends_on_content_model_and_prompt(self):
+        """
+        Tests that each key component changes the key.
+        """
+        base = ResultCache.make_key("content", "model-a", "prompt")
+        self.assertEqual(base, ResultCache.make_key("content", "model-a", "prompt"))
+        self.assertNotEqual(base, ResultCache.make_key("content!", "model-a", "prompt"))
+        self.assertNotEqual(base, ResultCache.make_key("content", "model-b", "prompt"))
+        self.assertNotEqual(base, ResultCache.make_key("content", "model-a", "other prompt"))
+
+    def test_persistence_and_counters(self):
+        """
+        Tests that values survive reopening and that hits and misses are counted.
+        """
+        cache = ResultCache(self.cache_path)
+        cache.put("k1", b"v1")
+        cache.close()
+
+        cache = ResultCache(self.cache_path)
+        self.assertEqual(cache.get("k1"), b"v1")
+        self.assertIsNone(cache.get("k2"))
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+        cache.close()
+
+    def test_lru_eviction_by_count_and_size(self):
+        """
+        Tests that the least recently used rows are evicted first.
+        """
+        cache = ResultCache(self.cache_path, max_entries=2)
+        cache.put("a", b"1")
+        cache.put("b", b"2")
+        cache.get("a")           # 'a' is now more recent than 'b'
+        cache.put("c", b"3")     # evicts 'b'
+
+        self.assertEqual(set(cache.get_many(["a", "b", "c"])), {"a", "c"})
+        self.assertEqual(cache.stats()["evictions"], 1)
+        cache.close()
+
+        cache = ResultCache(os.path.join(self.test_dir, "sized.sqlite3"), max_bytes=10)
+        cache.put("x", b"12345")
+        cache.put("y", b"12345")
+        cache.put("z", b"12345")
+        self.assertIsNone(cache.get("x"))
+        self.assertLessEqual(cache.stats()["bytes"], 10)
+        cache.close()
+
+    def test_unchanged_entries_skip_the_model(self):
+        """
+        Tests that a second run over unchanged entries never calls the backend,
+        and that both LLM filters can share one cache file.
+        """
+        cache_config = {"path": self.cache_path}
+        plugin = VectorizePlugin({"cache": cache_config})
+        backend = CountingBackend(plugin.model, plugin.config)
+        plugin.backend = backend
+
+        def make_entries():
+            return [Entry(id=f"id_{i}", source="test", content=f"note {i}") for i in range(5)]
+
+        first = list(plugin.execute(iter(make_entries())))
+        second = list(plugin.execute(iter(make_entries())))
+
+        self.assertEqual(backend.calls, 5)
+        self.assertEqual([e.vector for e in first], [e.vector for e in second])
+
+        enricher = MetadataEnricherPlugin({"cache": cache_config})
+        self.assertIs(enricher.cache, plugin.cache)
+        list(enricher.execute(iter(make_entries())))
+        enriched = list(enricher.execute(iter(make_entries())))
+        self.assertEqual(enriched[0].metadata["llm_intent"], "mock_intent_for_testing")
+        self.assertEqual(open_cache(cache_config).stats()["hits"], 10)
+
+    def test_vectors_are_cached_per_dimension(self):
+        """
+        Tests that changing an output setting of the backend (the hash
+        backend's dimension) does not serve vectors cached under the old one.
+        """
+        cache_config = {"path": self.cache_path}
+        entries = lambda: [Entry(id="id_0", source="test", content="note")]
+        small = VectorizePlugin({"backend": "hash", "dimensions": 8, "cache": cache_config})
+        self.assertEqual(len(next(small.execute(iter(entries()))).vector), 8)
+        large = VectorizePlugin({"backend": "hash", "dimensions": 16, "cache": cache_config})
+        self.assertEqual(len(next(large.execute(iter(entries()))).vector), 16)
+        self.assertEqual(len(next(small.execute(iter(entries()))).vector), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,223 @@
+# tests/test_checkpoint.py
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from functools import partial
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import Entry, SubscriptionPlugin, FilterPlugin, PublishPlugin
+from core.async_runner import run_async_pipeline
+from core.checkpoint import CheckpointStore, Checkpointer
+from core.metrics import PipelineMetrics
+from core.sync_runner import run_sync_pipeline
+
+class ListSubscription(SubscriptionPlugin):
+    def __init__(self, n: int, contents=None):
+        super().__init__({})
+        self.n = n
+        self.contents = contents or {}
+
+    def execute(self):
+        for i in range(self.n):
+            entry_id = f"id_{i:03d}"
+            if self.is_committed(entry_id, self.contents.get(i)):
+                continue
+            yield Entry(id=entry_id, source="test", content=self.contents.get(i, f"content {i}"),
+                        metadata={"content_hash": self.contents.get(i)})
+
+
+class CountingFilter(FilterPlugin):
+    def __init__(self):
+        super().__init__({})
+        self.seen = []
+
+    def execute(self, entries):
+        for entry in entries:
+            self.seen.append(entry.id)
+            yield entry
+
+
+class DroppingFilter(FilterPlugin):
+    """Drops the entries with an odd number."""
+    def execute(self, entries):
+        for entry in entries:
+            if int(entry.id[3:]) % 2 == 0:
+                yield entry
+
+
+class CrashingPublisher(PublishPlugin):
+    """Publishes one entry at a time; raises when asked for entry `crash_at`."""
+    def __init__(self, crash_at=None):
+        super().__init__({})
+        self.crash_at = crash_at
+        self.published = []
+
+    def execute(self, entries):
+        for entry in entries:
+            if entry.id == self.crash_at:
+                raise RuntimeError("publisher died")
+            self.published.append(entry.id)
+
+
+class BatchingPublisher(PublishPlugin):
+    """Writes in batches of three and commits only after each write."""
+    commits_explicitly = True
+
+    def __init__(self, crash_at=None):
+        super().__init__({})
+        self.crash_at = crash_at
+        self.written = []
+
+    def execute(self, entries):
+        batch = []
+        for entry in entries:
+            if entry.id == self.crash_at:
+                raise RuntimeError("publisher died")
+            batch.append(entry.id)
+            if len(batch) == 3:
+                self.written.extend(batch)
+                self.commit(batch)
+                batch = []
+        self.written.extend(batch)
+        self.commit(batch)
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "checkpoint.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def run_once(self, subscription, filter_plugin, publishers, execution="sync", complete=True):
+        filters = filter_plugin if isinstance(filter_plugin, list) else [filter_plugin]
+        checkpointer = Checkpointer(CheckpointStore(self.path, flush_every=2), publishers)
+        subscription.committed = partial(checkpointer.is_committed, subscription.name)
+        try:
+            if execution == "async":
+                run_async_pipeline([subscription], filters, publishers, queue_size=2,
+                                   checkpointer=checkpointer)
+            else:
+                run_sync_pipeline([subscription], filters, publishers, {}, PipelineMetrics(), checkpointer)
+            if complete:
+                checkpointer.complete()
+        finally:
+            checkpointer.store.close()
+        return checkpointer
+
+    def test_store_buffers_commits(self):
+        now = [0.0]
+        store = CheckpointStore(self.path, flush_every=3, flush_interval=50.0, clock=lambda: now[0])
+        store.commit("sub", "pub", [("a", "1"), ("b", "1")])
+        self.assertEqual(store.flushes, 0)
+        store.commit("sub", "pub", [("c", "1")])
+        self.assertEqual(store.flushes, 1)
+        now[0] = 100.0
+        store.commit("sub", "pub", [("d", "1"), ("a", "2")])  # flush_interval elapsed
+        self.assertEqual(store.flushes, 2)
+        store.close()
+
+        reopened = CheckpointStore(self.path)
+        self.assertEqual(reopened.load()[("sub", "pub")], {"a": "2", "b": "1", "c": "1", "d": "1"})
+        reopened.clear()
+        self.assertEqual(reopened.load(), {})
+        reopened.close()
+
+    def test_resume_skips_committed_entries(self):
+        publisher = CrashingPublisher(crash_at="id_006")
+        with self.assertRaises(RuntimeError):
+            self.run_once(ListSubscription(10), CountingFilter(), [publisher])
+        self.assertEqual(publisher.published, [f"id_{i:03d}" for i in range(6)])
+
+        # The restart only processes what was not committed.
+        retry_filter = CountingFilter()
+        retry_publisher = CrashingPublisher()
+        self.run_once(ListSubscription(10), retry_filter, [retry_publisher])
+        self.assertEqual(retry_filter.seen, [f"id_{i:03d}" for i in range(6, 10)])
+        self.assertEqual(retry_publisher.published, retry_filter.seen)
+
+        # A completed run clears the checkpoint.
+        fresh_publisher = CrashingPublisher()
+        self.run_once(ListSubscription(10), CountingFilter(), [fresh_publisher])
+        self.assertEqual(len(fresh_publisher.published), 10)
+
+    def test_resume_in_async_mode(self):
+        with self.assertRaises(RuntimeError):
+            self.run_once(ListSubscription(10), CountingFilter(), [CrashingPublisher(crash_at="id_004")], "async")
+
+        retry_filter = CountingFilter()
+        self.run_once(ListSubscription(10), retry_filter, [CrashingPublisher()], "async")
+        self.assertEqual(retry_filter.seen, [f"id_{i:03d}" for i in range(4, 10)])
+
+    def test_explicit_commits_and_partial_publishers(self):
+        batching = BatchingPublisher(crash_at="id_007")
+        steady = CrashingPublisher()
+        with self.assertRaises(RuntimeError):
+            self.run_once(ListSubscription(10), CountingFilter(), [batching, steady])
+        # Only the two written batches were committed by the batching publisher.
+        self.assertEqual(batching.written, [f"id_{i:03d}" for i in range(6)])
+        self.assertEqual(len(steady.published), 10)
+
+        retry_filter = CountingFilter()
+        retry_batching = BatchingPublisher()
+        retry_steady = CrashingPublisher()
+        self.run_once(ListSubscription(10), retry_filter, [retry_batching, retry_steady])
+        self.assertEqual(retry_filter.seen, [f"id_{i:03d}" for i in range(6, 10)])
+        self.assertEqual(retry_batching.written, retry_filter.seen)
+        self.assertEqual(retry_steady.published, [])
+
+    def test_entries_edited_since_the_interrupted_run_are_processed_again(self):
+        with self.assertRaises(RuntimeError):
+            self.run_once(ListSubscription(6, {2: "v1"}), CountingFilter(), [CrashingPublisher(crash_at="id_004")])
+
+        # id_002 was committed at v1; a subscription checking versions reads it
+        # again once it changed, and admission checks the version regardless.
+        retry_filter = CountingFilter()
+        self.run_once(ListSubscription(6, {2: "v2"}), retry_filter, [CrashingPublisher()], complete=False)
+        self.assertEqual(retry_filter.seen, ["id_002", "id_004", "id_005"])
+
+    def test_dropped_entries_are_released_and_committed(self):
+        publisher = CrashingPublisher()
+        checkpointer = self.run_once(ListSubscription(6), DroppingFilter({}), [publisher], complete=False)
+        self.assertEqual(publisher.published, ["id_000", "id_002", "id_004"])
+        self.assertEqual(checkpointer._origins, {})
+        self.assertEqual(checkpointer._derived, {})
+
+        # Nothing is left to do: the dropped entries are not read again.
+        retry_filter = CountingFilter()
+        self.run_once(ListSubscription(6), [DroppingFilter({}), retry_filter], [CrashingPublisher()])
+        self.assertEqual(retry_filter.seen, [])
+
+    def test_chunked_entries_resume_from_their_parents(self):
+        from plugins.chunk import Plugin as ChunkPlugin
+        text = " ".join(f"Sentence number {n} of the note." for n in range(8))
+        contents = {i: text for i in range(5)}
+
+        def chunker():
+            return ChunkPlugin({"max_tokens": 24, "overlap_tokens": 0})
+
+        publisher = CrashingPublisher(crash_at="id_003#1")
+        with self.assertRaises(RuntimeError):
+            self.run_once(ListSubscription(5, contents), [chunker()], [publisher])
+        self.assertIn("id_002#1", publisher.published)
+        self.assertIn("id_003#0", publisher.published)
+
+        # Parents whose chunks were all published are skipped at the subscription;
+        # the interrupted one is chunked again.
+        retry_filter = CountingFilter()
+        retry_publisher = CrashingPublisher()
+        checkpointer = self.run_once(ListSubscription(5, contents), [retry_filter, chunker()],
+                                     [retry_publisher], complete=False)
+        self.assertEqual(retry_filter.seen, ["id_003", "id_004"])
+        self.assertTrue(all(entry_id.startswith(("id_003#", "id_004#")) for entry_id in retry_publisher.published))
+        self.assertEqual(checkpointer._origins, {})
+
+if __name__ == '__main__':
+    unittest.main()
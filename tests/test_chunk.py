@@ -0,0 +1,133 @@
+# tests/test_chunk.py
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import Entry
+from plugins.chunk import Plugin as ChunkPlugin, iter_chunks, iter_sentences
+from plugins.tokens import estimate_tokens
+
+JA_TEXT = "今日は会議がありました。資料を確認して、来週の発表の準備を始めます！" * 40
+EN_TEXT = "This is a sentence about the project. Another one follows here, with more words. " * 60
+
+class TestChunking(unittest.TestCase):
+
+    def test_sentences_cover_the_text(self):
+        text = "Hello world. 今日は晴れ。「はい」と言った。\n\nNext line"
+        spans = list(iter_sentences(text))
+        self.assertEqual([text[a:b] for a, b in spans],
+                         ["Hello world. ", "今日は晴れ。", "「はい」と言った。\n\n", "Next line"])
+
+    def test_chunks_are_bounded_even_and_overlapping(self):
+        for text in (JA_TEXT, EN_TEXT, JA_TEXT + "\n" + EN_TEXT):
+            chunks = list(iter_chunks(text, max_tokens=200, overlap_tokens=30))
+            sizes = [estimate_tokens(text[a:b]) for a, b in chunks]
+            self.assertTrue(all(size <= 200 for size in sizes), sizes)
+            self.assertGreater(min(sizes), max(sizes) * 0.7, sizes)
+            self.assertEqual(chunks[0][0], 0)
+            self.assertEqual(chunks[-1][1], len(text))
+            for (_, previous_end), (start, _) in zip(chunks, chunks[1:]):
+                self.assertLess(start, previous_end)  # overlap with the previous chunk
+
+    def test_overlong_sentences_are_split(self):
+        text = "長" * 3000
+        chunks = list(iter_chunks(text, max_tokens=200, overlap_tokens=0))
+        self.assertTrue(all(estimate_tokens(text[a:b]) <= 200 for a, b in chunks))
+        self.assertEqual("".join(text[a:b] for a, b in chunks), text)
+
+
+class TestChunkPlugin(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.tmp, "chunks.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def run_plugin(self, entries, **config):
+        plugin = ChunkPlugin({"max_tokens": 200, "overlap_tokens": 30, "state_path": self.state_path, **config})
+        return list(plugin.execute(iter(entries)))
+
+    def test_long_entries_become_linked_chunks(self):
+        short = Entry(id="short", source="test", content="A short note.")
+        long = Entry(id="long", source="test", content=JA_TEXT, metadata={"color": "blue"}, timestamp=42)
+        result = self.run_plugin([short, long])
+
+        self.assertIs(result[0], short)
+        chunks = result[1:]
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual([c.id for c in chunks], [f"long#{i}" for i in range(len(chunks))])
+        for i, chunk in enumerate(chunks):
+            self.assertEqual(chunk.metadata["parent_id"], "long")
+            self.assertEqual(chunk.metadata["chunk_index"], i)
+            self.assertEqual(chunk.metadata["color"], "blue")
+            self.assertEqual(chunk.timestamp, 42)
+            self.assertLessEqual(estimate_tokens(chunk.content), 200)
+        self.assertEqual(long.metadata, {"color": "blue"})
+
+    def test_stale_chunks_are_deleted(self):
+        first = self.run_plugin([Entry(id="note", source="test", content=JA_TEXT)])
+        shorter = self.run_plugin([Entry(id="note", source="test", content=JA_TEXT[:len(JA_TEXT) // 2])])
+        live = [e.id for e in shorter if not e.is_tombstone]
+        removed = [e.id for e in shorter if e.is_tombstone]
+        self.assertEqual(sorted(live + removed), sorted(e.id for e in first))
+        self.assertTrue(removed)
+
+        deleted = self.run_plugin([Entry(id="note", source="test", content="", metadata={"deleted": True})])
+        self.assertEqual([e.id for e in deleted], ["note"] + live)
+        self.assertTrue(all(e.is_tombstone for e in deleted))
+
+    def test_entries_published_whole_are_deleted_once_chunked(self):
+        short = self.run_plugin([Entry(id="note", source="test", content="A short note.")])
+        self.assertEqual([e.id for e in short], ["note"])
+
+        grown = self.run_plugin([Entry(id="note", source="test", content=JA_TEXT)])
+        chunks = [e for e in grown if not e.is_tombstone]
+        self.assertTrue(all(e.id.startswith("note#") for e in chunks))
+        self.assertEqual([e.id for e in grown if e.is_tombstone], ["note"])
+
+        # Only the first time: the parent is not deleted again.
+        again = self.run_plugin([Entry(id="note", source="test", content=JA_TEXT)])
+        self.assertFalse(any(e.is_tombstone for e in again))
+
+    def test_chunks_are_yielded_as_they_are_cut(self):
+        """
+        Tests that the chunks of a long entry are streamed, and that a failure
+        partway leaves the state untouched while the run goes on.
+        """
+        plugin = ChunkPlugin({"max_tokens": 200, "overlap_tokens": 30, "state_path": self.state_path})
+        cut = []
+        chunks = plugin._chunks
+
+        def failing_chunks(entry):
+            for chunk in chunks(entry):
+                cut.append(chunk.id)
+                yield chunk
+                if len(cut) == 2:
+                    raise ValueError("broken sentence")
+
+        plugin._chunks = failing_chunks
+        failed = []
+        plugin.on_failure = lambda entry, error: failed.append(entry.id)
+        stream = plugin.execute(iter([Entry(id="long", source="test", content=JA_TEXT),
+                                      Entry(id="short", source="test", content="A short note.")]))
+        self.assertEqual(next(stream).id, "long#0")
+        self.assertEqual(cut, ["long#0"])
+        self.assertEqual([e.id for e in stream], ["long#1", "short"])
+        self.assertEqual(failed, ["long"])
+        self.assertEqual([e.id for e in self.run_plugin([Entry(id="long", source="test", content="A short note.")])],
+                         ["long"])
+
+    def test_overlap_must_leave_room(self):
+        with self.assertRaises(ValueError):
+            ChunkPlugin({"max_tokens": 100, "overlap_tokens": 80})
+
+if __name__ == '__main__':
+    unittest.main()
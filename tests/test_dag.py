@@ -0,0 +1,328 @@
+# tests/test_dag.py
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import Entry, SubscriptionPlugin, FilterPlugin, PublishPlugin
+from core.checkpoint import Checkpointer, CheckpointStore
+from core.config import validate_config
+from core.dag import Branch, Predicate, RouteStore, build_branches, flatten
+from core.dead_letter import open_dead_letters
+from core.metrics import PipelineMetrics
+from core.sync_runner import run_sync_pipeline
+from main import describe_plan
+
+class ListSubscription(SubscriptionPlugin):
+    def __init__(self, entries):
+        super().__init__({})
+        self.name = "list"
+        self.entries = entries
+
+    def execute(self):
+        for entry in self.entries:
+            yield entry
+
+
+class TagFilter(FilterPlugin):
+    """Appends its tag to every entry's `tags`, optionally slowly or failing on some content."""
+    restartable = True
+
+    def __init__(self, tag: str, delay: float = 0.0, fail_on: str = None):
+        super().__init__({})
+        self.name = tag
+        self.tag = tag
+        self.delay = delay
+        self.fail_on = fail_on
+        self.seen = []
+
+    def execute(self, entries):
+        for entry in entries:
+            self.seen.append(entry.id)
+            if entry.content == self.fail_on:
+                raise ValueError("cannot tag this")
+            if self.delay:
+                time.sleep(self.delay)
+            entry.metadata.setdefault("tags", []).append(self.tag)
+            yield entry
+
+
+class ListPublisher(PublishPlugin):
+    def __init__(self, name: str):
+        super().__init__({})
+        self.name = name
+        self.published = []
+        self.lock = threading.Lock()
+
+    def execute(self, entries):
+        for entry in entries:
+            with self.lock:
+                self.published.append(entry)
+
+    def ids(self):
+        return sorted(entry.id for entry in self.published if not entry.is_tombstone)
+
+    def tombstones(self):
+        return sorted(entry.id for entry in self.published if entry.is_tombstone)
+
+
+def make_entries():
+    return [
+        Entry(id="keep_1", source="google_keep", content="note", metadata={"attachments": [{"path": "a.jpg"}]}),
+        Entry(id="keep_2", source="google_keep", content="note", metadata={"attachments": []}),
+        Entry(id="gmail_1", source="gmail", content="mail", metadata={"llm_tags": ["todo", "work"]}),
+        Entry(id="gmail_2", source="gmail", content="mail", metadata={"llm_tags": ["private"]}),
+    ]
+
+
+class TestDag(unittest.TestCase):
+    """
+    Unit tests for branch routing in the pipeline graph.
+    """
+
+    def setUp(self):
+        self.metrics = PipelineMetrics()
+
+    def run_graph(self, filters, publishers, branches, entries=None, **kwargs):
+        subscription = ListSubscription(entries if entries is not None else make_entries())
+        run_sync_pipeline([subscription], filters, publishers, {"fanout": {"max_queue": 2}}, self.metrics,
+                          branches=branches, **kwargs)
+
+    def test_predicates(self):
+        keep_1, keep_2, gmail_1, gmail_2 = make_entries()
+        images = Predicate({"source": "google_keep", "metadata": {"attachments": {"exists": True}}})
+        self.assertEqual([images(e) for e in (keep_1, keep_2, gmail_1)], [True, False, False])
+        work = Predicate({"source": ["gmail", "slack"], "metadata": {"llm_tags": ["work", "urgent"]}})
+        self.assertEqual([work(e) for e in (keep_1, gmail_1, gmail_2)], [False, True, False])
+        self.assertTrue(Predicate({"metadata": {"attachments": {"exists": False}}})(gmail_1))
+        self.assertTrue(Predicate(None)(gmail_2))
+
+        tombstone = Entry(id="keep_3", source="google_keep", content="", metadata={"deleted": True})
+        self.assertTrue(images(tombstone))
+        self.assertFalse(work(tombstone))
+
+    def test_entries_only_go_through_the_stages_of_their_branches(self):
+        """
+        Tests that branch filters only see routed entries, while trunk
+        filters and publishers see everything.
+        """
+        trunk_filter, archive = TagFilter("trunk"), ListPublisher("archive")
+        describe, images = TagFilter("describe"), ListPublisher("images")
+        enrich, mail = TagFilter("enrich"), ListPublisher("mail")
+        branches = [
+            Branch("images", {"source": "google_keep", "metadata": {"attachments": {"exists": True}}},
+                   [describe], [images]),
+            Branch("mail", {"source": "gmail"}, [enrich], [mail]),
+        ]
+        self.run_graph([trunk_filter], [archive], branches)
+
+        self.assertEqual(len(trunk_filter.seen), 4)
+        self.assertEqual(archive.ids(), ["gmail_1", "gmail_2", "keep_1", "keep_2"])
+        self.assertEqual(describe.seen, ["keep_1"])
+        self.assertEqual(images.ids(), ["keep_1"])
+        self.assertEqual(images.tombstones(), [])
+        self.assertEqual(enrich.seen, ["gmail_1", "gmail_2"])
+        self.assertEqual(mail.ids(), ["gmail_1", "gmail_2"])
+        self.assertEqual(mail.tombstones(), [])
+
+        stages = {stage.name: stage for stage in self.metrics.stages}
+        self.assertEqual(stages["images"].kind, "branch")
+        self.assertEqual(stages["images"].entries, 1)
+        self.assertEqual(stages["mail/enrich"].entries, 2)
+        self.assertEqual(stages["mail/mail"].entries, 2)
+
+    def test_branches_modify_their_own_copies(self):
+        """
+        Tests that an entry sent down several branches is copied for each
+        branch that modifies it, and the trunk publisher sees the original.
+        """
+        archive, left, right = ListPublisher("archive"), ListPublisher("left"), ListPublisher("right")
+        branches = [Branch("left", None, [TagFilter("left")], [left]),
+                    Branch("right", None, [TagFilter("right")], [right])]
+        self.run_graph([TagFilter("trunk")], [archive], branches)
+
+        for entry in archive.published:
+            self.assertEqual(entry.metadata["tags"], ["trunk"])
+        for entry in left.published:
+            self.assertEqual(entry.metadata["tags"], ["trunk", "left"])
+        for entry in right.published:
+            self.assertEqual(entry.metadata["tags"], ["trunk", "right"])
+
+    def test_nested_branches(self):
+        work = ListPublisher("work")
+        everything_else = ListPublisher("everything_else")
+        branches = [Branch("mail", {"source": "gmail"}, [TagFilter("enrich")], [], [
+            Branch("work", {"metadata": {"llm_tags": "work"}}, [], [work]),
+            Branch("rest", {"metadata": {"llm_tags": {"exists": True}}}, [TagFilter("summarize")], [everything_else]),
+        ])]
+        self.run_graph([], [], branches)
+        self.assertEqual(work.ids(), ["gmail_1"])
+        self.assertEqual(work.tombstones(), [])
+        self.assertEqual(everything_else.ids(), ["gmail_1", "gmail_2"])
+        self.assertEqual(work.published[0].metadata["tags"], ["enrich"])
+        self.assertIn("mail/rest/summarize", [stage.name for stage in self.metrics.stages])
+
+        filters, publishers = flatten(branches)
+        self.assertEqual([f.name for f in filters], ["enrich", "summarize"])
+        self.assertEqual([p.name for p in publishers], ["work", "everything_else"])
+
+    def test_branches_run_concurrently_with_bounded_buffers(self):
+        entries = [Entry(id=f"id_{i}", source="test", content="") for i in range(10)]
+        slow = [Branch(f"slow_{i}", None, [TagFilter(f"slow_{i}", delay=0.03)], [ListPublisher(f"p_{i}")])
+                for i in range(3)]
+        started = time.perf_counter()
+        self.run_graph([], [], slow, entries)
+        elapsed = time.perf_counter() - started
+
+        # Three branches of 10 x 30 ms run one after the other in 0.9 s.
+        self.assertLess(elapsed, 0.7)
+        for stage in self.metrics.stages:
+            if stage.kind == "branch":
+                self.assertLessEqual(stage.queue_max_depth, 2)
+
+    def test_entries_that_stop_matching_are_withdrawn(self):
+        """
+        Tests that an entry routed down a branch on an earlier run reaches it
+        as a tombstone once it no longer matches the branch's metadata
+        condition, and that entries the branch never received are not sent.
+        """
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        work = ListPublisher("work")
+        branches = [Branch("work", {"source": "gmail", "metadata": {"llm_tags": "work"}}, [], [work])]
+        published = make_entries()
+
+        def run():
+            work.published.clear()
+            routing = RouteStore(os.path.join(tmp, "routes.db"))
+            self.run_graph([], [], branches, published, routing=routing)
+            routing.complete()
+            routing.close()
+
+        run()
+        self.assertEqual(work.ids(), ["gmail_1"])
+        self.assertEqual(work.tombstones(), [])
+
+        published[2].metadata["llm_tags"] = ["private"]
+        run()
+        self.assertEqual(work.ids(), [])
+        self.assertEqual(work.tombstones(), ["gmail_1"])
+
+        # Withdrawn once: not sent again on the next run.
+        run()
+        self.assertEqual(work.published, [])
+
+    def test_a_branch_returning_early_does_not_block_the_others(self):
+        class EarlyPublisher(ListPublisher):
+            def execute(self, entries):
+                for entry in entries:
+                    self.published.append(entry)
+                    return
+
+        early, healthy = EarlyPublisher("early"), ListPublisher("healthy")
+        branches = [Branch("early", None, [], [early]), Branch("healthy", None, [], [healthy])]
+        entries = [Entry(id=f"id_{i}", source="test", content="") for i in range(20)]
+        worker = threading.Thread(target=self.run_graph, args=([], [], branches, entries), daemon=True)
+        worker.start()
+        worker.join(timeout=5)
+
+        self.assertFalse(worker.is_alive(), "dispatch blocked on the branch that returned")
+        self.assertEqual(len(early.published), 1)
+        self.assertEqual(len(healthy.published), 20)
+
+    def test_a_failing_branch_does_not_stop_the_others(self):
+        healthy = ListPublisher("healthy")
+        branches = [Branch("broken", None, [TagFilter("broken", fail_on="mail")], [ListPublisher("never")]),
+                    Branch("healthy", None, [], [healthy])]
+        with self.assertRaises(RuntimeError) as cm:
+            self.run_graph([], [], branches)
+        self.assertIn("broken", str(cm.exception))
+        self.assertEqual(len(healthy.published), 4)
+
+    def test_checkpoints_count_routed_away_entries_as_done(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        images, mail = ListPublisher("images"), ListPublisher("mail")
+        branches = [Branch("images", {"source": "google_keep"}, [], [images]),
+                    Branch("mail", {"source": "gmail"}, [], [mail])]
+        store = CheckpointStore(os.path.join(tmp, "checkpoint.db"))
+        checkpointer = Checkpointer(store, [images, mail])
+        self.run_graph([], [], branches, checkpointer=checkpointer)
+        store.close()
+
+        checkpointer = Checkpointer(CheckpointStore(store.path), [images, mail])
+        self.addCleanup(checkpointer.store.close)
+        for entry in make_entries():
+            self.assertTrue(checkpointer.is_committed("list", entry.id))
+
+    def test_dead_letters_are_replayed_down_their_branch_only(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        describe = TagFilter("describe", fail_on="note")
+        images, everything = ListPublisher("images"), ListPublisher("everything")
+        branches = [Branch("images", {"source": "google_keep"}, [describe], [images]),
+                    Branch("all", None, [TagFilter("tag")], [everything])]
+        subscription = ListSubscription(make_entries())
+        filters, publishers = flatten(branches)
+        config = {"path": os.path.join(tmp, "dead_letters.db"), "max_failure_rate": None}
+        queue = open_dead_letters(config, self.metrics, [subscription], filters, publishers)
+        run_sync_pipeline([subscription], [], [], {}, self.metrics, dead_letters=queue, branches=branches)
+        self.assertEqual(len(everything.published), 4)
+        self.assertEqual([record.stage for record in queue.store.records()], ["describe", "describe"])
+        queue.store.close()
+
+        describe.fail_on = None
+        everything.published.clear()
+        queue = open_dead_letters(config, self.metrics, [], filters, publishers)
+        self.addCleanup(queue.store.close)
+        run_sync_pipeline([queue.replay_source()], [], [], {}, self.metrics, dead_letters=queue, branches=branches)
+        queue.complete()
+        self.assertEqual(images.ids(), ["keep_1", "keep_2"])
+        self.assertEqual(everything.published, [])
+        self.assertEqual(queue.store.count(), 0)
+
+    def test_config(self):
+        config = {
+            "plugins": [{"module": "Subscription::GoogleKeep", "config": {"path": "."}}],
+            "branches": [
+                {"name": "images", "when": {"metadata": {"attachments": {"exists": True}}},
+                 "plugins": [{"module": "Filter::ImageDescription"},
+                             {"module": "Publish::VectorIndex", "config": {"path": "vectors"}}]},
+                {"name": "chunks", "when": {"source": "google_keep"},
+                 "branches": [{"name": "lexical", "plugins": [
+                     {"module": "Filter::Chunk"},
+                     {"module": "Publish::LexicalIndex", "config": {"path": "lexical"}}]}]},
+            ],
+        }
+        self.assertEqual(validate_config(config), [])
+        plan = describe_plan(config)
+        self.assertIn('  branch images (when: {"metadata": {"attachments": {"exists": true}}})', plan)
+        self.assertTrue(any(line.startswith("      filter       Filter::Chunk") for line in plan))
+
+        branches = build_branches(config["branches"])
+        self.assertEqual([branch.name for branch in branches], ["images", "chunks"])
+        self.assertEqual([type(p).__module__ for p in branches[0].filters + branches[0].publishers],
+                         ["plugins.image_description", "plugins.vector_index"])
+
+        config["global"] = {"execution": "async"}
+        config["branches"] += [
+            {"name": "images", "plugins": [{"module": "Subscription::GoogleKeep", "config": {"path": "."}}]},
+            {"name": "bad", "when": {"sources": "gmail", "metadata": {"x": {"exists": "yes"}}}, "plugins": []},
+        ]
+        errors = "\n".join(validate_config(config))
+        self.assertIn("branches: only run with global.execution: sync.", errors)
+        self.assertIn("'images' is used twice", errors)
+        self.assertIn("Filter:: and Publish:: plugins only", errors)
+        self.assertIn("unknown keys sources", errors)
+        self.assertIn("{exists: true} or {exists: false}", errors)
+        self.assertIn("needs 'plugins' or 'branches'", errors)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,311 @@
+# tests/test_dead_letter.py
+
+import unittest
+import sys
+import os
+import json
+import shutil
+import tempfile
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import Entry, SubscriptionPlugin, FilterPlugin, PublishPlugin, AsyncFilterPlugin
+from plugins.google_keep import Plugin as GoogleKeepPlugin
+from core.async_runner import run_async_pipeline
+from core.config import validate_config
+from core.dead_letter import FailureBudgetExceeded, open_dead_letters
+from core.metrics import PipelineMetrics
+from core.sharded import run_sharded_pipeline
+from core.sync_runner import run_sync_pipeline
+
+class ListSubscription(SubscriptionPlugin):
+    def __init__(self, n: int, poison=()):
+        super().__init__({})
+        self.n = n
+        self.poison = set(poison)
+
+    def execute(self):
+        for i in range(self.n):
+            content = "poison" if i in self.poison else f"content {i}"
+            yield Entry(id=f"id_{i:03d}", source="test", content=content)
+
+
+class PoisonFilter(FilterPlugin):
+    """Upper-cases entries in batches of `batch`; a batch holding a poisoned entry fails."""
+    restartable = True
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.name = self.config.get("name", "poison_filter")
+        self.batch = self.config.get("batch", 4)
+        self.seen = []
+
+    def execute(self, entries):
+        batch = []
+
+        def flush():
+            if any(entry.content.lower() == "poison" for entry in batch) and not self.config.get("healed"):
+                raise ValueError("poisoned batch")
+            for entry in batch:
+                entry.content = entry.content.upper()
+            done = list(batch)
+            batch.clear()
+            return done
+
+        for entry in entries:
+            self.seen.append(entry.id)
+            batch.append(entry)
+            if len(batch) >= self.batch:
+                yield from flush()
+        yield from flush()
+
+
+class AsyncPoisonFilter(AsyncFilterPlugin):
+    async def process(self, entry):
+        if entry.content == "poison":
+            raise ValueError("poisoned entry")
+        return entry
+
+
+class ListPublisher(PublishPlugin):
+    def __init__(self):
+        super().__init__({})
+        self.published = []
+
+    def execute(self, entries):
+        for entry in entries:
+            self.published.append(entry.id)
+
+
+class BatchingPublisher(PublishPlugin):
+    """Writes in batches of three; a batch holding a poisoned entry fails."""
+    commits_explicitly = True
+
+    def __init__(self, healed=False):
+        super().__init__({})
+        self.name = "batching_publisher"
+        self.healed = healed
+        self.written = []
+
+    def execute(self, entries):
+        batch = []
+
+        def write():
+            if any(entry.content.lower() == "poison" for entry in batch) and not self.healed:
+                raise RuntimeError("write failed")
+            self.written.extend(entry.id for entry in batch)
+            self.commit([entry.id for entry in batch])
+            batch.clear()
+
+        for entry in entries:
+            batch.append(entry)
+            if len(batch) == 3:
+                write()
+        write()
+
+
+class SegmentPublisher(PublishPlugin):
+    """Writes everything it receives as one segment when the stream ends, or fails if it holds a poisoned entry."""
+    commits_explicitly = True
+
+    def __init__(self):
+        super().__init__({})
+        self.name = "segment_publisher"
+        self.segments = []
+
+    def execute(self, entries):
+        segment = list(entries)
+        if any(entry.content == "poison" for entry in segment):
+            raise RuntimeError("segment rejected")
+        if segment:
+            self.segments.append([entry.id for entry in segment])
+            self.commit(self.segments[-1])
+
+
+class TestDeadLetters(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "dead_letters.sqlite3")
+        self.metrics = PipelineMetrics()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def open(self, subscriptions, filters, publishers, **config):
+        config.setdefault("max_failure_rate", None)
+        queue = open_dead_letters({"path": self.path, **config}, self.metrics, subscriptions, filters, publishers)
+        self.addCleanup(queue.store.close)
+        return queue
+
+    def test_failed_entries_are_dead_lettered_and_the_rest_flow(self):
+        subscription = ListSubscription(20, poison={5, 13})
+        poison = PoisonFilter({})
+        publisher = ListPublisher()
+        queue = self.open([subscription], [poison], [publisher])
+        run_sync_pipeline([subscription], [poison], [publisher], {}, self.metrics, dead_letters=queue)
+
+        expected = [f"id_{i:03d}" for i in range(20) if i not in (5, 13)]
+        self.assertEqual(publisher.published, expected)
+        records = queue.store.records()
+        self.assertEqual([record.key for record in records], ["id_005", "id_013"])
+        self.assertEqual(records[0].stage, "poison_filter")
+        self.assertEqual(records[0].kind, "filter")
+        self.assertEqual(records[0].entry, Entry(id="id_005", source="test", content="poison"))
+        self.assertIn("poisoned batch", records[0].traceback)
+
+    def test_publisher_failures_are_dead_lettered(self):
+        subscription = ListSubscription(10, poison={4})
+        publisher = BatchingPublisher()
+        queue = self.open([subscription], [], [publisher])
+        run_sync_pipeline([subscription], [], [publisher], {}, self.metrics, dead_letters=queue)
+
+        self.assertEqual(sorted(publisher.written), [f"id_{i:03d}" for i in range(10) if i != 4])
+        record, = queue.store.records()
+        self.assertEqual((record.stage, record.kind, record.key), ("batching_publisher", "publish", "id_004"))
+
+    def test_stateful_filters_are_not_restarted(self):
+        """
+        Tests that a filter reporting its failures through `fail` keeps its
+        state, and that an escaping error aborts a filter that is not restartable.
+        """
+        from plugins.near_duplicate import Plugin as NearDuplicatePlugin
+
+        report_path = os.path.join(self.tmp, "duplicates.jsonl")
+        text = "the quick brown fox jumps over the lazy dog " * 3
+        entries = [Entry(id="a", source="test", content=text), Entry(id="b", source="test", content=text),
+                   Entry(id="bad", source="test", content=None), Entry(id="c", source="test", content=text)]
+        subscription = ListSubscription(0)
+        subscription.execute = lambda: iter(entries)
+        near_duplicate = NearDuplicatePlugin({"report_path": report_path})
+        publisher = ListPublisher()
+        queue = self.open([subscription], [near_duplicate], [publisher])
+        run_sync_pipeline([subscription], [near_duplicate], [publisher], {}, self.metrics, dead_letters=queue)
+
+        self.assertEqual(publisher.published, ["a"])
+        self.assertEqual([record.key for record in queue.store.records()], ["bad"])
+        with open(report_path, encoding='utf-8') as f:
+            self.assertEqual([json.loads(line)["id"] for line in f], ["b", "c"])
+
+        stateful = PoisonFilter({})
+        stateful.restartable = False
+        with self.assertRaises(ValueError):
+            run_sync_pipeline([ListSubscription(8, poison={3})], [stateful], [ListPublisher()], {}, self.metrics,
+                              dead_letters=queue)
+
+    def test_publisher_suspects_are_retried_in_batches(self):
+        subscription = ListSubscription(10, poison={4})
+        publisher = SegmentPublisher()
+        queue = self.open([subscription], [], [publisher])
+        run_sync_pipeline([subscription], [], [publisher], {}, self.metrics, dead_letters=queue)
+
+        written = sorted(entry_id for segment in publisher.segments for entry_id in segment)
+        self.assertEqual(written, [f"id_{i:03d}" for i in range(10) if i != 4])
+        # Halving finds the poisoned entry in four segments instead of nine single-entry ones.
+        self.assertEqual(len(publisher.segments), 4)
+        self.assertEqual([record.key for record in queue.store.records()], ["id_004"])
+
+    def test_failure_budget_aborts_the_run(self):
+        subscription = ListSubscription(20, poison={1, 2, 3})
+        poison = PoisonFilter({"batch": 1})
+        queue = self.open([subscription], [poison], [], max_failures=2)
+        with self.assertRaises(FailureBudgetExceeded):
+            run_sync_pipeline([subscription], [poison], [], {}, self.metrics, dead_letters=queue)
+        self.assertEqual(queue.store.count(), 3)
+
+        metrics = PipelineMetrics()
+        subscription = ListSubscription(20, poison={12, 14, 16})
+        queue = open_dead_letters({"path": self.path, "max_failure_rate": 0.1, "min_entries": 10},
+                                  metrics, [subscription], [poison], [])
+        self.addCleanup(queue.store.close)
+        with self.assertRaises(FailureBudgetExceeded) as cm:
+            run_sync_pipeline([subscription], [poison], [], {}, metrics, dead_letters=queue)
+        self.assertIn("2 of 15 entries failed", str(cm.exception))
+
+    def test_replay_resumes_at_the_failed_stage(self):
+        subscription = ListSubscription(8, poison={2, 6})
+        first = PoisonFilter({"name": "first", "healed": True})
+        second = PoisonFilter({"name": "second"})
+        healthy, failing = ListPublisher(), BatchingPublisher()
+        filters, publishers = [first, second], [healthy, failing]
+        queue = self.open([subscription], filters, publishers)
+        run_sync_pipeline([subscription], filters, publishers, {}, self.metrics, dead_letters=queue)
+        self.assertEqual(len(queue.store.records()), 2)
+        # A poisoned entry that reaches the publishers fails in one of them only.
+        subscription = ListSubscription(1, poison={0})
+        run_sync_pipeline([subscription], [first], publishers, {}, self.metrics, dead_letters=queue)
+        queue.store.close()
+
+        second.config["healed"] = True
+        failing.healed = True
+        first.seen.clear()
+        healthy.published.clear()
+        queue = self.open([], filters, publishers)
+        replay = queue.replay_source()
+        run_sync_pipeline([replay], filters, publishers, {}, self.metrics, dead_letters=queue)
+        queue.complete()
+
+        self.assertEqual(first.seen, [])
+        self.assertEqual(sorted(healthy.published), ["id_002", "id_006"])
+        self.assertIn("id_000", failing.written)
+        self.assertEqual(queue.store.count(), 0)
+
+    def test_failures_during_a_replay_are_kept(self):
+        subscription = ListSubscription(4, poison={1})
+        poison = PoisonFilter({})
+        queue = self.open([subscription], [poison], [ListPublisher()])
+        run_sync_pipeline([subscription], [poison], [ListPublisher()], {}, self.metrics, dead_letters=queue)
+        queue.store.close()
+
+        queue = self.open([], [poison], [ListPublisher()])
+        run_sync_pipeline([queue.replay_source()], [poison], [ListPublisher()], {}, self.metrics, dead_letters=queue)
+        queue.complete()
+        record, = queue.store.records()
+        self.assertEqual((record.key, record.attempts), ("id_001", 2))
+
+    def test_subscription_failures(self):
+        with open(os.path.join(self.tmp, "good.json"), 'w', encoding='utf-8') as f:
+            f.write('{"textContent": "fine"}')
+        with open(os.path.join(self.tmp, "odd.json"), 'w', encoding='utf-8') as f:
+            f.write('["not", "a", "note"]')
+
+        keep = GoogleKeepPlugin({"path": self.tmp})
+        with self.assertRaises(AttributeError):
+            list(keep.execute())
+
+        queue = self.open([keep], [], [])
+        self.assertEqual([entry.content for entry in keep.execute()], ["fine"])
+        record, = queue.store.records()
+        self.assertEqual(record.kind, "subscription")
+        self.assertTrue(record.key.endswith("odd.json"))
+        self.assertIsNone(record.entry)
+
+    def test_async_runner(self):
+        subscription = ListSubscription(12, poison={3})
+        filters = [PoisonFilter({"name": "sync_poison"}), AsyncPoisonFilter({})]
+        publisher = ListPublisher()
+        queue = self.open([subscription], filters, [publisher])
+        run_async_pipeline([subscription], filters, [publisher], metrics=self.metrics, dead_letters=queue)
+        self.assertEqual(len(publisher.published), 11)
+        self.assertEqual([record.stage for record in queue.store.records()], ["sync_poison"])
+
+    def test_sharded_workers_send_failures_back(self):
+        subscription = ListSubscription(40, poison={7, 30})
+        poison = PoisonFilter({})
+        publisher = ListPublisher()
+        queue = self.open([subscription], [poison], [publisher])
+        run_sharded_pipeline([subscription], [poison], [publisher], {"sharded": {"workers": 2, "batch_size": 8}},
+                             self.metrics, dead_letters=queue)
+        self.assertEqual(len(publisher.published), 38)
+        self.assertEqual(sorted(record.key for record in queue.store.records()), ["id_007", "id_030"])
+
+    def test_config_validation(self):
+        config = {"global": {"dead_letter": {"path": "dl.sqlite3", "max_failure_rate": 5, "max_failures": "x"}},
+                  "plugins": [{"module": "Subscription::GoogleKeep", "config": {"path": "."}}]}
+        errors = validate_config(config)
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(any("max_failure_rate" in error for error in errors))
+
+if __name__ == '__main__':
+    unittest.main()
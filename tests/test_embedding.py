@@ -0,0 +1,69 @@
+# tests/test_embedding.py
+
+import unittest
+import sys
+import os
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import Entry
+from plugins.embedding import iter_batches
+from plugins.tokens import estimate_tokens
+
+def make_entry(i: int, content: str = "short") -> Entry:
+    return Entry(id=f"id_{i}", source="test_source", content=content)
+
+class TestIterBatches(unittest.TestCase):
+    """
+    Unit tests for the micro-batching helper used by the vectorize filter.
+    """
+
+    def test_batches_by_count(self):
+        """
+        Tests that batches are closed at `max_size` and the tail is flushed.
+        """
+        entries = [make_entry(i) for i in range(7)]
+        batches = list(iter_batches(iter(entries), max_size=3))
+
+        self.assertEqual([len(b) for b in batches], [3, 3, 1])
+        self.assertEqual([e for b in batches for e in b], entries)
+
+    def test_batches_by_token_budget(self):
+        """
+        Tests that a batch is closed before the token budget would be exceeded,
+        and that an oversized entry is sent on its own.
+        """
+        entries = [
+            make_entry(0, "a" * 40),    # 10 tokens
+            make_entry(1, "b" * 40),    # 10 tokens
+            make_entry(2, "c" * 400),   # 100 tokens, over budget on its own
+            make_entry(3, "d" * 40),
+        ]
+        batches = list(iter_batches(iter(entries), max_size=10, max_tokens=25))
+
+        self.assertEqual([[e.id for e in b] for b in batches],
+                         [["id_0", "id_1"], ["id_2"], ["id_3"]])
+
+    def test_batches_by_max_wait(self):
+        """
+        Tests that a batch is closed once `max_wait` has elapsed since it opened.
+        """
+        ticks = iter([0.0, 0.1, 1.2, 1.3, 1.4])
+        entries = [make_entry(i) for i in range(3)]
+        batches = list(iter_batches(iter(entries), max_size=10, max_wait=1.0,
+                                    clock=lambda: next(ticks)))
+
+        self.assertEqual([[e.id for e in b] for b in batches], [["id_0", "id_1"], ["id_2"]])
+
+    def test_estimate_tokens_counts_cjk_per_character(self):
+        """
+        Tests the token estimate for ASCII and Japanese text.
+        """
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+        self.assertEqual(estimate_tokens("画像テスト"), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+# tests/test_fanout.py
+
+import unittest
+import sys
+import os
+import threading
+import time
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import Entry, PublishPlugin
+from core.fanout import SinkChannel, fan_out
+
+class RecordingPublisher(PublishPlugin):
+    """A publisher that records entry IDs, optionally slowly, failing or returning early."""
+    def __init__(self, delay: float = 0.0, fail_at: int = -1, stop_at: int = -1):
+        super().__init__({})
+        self.delay = delay
+        self.fail_at = fail_at
+        self.stop_at = stop_at
+        self.ids = []
+
+    def execute(self, entries):
+        for i, entry in enumerate(entries):
+            if i == self.fail_at:
+                raise RuntimeError("sink is down")
+            if i == self.stop_at:
+                return
+            if self.delay:
+                time.sleep(self.delay)
+            self.ids.append(entry.id)
+
+
+def make_entries(n: int, produced=None):
+    for i in range(n):
+        if produced is not None:
+            produced.append(i)
+        yield Entry(id=f"id_{i}", source="test", content=f"content {i}")
+
+
+class TestFanOut(unittest.TestCase):
+    """
+    Unit tests for the concurrent multi-publisher dispatcher.
+    """
+
+    def test_every_publisher_receives_every_entry(self):
+        """
+        Tests that all publishers receive the full stream in order.
+        """
+        publishers = [RecordingPublisher(), RecordingPublisher(), RecordingPublisher()]
+        errors = fan_out(make_entries(50), publishers, max_queue=4)
+
+        self.assertEqual(errors, {})
+        for publisher in publishers:
+            self.assertEqual(publisher.ids, [f"id_{i}" for i in range(50)])
+
+    def test_block_policy_bounds_the_backlog(self):
+        """
+        Tests that with the block policy a slow sink holds back the producer,
+        so no channel ever holds more than `max_queue` entries.
+        """
+        channel = SinkChannel("slow", max_queue=3, policy="block")
+        depths = []
+
+        def produce():
+            for entry in make_entries(20):
+                channel.put(entry)
+                depths.append(channel.depth())
+            channel.close()
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        consumed = []
+        for entry in channel:
+            time.sleep(0.001)
+            consumed.append(entry.id)
+        producer.join()
+
+        self.assertEqual(len(consumed), 20)
+        self.assertLessEqual(max(depths), 3)
+
+    def test_spill_policy_keeps_order_and_does_not_block(self):
+        """
+        Tests that the spill policy lets the producer run ahead of a slow sink
+        without losing entries or reordering them.
+        """
+        channel = SinkChannel("slow", max_queue=2, policy="spill")
+        for entry in make_entries(10):
+            channel.put(entry)     # never blocks, even with no consumer yet
+        channel.close()
+
+        self.assertEqual(channel.spilled_total, 8)
+        self.assertEqual([e.id for e in channel], [f"id_{i}" for i in range(10)])
+        self.assertEqual(channel.depth(), 0)
+
+    def test_failing_sink_does_not_stop_the_others(self):
+        """
+        Tests that a failing publisher is detached and reported while the
+        others still receive everything.
+        """
+        healthy, failing = RecordingPublisher(), RecordingPublisher(fail_at=5)
+        errors = fan_out(make_entries(30), [healthy, failing], max_queue=2)
+
+        self.assertEqual(len(healthy.ids), 30)
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(next(iter(errors.values())), RuntimeError)
+
+    def test_publisher_returning_early_does_not_block_the_stream(self):
+        """
+        Tests that a publisher that stops reading and returns is detached:
+        the producer does not wait on its full channel.
+        """
+        healthy, early = RecordingPublisher(), RecordingPublisher(stop_at=3)
+        result = {}
+        worker = threading.Thread(
+            target=lambda: result.update(errors=fan_out(make_entries(30), [healthy, early], max_queue=2)),
+            daemon=True,
+        )
+        worker.start()
+        worker.join(timeout=5)
+
+        self.assertFalse(worker.is_alive(), "fan_out blocked on the detached channel")
+        self.assertEqual(result["errors"], {})
+        self.assertEqual(len(healthy.ids), 30)
+        self.assertEqual(early.ids, ["id_0", "id_1", "id_2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
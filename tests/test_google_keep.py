@@ -74,5 +74,140 @@ class TestGoogleKeepPluginMetadata(unittest.TestCase):
         expected_description = "This is a mock description for the image 'test_image.jpg'."
         self.assertEqual(metadata["image_content_description"], expected_description)
 
+class TestGoogleKeepPluginIncremental(unittest.TestCase):
+    """
+    Unit tests for the incremental mode of the GoogleKeep subscription plugin.
+    """
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.manifest_path = os.path.join(tempfile.mkdtemp(), 'manifest')
+        for name in ('a.json', 'b.json'):
+            self._write_note(name, f"content of {name}")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(os.path.dirname(self.manifest_path))
+
+    def _write_note(self, filename, text):
+        with open(os.path.join(self.test_dir, filename), 'w', encoding='utf-8') as f:
+            json.dump({"textContent": text, "createdTimestampUsec": 1000}, f)
+
+    def _run(self, succeeds=True):
+        plugin = GoogleKeepPlugin({
+            "path": self.test_dir,
+            "incremental": True,
+            "manifest_path": self.manifest_path,
+        })
+        entries = list(plugin.execute())
+        if succeeds:
+            plugin.complete()
+        return entries
+
+    def test_only_changed_notes_are_yielded(self):
+        """
+        Tests that a rerun yields nothing, and that only modified or new notes
+        are yielded after a change.
+        """
+        # 1. First run yields everything and writes the manifest
+        first = self._run()
+        self.assertEqual(sorted(e.metadata["source_file"] for e in first), ['a.json', 'b.json'])
+        self.assertTrue(os.path.exists(self.manifest_path))
+
+        # 2. An unchanged rerun yields nothing
+        self.assertEqual(self._run(), [])
+
+        # 3. A touched-but-identical file is skipped, a modified and a new one are yielded
+        os.utime(os.path.join(self.test_dir, 'a.json'), ns=(1, 1))
+        self._write_note('b.json', "edited content, longer than before")
+        self._write_note('c.json', "a brand new note")
+        changed = self._run()
+        self.assertEqual(sorted(e.metadata["source_file"] for e in changed), ['b.json', 'c.json'])
+        self.assertTrue(all(not e.is_tombstone for e in changed))
+
+    def test_failed_run_is_read_again(self):
+        """
+        Tests that the manifest is not written by a run that fails after
+        reading the notes (a publisher failing on its last flush), so that the
+        next run yields them again.
+        """
+        self.assertEqual(len(self._run(succeeds=False)), 2)
+        self.assertFalse(os.path.exists(self.manifest_path))
+        self.assertEqual(len(self._run()), 2)
+        self.assertEqual(self._run(), [])
+
+    def test_attachments_without_a_file_are_skipped(self):
+        """
+        Tests that an image attachment with no filePath is skipped, whether
+        images are described inline or listed for a later stage.
+        """
+        with open(os.path.join(self.test_dir, 'a.json'), 'w', encoding='utf-8') as f:
+            json.dump({"textContent": "photos", "attachments": [
+                {"mimetype": "image/png"}, {"filePath": "b.jpg", "mimetype": "image/jpeg"}]}, f)
+
+        def note(**config):
+            plugin = GoogleKeepPlugin({"path": self.test_dir, **config})
+            return next(e for e in plugin.execute() if e.metadata["source_file"] == 'a.json')
+
+        self.assertEqual(note().metadata["image_content_description"],
+                         "This is a mock description for the image 'b.jpg'.")
+        self.assertEqual(note(describe_images=False).metadata["attachments"],
+                         [{"path": os.path.join(self.test_dir, "b.jpg"), "mimetype": "image/jpeg"}])
+
+    def test_worker_pool_matches_single_threaded_output(self):
+        """
+        Tests that parsing on a thread pool yields the same entries, in the
+        same order, as the single-threaded path.
+        """
+        for i in range(20):
+            self._write_note(f"note_{i:02d}.json", f"note body {i}")
+
+        def read(**config):
+            plugin = GoogleKeepPlugin({"path": self.test_dir, **config})
+            return [(e.id, e.content, e.metadata["content_hash"]) for e in plugin.execute()]
+
+        expected = read()
+        self.assertEqual(read(workers=4, max_in_flight=5), expected)
+        self.assertEqual(sorted(read(workers=4, ordered=False)), sorted(expected))
+
+    def test_deleted_notes_yield_tombstones(self):
+        """
+        Tests that deleting a note yields exactly one tombstone with the note's ID.
+        """
+        self._run()
+        os.remove(os.path.join(self.test_dir, 'a.json'))
+
+        entries = self._run()
+        self.assertEqual(len(entries), 1)
+        self.assertTrue(entries[0].is_tombstone)
+        self.assertEqual(entries[0].id, sha256(b'a.json').hexdigest())
+
+        # The deletion is recorded, so it is not announced again
+        self.assertEqual(self._run(), [])
+
+    def test_resume_reads_notes_edited_since_the_interrupted_run(self):
+        """
+        Tests that a note committed by an interrupted run is skipped only if
+        its content is still the committed one, and that the manifest then
+        records the current content.
+        """
+        def file_hash(name):
+            with open(os.path.join(self.test_dir, name), 'rb') as f:
+                return sha256(f.read()).hexdigest()
+
+        committed = {sha256(name.encode()).hexdigest(): file_hash(name) for name in ('a.json', 'b.json')}
+        self._write_note('b.json', "edited after the interrupted run")
+
+        plugin = GoogleKeepPlugin({"path": self.test_dir, "incremental": True, "manifest_path": self.manifest_path})
+        plugin.committed = lambda entry_id, version=None: (
+            entry_id in committed and version in (None, committed[entry_id]))
+        resumed = list(plugin.execute())
+        plugin.complete()
+        self.assertEqual([e.metadata["source_file"] for e in resumed], ['b.json'])
+        self.assertEqual(resumed[0].content, "edited after the interrupted run")
+
+        # Both notes are recorded at their current content.
+        self.assertEqual(self._run(), [])
+
 if __name__ == '__main__':
     unittest.main()
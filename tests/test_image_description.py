@@ -0,0 +1,130 @@
+# tests/test_image_description.py
+
+import unittest
+import sys
+import os
+import io
+import json
+import shutil
+import tempfile
+import time
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.attachments import ImageDescriber, _import_pillow, file_sha256, load_image
+from plugins.base import Entry
+from plugins.google_keep import Plugin as GoogleKeepPlugin
+from plugins.image_description import Plugin as ImageDescriptionPlugin, DESCRIPTION_KEY
+
+class TestImageDescription(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def image(self, name: str, data: bytes = b"\xff\xd8 not really a jpeg") -> str:
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def entry(self, i: int, *paths: str) -> Entry:
+        attachments = [{"path": path, "mimetype": "image/jpeg"} for path in paths]
+        return Entry(id=f"id_{i}", source="test", content=f"note {i}", metadata={"attachments": attachments})
+
+    def test_google_keep_lists_attachments_without_describing_them(self):
+        self.image("photo.jpg")
+        with open(os.path.join(self.tmp, "note.json"), 'w', encoding='utf-8') as f:
+            json.dump({"textContent": "note", "attachments": [
+                {"filePath": "photo.jpg", "mimetype": "image/jpeg"},
+                {"filePath": "audio.3gp", "mimetype": "audio/3gpp"},
+            ]}, f)
+
+        entry, = GoogleKeepPlugin({"path": self.tmp, "describe_images": False}).execute()
+        self.assertNotIn(DESCRIPTION_KEY, entry.metadata)
+        self.assertEqual(entry.metadata["attachments"], [
+            {"path": os.path.join(self.tmp, "photo.jpg"), "mimetype": "image/jpeg"},
+            {"path": os.path.join(self.tmp, "audio.3gp"), "mimetype": "audio/3gpp"},
+        ])
+
+        described, = ImageDescriptionPlugin({}).execute([entry])
+        self.assertEqual(described.metadata[DESCRIPTION_KEY], "This is a mock description for the image 'photo.jpg'.")
+        # Local paths do not reach the publishers.
+        self.assertNotIn("attachments", described.metadata)
+
+        described_inline, = GoogleKeepPlugin({"path": self.tmp}).execute()
+        self.assertIn(DESCRIPTION_KEY, described_inline.metadata)
+        self.assertNotIn("attachments", described_inline.metadata)
+
+    def test_identical_images_are_described_once(self):
+        first = self.image("a.jpg")
+        copy = self.image("copy_of_a.jpg")
+        other = self.image("b.jpg", b"\xff\xd8 another picture")
+        entries = [self.entry(0, first, other), self.entry(1, copy), self.entry(2), self.entry(3, first)]
+
+        plugin = ImageDescriptionPlugin({"workers": 4})
+        results = list(plugin.execute(iter(entries)))
+
+        self.assertEqual([entry.id for entry in results], ["id_0", "id_1", "id_2", "id_3"])
+        self.assertEqual(plugin.describer.stats["described"], 2)
+        self.assertEqual(plugin.describer.stats["deduplicated"], 2)
+        self.assertEqual(results[0].metadata[DESCRIPTION_KEY],
+                         "This is a mock description for the image 'a.jpg'.\\n"
+                         "This is a mock description for the image 'b.jpg'.")
+        # The copy gets the description of the image with the same content.
+        self.assertEqual(results[1].metadata[DESCRIPTION_KEY], results[3].metadata[DESCRIPTION_KEY])
+        self.assertNotIn(DESCRIPTION_KEY, results[2].metadata)
+
+    def test_images_are_described_concurrently(self):
+        entries = [self.entry(i, self.image(f"{i}.jpg", f"image {i}".encode())) for i in range(16)]
+        plugin = ImageDescriptionPlugin({"workers": 8, "mock_latency": 0.05})
+        started = time.perf_counter()
+        results = list(plugin.execute(iter(entries)))
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual([entry.id for entry in results], [f"id_{i}" for i in range(16)])
+        self.assertEqual(plugin.describer.stats["described"], 16)
+        # 16 serial calls take 0.8 s.
+        self.assertLess(elapsed, 0.5)
+
+    def test_descriptions_are_cached_across_runs(self):
+        path = self.image("a.jpg")
+        config = {"cache": {"path": os.path.join(self.tmp, "cache.sqlite3")}}
+        list(ImageDescriptionPlugin(config).execute([self.entry(0, path)]))
+
+        plugin = ImageDescriptionPlugin(config)
+        result, = plugin.execute([self.entry(1, path)])
+        self.assertEqual(plugin.describer.stats["described"], 0)
+        self.assertEqual(plugin.describer.stats["cached"], 1)
+        self.assertIn("a.jpg", result.metadata[DESCRIPTION_KEY])
+
+    def test_missing_images_are_skipped(self):
+        describer = ImageDescriber(max_bytes=10)
+        self.assertIsNone(describer.describe(os.path.join(self.tmp, "missing.jpg")))
+        self.assertEqual(describer.stats["failed"], 1)
+
+        path = self.image("small.jpg", b"tiny")
+        self.assertEqual(load_image(path, "image/jpeg"), (b"tiny", "image/jpeg"))
+        self.assertEqual(len(file_sha256(path)), 64)
+
+    @unittest.skipIf(_import_pillow() is not None, "Pillow downscales large images instead")
+    def test_oversized_images_are_refused_without_pillow(self):
+        path = self.image("large.jpg", b"x" * 100)
+        with self.assertRaises(ValueError):
+            load_image(path, "image/jpeg", max_bytes=10)
+
+    @unittest.skipIf(_import_pillow() is None, "Pillow is not installed")
+    def test_large_images_are_downscaled(self):
+        Image = _import_pillow()
+        path = os.path.join(self.tmp, "large.png")
+        Image.new("RGB", (3000, 2000), (200, 100, 50)).save(path)
+        data, mimetype = load_image(path, "image/png", max_side=300)
+        self.assertEqual(mimetype, "image/jpeg")
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(image.size, (300, 200))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+# tests/test_lexical_index.py
+
+import unittest
+import sys
+import os
+import io
+import heapq
+import json
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from unittest import mock
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import Entry
+from plugins.embedding import HashEmbeddingBackend
+from plugins.lexical_index import (
+    Plugin as LexicalIndexPlugin, LexicalIndex, decode_postings, encode_postings, hybrid_search, tokenize,
+    main as lexical_index_main,
+)
+from plugins.vector_index import Plugin as VectorIndexPlugin, VectorIndex
+
+NOTES = [
+    "東京都の天気は晴れ。明日は雨らしい。",
+    "京都で紅葉を見た。清水寺がきれいだった。",
+    "Pythonで全文検索エンジンを作るメモ",
+    "猫がかわいい",
+    "東京タワーに行く予定",
+    "買い物リスト: 牛乳、卵、パン",
+]
+
+def make_entries(notes=NOTES):
+    backend = HashEmbeddingBackend("test-model", {"dimensions": 16})
+    for i, content in enumerate(notes):
+        yield Entry(id=f"id_{i}", source="google_keep", content=content,
+                    vector=backend.embed([content])[0],
+                    metadata={"color": "blue" if i % 2 else "red", "llm_tags": ["memo"]})
+
+class TestLexicalIndex(unittest.TestCase):
+    """
+    Unit tests for the BM25 lexical index publish plugin.
+    """
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.test_dir, "lexical")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _publish(self, entries, **config):
+        LexicalIndexPlugin({"path": self.index_path, **config}).execute(iter(entries))
+
+    def _ids(self, results):
+        return [result["id"] for result in results]
+
+    def test_tokenizer(self):
+        """
+        Tests that CJK runs become bigrams and other text becomes normalized words.
+        """
+        self.assertEqual(tokenize("東京都でPython入門"), ["東京", "京都", "都で", "python", "入門"])
+        self.assertEqual(tokenize("ＡＢＣ ｶﾀｶﾅ 猫"), ["abc", "カタ", "タカ", "カナ", "猫"])
+        self.assertEqual(tokenize("e-mail, 2024年"), ["e", "mail", "2024", "年"])
+
+    def test_postings_round_trip(self):
+        for docs in ([7], [1, 2, 3], list(range(0, 5000, 3))):
+            codes = [(i % 255) << 8 | 40 for i in range(len(docs))]
+            decoded_docs, decoded_codes = decode_postings(encode_postings(docs, codes), len(docs))
+            self.assertEqual(list(decoded_docs), docs)
+            self.assertEqual(list(decoded_codes), codes)
+
+    def test_search_finds_japanese_terms(self):
+        """
+        Tests BM25 ranking over bigrams, single-character queries and metadata text fields.
+        """
+        self._publish(make_entries())
+        index = LexicalIndex(self.index_path)
+        self.assertEqual(len(index), len(NOTES))
+
+        self.assertEqual(set(self._ids(index.search("京都"))), {"id_0", "id_1"})
+        self.assertEqual(self._ids(index.search("東京 天気"))[0], "id_0")
+        self.assertEqual(self._ids(index.search("検索エンジン")), ["id_2"])
+        self.assertEqual(self._ids(index.search("PYTHON")), ["id_2"])
+        self.assertEqual(self._ids(index.search("猫")), ["id_3"])
+        self.assertEqual(self._ids(index.search("卵")), ["id_5"])
+        self.assertEqual(len(index.search("memo", k=3)), 3)
+        self.assertEqual(index.search("存在しない語"), [])
+
+        result = index.search("東京", filters={"color": "blue"})
+        self.assertEqual(self._ids(result), [])
+        result, = index.search("東京タワー", k=1)
+        self.assertEqual(result["metadata"], {"color": "red"})
+        self.assertTrue(result["snippet"].startswith("東京タワー"))
+
+    def test_updates_tombstones_and_merges(self):
+        """
+        Tests that re-published IDs replace their old postings, tombstones
+        remove entries, and merged segments drop both, across runs.
+        """
+        for entry in make_entries():
+            self._publish([entry], merge_factor=3)
+        index = LexicalIndex(self.index_path)
+        self.assertEqual(index.segments, 2)  # two level-1 segments of three flushes each
+
+        edited = Entry(id="id_0", source="google_keep", content="大阪の天気")
+        tombstone = Entry(id="id_4", source="google_keep", content="", metadata={"deleted": True})
+        self._publish([edited, tombstone])
+
+        index = LexicalIndex(self.index_path)
+        self.assertEqual(len(index), len(NOTES) - 1)
+        self.assertEqual(self._ids(index.search("東京")), [])
+        self.assertEqual(self._ids(index.search("大阪")), ["id_0"])
+        index.optimize()
+        self.assertEqual(index.segments, 1)
+        self.assertEqual(self._ids(index.search("天気")), ["id_0"])
+        self.assertEqual(index._conn.execute("SELECT COUNT(*) FROM deleted").fetchone()[0], 0)
+        index.close()
+
+    def test_pruning_keeps_the_exact_top_k(self):
+        """
+        Tests that max-score pruning returns the same top results as scoring every document.
+        """
+        notes = [f"メモ{i}: " + "天気 " * (i % 4) + "東京 " * (i % 3) + "予定" for i in range(300)]
+        self._publish(make_entries(notes), flush_every=50)
+        index = LexicalIndex(self.index_path)
+        for query in ("東京の天気", "予定 天気", "東京"):
+            terms = tokenize(query)
+            docs, scores = index._scores(terms, 5, prune=False)
+            exact = sorted(zip(scores, docs), reverse=True)[:5]
+            docs, scores = index._scores(terms, 5, prune=True)
+            pruned = sorted(zip(scores, docs), reverse=True)[:5]
+            self.assertEqual([score for score, _ in pruned], [score for score, _ in exact])
+
+    def test_dense_scoring_matches_dict_scoring(self):
+        """
+        Tests that queries matching most of the index, summed in a list by
+        document, score like the dict path: deleted documents left out and a
+        lone kanji counted once per document.
+        """
+        notes = [f"メモ{i}: " + "天気 " * (i % 4) + "東京 " * (i % 3) + "予定" for i in range(300)]
+        self._publish(make_entries(notes), flush_every=50)
+        self._publish([Entry(id="id_7", source="google_keep", content="", metadata={"deleted": True})])
+        index = LexicalIndex(self.index_path)
+        for query in ("東京の天気", "予定", "天"):
+            terms = tokenize(query)
+            for prune in (False, True):
+                docs, scores = index._scores(terms, 5, prune)
+                with mock.patch("plugins.lexical_index._DENSE_QUERY", 0):
+                    sparse_docs, sparse_scores = index._scores(terms, 5, prune)
+                self.assertEqual(heapq.nlargest(5, zip(scores, docs)), heapq.nlargest(5, zip(sparse_scores, sparse_docs)))
+                if not prune:
+                    self.assertEqual(sorted(docs), sorted(sparse_docs))
+        self.assertNotIn("id_7", self._ids(index.search("予定", k=300)))
+        index.close()
+
+    def test_hybrid_search_fuses_ranks(self):
+        """
+        Tests reciprocal rank fusion of lexical and vector results.
+        """
+        entries = list(make_entries())
+        self._publish(entries)
+        vector_path = os.path.join(self.test_dir, "vectors")
+        VectorIndexPlugin({"path": vector_path}).execute(iter(entries))
+
+        lexical, vectors = LexicalIndex(self.index_path), VectorIndex(vector_path)
+        results = hybrid_search(lexical, vectors, "猫", entries[5].vector, k=3)
+        # One lexical and one vector first place tie.
+        self.assertEqual(set(self._ids(results)[:2]), {"id_3", "id_5"})
+        both = hybrid_search(lexical, vectors, "猫", entries[3].vector, k=3)
+        self.assertEqual(both[0]["id"], "id_3")
+        self.assertEqual((both[0]["lexical_rank"], both[0]["vector_rank"]), (1, 1))
+        self.assertAlmostEqual(both[0]["score"], 2 / 61)
+        self.assertIsNone(both[1]["lexical_rank"])
+
+        lexical_only = hybrid_search(lexical, None, "京都", k=2)
+        self.assertEqual(set(self._ids(lexical_only)), {"id_0", "id_1"})
+
+    def test_cli(self):
+        """
+        Tests the command-line query interface.
+        """
+        self._publish(make_entries())
+        out = io.StringIO()
+        with redirect_stdout(out):
+            lexical_index_main([self.index_path, "--text", "紅葉", "-k", "2"])
+        results = json.loads(out.getvalue())
+        self.assertEqual(self._ids(results), ["id_1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+# tests/test_llm_client.py
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import Entry
+from plugins.fake_llm_server import FakeLLMServer
+from plugins.llm_client import (
+    AdaptiveConcurrency, HttpTransport, LLMClient, LLMError, TokenBucket, shared_client,
+)
+from plugins.google_keep import Plugin as GoogleKeepPlugin
+from plugins.llm_metadata_enricher import Plugin as MetadataEnricherPlugin
+from plugins.llm_vectorize import Plugin as VectorizePlugin
+
+def run_threads(count, target):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestLimiters(unittest.TestCase):
+
+    def test_token_bucket_spaces_out_requests(self):
+        now = [0.0]
+        bucket = TokenBucket(per_minute=600, burst=10, clock=lambda: now[0])  # 10/s
+        waits = [bucket.reserve() for _ in range(12)]
+        self.assertEqual(waits[:10], [0.0] * 10)
+        self.assertAlmostEqual(waits[10], 0.1)
+        self.assertAlmostEqual(waits[11], 0.2)
+
+        now[0] = 10.0  # refilled, but never beyond the burst size
+        self.assertEqual(bucket.reserve(10), 0.0)
+        self.assertGreater(bucket.reserve(1), 0.0)
+
+    def test_adaptive_concurrency_backs_off_and_recovers(self):
+        now = [0.0]
+        limiter = AdaptiveConcurrency(8, cooldown=1.0, clock=lambda: now[0])
+        for _ in range(3):
+            limiter.acquire()
+        for _ in range(3):
+            limiter.release(throttled=True)
+        self.assertEqual(limiter.limit, 4)  # a burst of 429s halves the limit once
+
+        for _ in range(50):
+            limiter.acquire()
+            limiter.release(succeeded=True)
+        self.assertEqual(limiter.limit, 8)
+
+
+class TestLLMClient(unittest.TestCase):
+
+    def make_client(self, server, **kwargs):
+        transport = HttpTransport(server.url, pool_size=8)
+        kwargs.setdefault("retry_backoff", 0.01)
+        return LLMClient(transport, **kwargs)
+
+    def test_stays_within_quota_without_throttling(self):
+        # 10 requests per 1s window on the server; the client is told 8/s.
+        with FakeLLMServer(qpm=600, window=1.0, dimensions=4) as server:
+            client = self.make_client(server, max_concurrency=4)
+            client.set_limits("text-embedding-004", qpm=480)
+            started = time.monotonic()
+            run_threads(4, lambda i: [client.embed("text-embedding-004", [f"text {i} {n}"]) for n in range(5)])
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(server.requests, 20)
+        self.assertEqual(server.throttled, 0)
+        self.assertEqual(client.stats["throttled"], 0)
+        # Sustained close to the configured rate: 20 requests at 8/s.
+        self.assertGreater(elapsed, 2.2)
+        self.assertLess(elapsed, 3.5)
+        # Connections are pooled rather than opened per request.
+        self.assertLessEqual(server.connections, 4)
+
+    def test_retries_through_429s(self):
+        with FakeLLMServer(qpm=300, window=0.5, dimensions=4) as server:
+            client = self.make_client(server, max_concurrency=8, max_retries=20)
+            results = {}
+            run_threads(8, lambda i: results.__setitem__(i, client.embed("m", [f"text {i}"])))
+
+        self.assertEqual(len(results), 8)
+        self.assertGreater(server.throttled, 0)
+        self.assertEqual(client.stats["throttled"], server.throttled)
+        self.assertLess(client.concurrency.limit, 8)
+
+    def test_identical_requests_are_coalesced(self):
+        with FakeLLMServer(latency=0.2, dimensions=4) as server:
+            client = self.make_client(server)
+            results = {}
+            run_threads(5, lambda i: results.__setitem__(i, client.embed("m", ["same text"])))
+
+        self.assertEqual(server.requests, 1)
+        self.assertEqual(client.stats["coalesced"], 4)
+        self.assertEqual(len({tuple(vectors[0]) for vectors in results.values()}), 1)
+
+    def test_client_errors_are_not_retried(self):
+        with FakeLLMServer() as server:
+            client = self.make_client(server)
+            with self.assertRaises(LLMError) as cm:
+                client.request("m", "unknownMethod", {})
+        self.assertEqual(cm.exception.code, 404)
+        self.assertEqual(server.requests, 1)
+
+
+class TestPluginsShareTheClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeLLMServer(dimensions=8).start()
+        self.llm = {"endpoint": self.server.url, "limits": {"gemini-1.5-flash": {"qpm": 6000}}}
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmp)
+
+    def test_vectorize_enrich_and_describe_images(self):
+        vectorize = VectorizePlugin({"backend": "vertex", "llm": self.llm})
+        enrich = MetadataEnricherPlugin({"backend": "vertex", "workers": 4, "llm": self.llm})
+        self.assertIs(vectorize.backend.client, enrich.client)
+        self.assertIs(enrich.client, shared_client(self.llm))
+
+        entries = [Entry(id=f"id_{i}", source="test", content=f"note {i}") for i in range(10)]
+        results = list(enrich.execute(vectorize.execute(iter(entries))))
+        self.assertEqual([entry.id for entry in results], [f"id_{i}" for i in range(10)])
+        self.assertEqual(len(results[0].vector), 8)
+        self.assertEqual(results[0].metadata["llm_intent"], "fake_intent")
+
+        with open(os.path.join(self.tmp, "photo.jpg"), 'wb') as f:
+            f.write(b"\xff\xd8\xff\xe0 fake jpeg")
+        with open(os.path.join(self.tmp, "note.json"), 'w', encoding='utf-8') as f:
+            f.write('{"textContent": "x", "attachments": [{"filePath": "photo.jpg", "mimetype": "image/jpeg"}]}')
+        keep = GoogleKeepPlugin({"path": self.tmp, "image_backend": "vertex", "llm": self.llm})
+        entry, = keep.execute()
+        self.assertEqual(entry.metadata["image_content_description"], "A fake description of 1 image(s).")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@
 import unittest
 import sys
 import os
+from array import array
 
 # Add 'src' to path to allow direct import of plugins
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
@@ -40,16 +41,63 @@ class TestLlmVectorizePlugin(unittest.TestCase):
 
         # 5. Verify the vector was added correctly
         self.assertIsNotNone(processed_entry.vector)
-        self.assertIsInstance(processed_entry.vector, list)
+        self.assertIsInstance(processed_entry.vector, array)
+        self.assertEqual(processed_entry.vector.typecode, 'f')
 
-        # Check the vector's content
-        expected_dummy_vector = ([0.1, 0.2, 0.3] * 256)
+        # Check the vector's content (stored as float32)
+        expected_dummy_vector = array('f', [0.1, 0.2, 0.3] * 256)
         self.assertEqual(processed_entry.vector, expected_dummy_vector)
 
         # 6. Verify other fields were not changed
         self.assertEqual(processed_entry.id, sample_entry.id)
         self.assertEqual(processed_entry.content, sample_entry.content)
 
+    def test_batched_output_matches_per_entry_path(self):
+        """
+        Tests that micro-batching yields the same vectors, in the same order,
+        as vectorizing one entry at a time.
+        """
+        def make_entries():
+            return [
+                Entry(id=f"id_{i}", source="test_source", content=f"note number {i}")
+                for i in range(10)
+            ]
+
+        # 1. Vectorize one entry per batch and then in larger batches
+        single = VectorizePlugin({"backend": "hash", "dimensions": 16, "batch_size": 1})
+        batched = VectorizePlugin({"backend": "hash", "dimensions": 16, "batch_size": 4})
+
+        expected = list(single.execute(iter(make_entries())))
+        actual = list(batched.execute(iter(make_entries())))
+
+        # 2. Verify order and vectors are identical
+        self.assertEqual([e.id for e in actual], [e.id for e in expected])
+        self.assertEqual([e.vector for e in actual], [e.vector for e in expected])
+        self.assertEqual(len(actual[0].vector), 16)
+        self.assertNotEqual(actual[0].vector, actual[1].vector)
+
+    def test_tombstones_pass_through_without_vectors(self):
+        """
+        Tests that tombstone entries keep their position and are not embedded.
+        """
+        entries = [
+            Entry(id="live_1", source="test_source", content="first"),
+            Entry(id="gone", source="test_source", content="", metadata={"deleted": True}),
+            Entry(id="live_2", source="test_source", content="second"),
+        ]
+        processed = list(VectorizePlugin({}).execute(iter(entries)))
+
+        self.assertEqual([e.id for e in processed], ["live_1", "gone", "live_2"])
+        self.assertEqual(len(processed[1].vector), 0)
+        self.assertTrue(processed[2].vector)
+
+    def test_unknown_backend_is_rejected(self):
+        """
+        Tests that an unknown backend name fails at configuration time.
+        """
+        with self.assertRaises(ValueError):
+            VectorizePlugin({"backend": "does-not-exist"})
+
 
 if __name__ == '__main__':
     unittest.main()
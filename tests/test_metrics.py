@@ -0,0 +1,103 @@
+# tests/test_metrics.py
+
+import unittest
+import sys
+import os
+import json
+import tempfile
+import time
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from core.metrics import Histogram, PipelineMetrics, StageMetrics, instrument, measure_consumer
+
+def slow(items, delay):
+    for item in items:
+        time.sleep(delay)
+        yield item
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_quantiles(self):
+        histogram = Histogram(bounds=[1.0, 2.0, 4.0])
+        for value in [0.5, 0.5, 1.5, 3.0]:
+            histogram.observe(value)
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(histogram.quantile(0.5), 1.0)
+        self.assertEqual(histogram.quantile(0.99), 4.0)
+        histogram.observe(10.0)
+        self.assertEqual(histogram.quantile(1.0), float("inf"))
+
+    def test_instrument_attributes_time_to_the_slow_stage(self):
+        """Upstream time is counted as wait, not as the downstream stage's busy time."""
+        source = StageMetrics("source", "subscription")
+        fast = StageMetrics("fast", "filter")
+        stream = instrument(slow(range(5), 0.01), source)
+        stream = instrument((x * 2 for x in stream), fast, upstream=[source])
+
+        self.assertEqual(list(stream), [0, 2, 4, 6, 8])
+        self.assertEqual(source.entries, 5)
+        self.assertEqual(fast.entries, 5)
+        self.assertGreaterEqual(source.busy_seconds, 0.05)
+        self.assertGreaterEqual(fast.upstream_wait_seconds, 0.05)
+        self.assertLess(fast.busy_seconds, source.busy_seconds)
+        self.assertEqual(fast.latency.count, 5)
+
+    def test_instrument_counts_errors(self):
+        def failing():
+            yield 1
+            raise RuntimeError("boom")
+
+        stage = StageMetrics("failing", "filter")
+        with self.assertRaises(RuntimeError):
+            list(instrument(failing(), stage))
+        self.assertEqual(stage.entries, 1)
+        self.assertEqual(stage.errors, 1)
+
+    def test_measure_consumer(self):
+        stage = StageMetrics("sink", "publish")
+        received = []
+
+        def consume(entries):
+            for entry in entries:
+                time.sleep(0.01)
+                received.append(entry)
+            return "done"
+
+        self.assertEqual(measure_consumer(consume, slow(range(3), 0.01), stage), "done")
+        self.assertEqual(received, [0, 1, 2])
+        self.assertEqual(stage.entries, 3)
+        self.assertGreaterEqual(stage.upstream_wait_seconds, 0.03)
+        self.assertGreaterEqual(stage.busy_seconds, 0.03)
+
+    def test_report_and_sinks(self):
+        metrics = PipelineMetrics()
+        source = metrics.stage("GoogleKeep", "subscription")
+        sink = metrics.stage("BigQuery", "publish")
+        list(instrument(slow(range(3), 0.01), source))
+        sink.observe_queue(4)
+        sink.observe_queue(2)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, "metrics.json")
+            prom_path = os.path.join(tmp, "shiori.prom")
+            metrics.write({"json_path": json_path, "prometheus_path": prom_path})
+
+            with open(json_path, encoding='utf-8') as f:
+                report = json.load(f)
+            self.assertEqual(report["bottleneck"], "GoogleKeep")
+            stages = {s["name"]: s for s in report["stages"]}
+            self.assertEqual(stages["GoogleKeep"]["entries"], 3)
+            self.assertEqual(stages["BigQuery"]["queue_max_depth"], 4)
+            self.assertEqual(stages["BigQuery"]["queue_mean_depth"], 3.0)
+
+            with open(prom_path, encoding='utf-8') as f:
+                text = f.read()
+            self.assertIn('shiori_stage_entries_total{stage="GoogleKeep",kind="subscription"} 3', text)
+            self.assertIn('shiori_stage_queue_max_depth{stage="BigQuery",kind="publish"} 4', text)
+            self.assertIn('shiori_stage_latency_seconds_bucket{stage="GoogleKeep",kind="subscription",le="+Inf"} 3', text)
+            self.assertFalse(os.path.exists(prom_path + ".tmp"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+# tests/test_near_duplicate.py
+
+import unittest
+import sys
+import os
+import json
+import shutil
+import tempfile
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import Entry
+from plugins.near_duplicate import Plugin as NearDuplicatePlugin, choose_bands, jaccard, minhash
+
+NOTE = ("Weekly planning: review the release checklist, book the meeting room for Thursday, "
+        "draft the budget for the design sprint and follow up with the travel agency.")
+EDITED = NOTE.replace("Thursday", "Friday") + " Also buy milk."
+OTHER = "A recipe for miso soup: dashi, tofu, wakame and a spoonful of white miso paste."
+JA_NOTE = "明日の会議の資料を確認して、週末までに発表の準備を終わらせる。旅行の予定も家族に連絡する。"
+
+def entry(entry_id: str, content: str, **metadata) -> Entry:
+    return Entry(id=entry_id, source="test", content=content, metadata=metadata)
+
+class TestMinHash(unittest.TestCase):
+
+    def test_signatures_estimate_similarity(self):
+        self.assertEqual(minhash(NOTE), minhash("  " + NOTE.upper() + "\n"))
+        self.assertGreater(jaccard(minhash(NOTE), minhash(EDITED)), 0.7)
+        self.assertLess(jaccard(minhash(NOTE), minhash(OTHER)), 0.2)
+        self.assertGreater(jaccard(minhash(JA_NOTE), minhash(JA_NOTE + "よろしく。")), 0.8)
+        self.assertIsNone(minhash("   "))
+
+    def test_short_texts_are_densified(self):
+        signature = minhash("short note", num_perm=64)
+        self.assertEqual(len(signature), 64)
+        self.assertTrue(all(value < 2**32 for value in signature))
+
+    def test_choose_bands(self):
+        bands, rows = choose_bands(0.8, 128)
+        self.assertEqual(bands * rows, 128)
+        self.assertAlmostEqual((1 / bands) ** (1 / rows), 0.8, delta=0.1)
+
+
+class TestNearDuplicatePlugin(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.tmp, "dedup.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def run_plugin(self, entries, **config):
+        plugin = NearDuplicatePlugin({"index_path": self.index_path, "threshold": 0.7, **config})
+        return plugin, list(plugin.execute(iter(entries)))
+
+    def test_drops_copies_and_edited_versions(self):
+        report_path = os.path.join(self.tmp, "report.jsonl")
+        plugin, result = self.run_plugin([
+            entry("a", NOTE, source_file="a.json"),
+            entry("b", OTHER),
+            entry("c", NOTE, source_file="c.json"),
+            entry("d", EDITED, source_file="d.json"),
+        ], report_path=report_path)
+
+        self.assertEqual([e.id for e in result], ["a", "b"])
+        self.assertEqual(plugin.stats, {"entries": 4, "duplicates": 2})
+        with open(report_path, encoding='utf-8') as f:
+            report = [json.loads(line) for line in f]
+        self.assertEqual([(r["id"], r["duplicate_of"]) for r in report], [("c", "a"), ("d", "a")])
+        self.assertEqual(report[0]["similarity"], 1.0)
+
+    def test_mark_action_keeps_duplicates(self):
+        _, result = self.run_plugin([entry("a", NOTE), entry("c", NOTE)], action="mark")
+        self.assertEqual([e.id for e in result], ["a", "c"])
+        self.assertEqual(result[1].metadata["duplicate_of"], "a")
+        self.assertNotIn("duplicate_of", result[0].metadata)
+
+    def test_index_persists_across_runs(self):
+        self.run_plugin([entry("a", NOTE), entry("b", OTHER)])
+
+        # Re-running the same notes keeps them (an entry never duplicates itself)...
+        _, rerun = self.run_plugin([entry("a", NOTE), entry("b", OTHER)])
+        self.assertEqual([e.id for e in rerun], ["a", "b"])
+        # ...while a new copy of an indexed note is dropped.
+        _, later = self.run_plugin([entry("c", NOTE)])
+        self.assertEqual(later, [])
+
+    def test_tombstones_release_the_original(self):
+        self.run_plugin([entry("a", NOTE)])
+        tombstone = entry("a", "", deleted=True)
+        _, result = self.run_plugin([tombstone, entry("c", NOTE)])
+        self.assertEqual([e.id for e in result], ["a", "c"])
+        self.assertTrue(result[0].is_tombstone)
+
+    def test_vector_check(self):
+        first = entry("a", NOTE)
+        first.vector = [1.0, 0.0]
+        copy = entry("c", NOTE)
+        copy.vector = [0.0, 1.0]
+        _, result = self.run_plugin([first, copy], vector_threshold=0.9)
+        self.assertEqual([e.id for e in result], ["a", "c"])
+
+        similar = entry("d", NOTE)
+        similar.vector = [0.99, 0.05]
+        _, result = self.run_plugin([similar], vector_threshold=0.9)
+        self.assertEqual(result, [])
+
+    def test_settings_must_match_the_index(self):
+        self.run_plugin([entry("a", NOTE)])
+        with self.assertRaises(ValueError):
+            self.run_plugin([entry("b", NOTE)], num_perm=64)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# tests/test_parallel.py
+
+import unittest
+import sys
+import os
+import threading
+import time
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.parallel import bounded_map
+
+class TestBoundedMap(unittest.TestCase):
+    """
+    Unit tests for the bounded worker-pool map used by subscription plugins.
+    """
+
+    def test_ordered_results_follow_input_order(self):
+        """
+        Tests that ordered mode yields results in input order even when later
+        items finish first.
+        """
+        def slow_for_small(n):
+            time.sleep(0.01 * (5 - n))
+            return n * n
+
+        results = [(item, future.result()) for item, future in
+                   bounded_map(slow_for_small, range(5), workers=4, ordered=True)]
+        self.assertEqual(results, [(n, n * n) for n in range(5)])
+
+    def test_unordered_results_cover_every_item(self):
+        """
+        Tests that unordered mode yields every item exactly once.
+        """
+        results = sorted(future.result() for _, future in
+                         bounded_map(lambda n: n + 1, range(20), workers=3, ordered=False))
+        self.assertEqual(results, list(range(1, 21)))
+
+    def test_in_flight_work_is_bounded(self):
+        """
+        Tests that no more than `max_in_flight` items are pulled from the input
+        ahead of the consumer.
+        """
+        pulled = []
+        def source():
+            for n in range(100):
+                pulled.append(n)
+                yield n
+
+        results = bounded_map(lambda n: n, source(), workers=2, max_in_flight=3)
+        next(results)
+        self.assertLessEqual(len(pulled), 3)
+        results.close()
+
+    def test_errors_are_returned_per_item(self):
+        """
+        Tests that a failing item does not stop the others, inline or pooled.
+        """
+        def fail_on_two(n):
+            if n == 2:
+                raise ValueError("bad item")
+            return n
+
+        for workers in (1, 3):
+            outcomes = {}
+            for item, future in bounded_map(fail_on_two, range(4), workers=workers):
+                outcomes[item] = future.exception() or future.result()
+            self.assertIsInstance(outcomes.pop(2), ValueError)
+            self.assertEqual(outcomes, {0: 0, 1: 1, 3: 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# tests/test_registry.py
+
+import unittest
+import sys
+import os
+import json
+import subprocess
+import tempfile
+import shutil
+
+# Add 'src' to path to allow direct imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins import registry
+from plugins.registry import BUILTIN_PLUGINS, discover_entry_points, load_class, resolve
+from core.config import validate_config
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+MAIN = os.path.join(ROOT, 'src', 'main.py')
+EXAMPLE = os.path.join(ROOT, 'rag.yaml.example')
+
+class TestRegistry(unittest.TestCase):
+
+    def test_builtin_names_resolve_to_their_plugin_classes(self):
+        spec = resolve("Filter::LLM::Vectorize")
+        self.assertEqual(spec.kind, "filter")
+        self.assertEqual(spec.target, "plugins.llm_vectorize:Plugin")
+        for spec in BUILTIN_PLUGINS.values():
+            with self.subTest(spec.name):
+                self.assertTrue(callable(load_class(spec)))
+
+    def test_unknown_name_lists_the_available_plugins(self):
+        with self.assertRaises(ValueError) as cm:
+            resolve("Publish::Nowhere")
+        self.assertIn("Publish::BigQuery", str(cm.exception))
+
+    def test_entry_point_table_is_cached(self):
+        tmp = tempfile.mkdtemp()
+        cache_path = os.path.join(tmp, "plugins.json")
+        saved = registry._discovered
+        try:
+            registry._discovered = None
+            discovered = discover_entry_points(cache_path)
+            with open(cache_path, encoding='utf-8') as f:
+                cached = json.load(f)
+            self.assertEqual(set(cached["plugins"]), set(discovered))
+
+            # A matching fingerprint is trusted without scanning distributions.
+            cached["plugins"]["Publish::Cached"] = "somewhere:Plugin"
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump(cached, f)
+            registry._discovered = None
+            self.assertEqual(discover_entry_points(cache_path)["Publish::Cached"].kind, "publish")
+        finally:
+            registry._discovered = saved
+            shutil.rmtree(tmp)
+
+
+class TestValidateConfig(unittest.TestCase):
+
+    def test_valid_config(self):
+        config = {"plugins": [
+            {"module": "Subscription::GoogleKeep", "config": {"path": "/takeout"}},
+            {"module": "Publish::BigQuery", "config": {"table_id": "entries"}},
+        ]}
+        self.assertEqual(validate_config(config), [])
+
+    def test_reports_every_problem(self):
+        config = {
+            "global": {"execution": "threads", "log_level": "loud", "fanout": {"on_slow_sink": "drop"}},
+            "plugins": [
+                {"module": "Filter::Typo"},
+                {"module": "Publish::BigQuery", "config": {}},
+                {"config": {}},
+            ],
+        }
+        errors = "\n".join(validate_config(config))
+        for expected in ("global.execution", "global.log_level", "on_slow_sink", "Unknown plugin 'Filter::Typo'",
+                         "missing required 'table_id'", "missing 'module'", "at least one Subscription"):
+            self.assertIn(expected, errors)
+
+    def test_empty_plugins(self):
+        self.assertEqual(validate_config({}), ["plugins: must be a non-empty list."])
+
+
+class TestCli(unittest.TestCase):
+
+    def run_main(self, *args):
+        return subprocess.run([sys.executable, MAIN, *args], capture_output=True, text=True, timeout=30)
+
+    def test_validate_does_not_import_plugins(self):
+        result = self.run_main("--validate", EXAMPLE)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+        # Any plugin module import would show up in the import-time trace.
+        traced = subprocess.run([sys.executable, "-X", "importtime", MAIN, "--validate", EXAMPLE],
+                                capture_output=True, text=True, timeout=30)
+        imported = {line.rsplit("|", 1)[-1].strip() for line in traced.stderr.splitlines()}
+        for spec in BUILTIN_PLUGINS.values():
+            self.assertNotIn(spec.target.split(":")[0], imported)
+        self.assertNotIn("core.async_runner", imported)
+
+    def test_dry_run_prints_the_plan(self):
+        result = self.run_main("--dry-run", EXAMPLE)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("plugins.google_keep:Plugin", result.stdout)
+
+    def test_invalid_config_exits_non_zero(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, "rag.yaml")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("plugins:\n  - module: Subscription::Nowhere\n")
+            result = self.run_main("--validate", path)
+            self.assertEqual(result.returncode, 1)
+            self.assertIn("Unknown plugin 'Subscription::Nowhere'", result.stderr)
+        finally:
+            shutil.rmtree(tmp)
+
+if __name__ == '__main__':
+    unittest.main()
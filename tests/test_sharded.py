@@ -0,0 +1,94 @@
+# tests/test_sharded.py
+
+import unittest
+import sys
+import os
+from array import array
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import Entry, SubscriptionPlugin, FilterPlugin, PublishPlugin, TOMBSTONE_KEY
+from plugins.chunk import Plugin as ChunkPlugin
+from plugins.llm_vectorize import Plugin as VectorizePlugin
+from plugins.near_duplicate import Plugin as NearDuplicatePlugin
+from core.metrics import PipelineMetrics
+from core.sharded import decode_batch, encode_batch, run_sharded_pipeline, shard_of, split_filters
+
+class ListSubscription(SubscriptionPlugin):
+    def __init__(self, n: int):
+        super().__init__({})
+        self.n = n
+
+    def execute(self):
+        for i in range(self.n):
+            yield Entry(id=f"id_{i:03d}", source="test", content=f"content {i}. " * (1 + i % 40))
+
+
+class PidFilter(FilterPlugin):
+    """Records which process handled each entry; fails on `fail_at`."""
+    def execute(self, entries):
+        for entry in entries:
+            if entry.id == self.config.get("fail_at"):
+                raise ValueError("bad entry")
+            entry.metadata["pid"] = os.getpid()
+            yield entry
+
+
+class ListPublisher(PublishPlugin):
+    def __init__(self):
+        super().__init__({})
+        self.published = []
+
+    def execute(self, entries):
+        self.published.extend(entries)
+
+
+class TestSharded(unittest.TestCase):
+
+    def test_batches_round_trip_without_pickling_vectors(self):
+        entries = [
+            Entry(id="a", source="s", content="x", vector=[0.5, 1.5], metadata={"k": [1, 2]}, timestamp=7),
+            Entry(id="b", source="s", content="", metadata={TOMBSTONE_KEY: True}),
+        ]
+        data = encode_batch(entries)
+        self.assertIn(array('f', [0.5, 1.5]).tobytes(), data)
+        self.assertEqual(decode_batch(data), entries)
+
+    def test_shards_are_stable(self):
+        self.assertEqual(shard_of("id_001", 4), shard_of("id_001", 4))
+        self.assertEqual(len({shard_of(f"id_{i}", 4) for i in range(100)}), 4)
+
+    def test_split_filters(self):
+        dedup = NearDuplicatePlugin({})
+        chunk = ChunkPlugin({})
+        stateful_chunk = ChunkPlugin({"state_path": "chunks.json"})
+        vectorize = VectorizePlugin({})
+        self.assertEqual(split_filters([dedup, chunk, vectorize, stateful_chunk]),
+                         ([dedup], [chunk, vectorize], [stateful_chunk]))
+
+    def test_matches_a_single_process_run(self):
+        publisher = ListPublisher()
+        filters = [PidFilter({}), ChunkPlugin({"max_tokens": 64, "overlap_tokens": 8}),
+                   VectorizePlugin({"backend": "hash", "dimensions": 16})]
+        run_sharded_pipeline([ListSubscription(200)], filters, [publisher],
+                             {"sharded": {"workers": 3, "batch_size": 16}}, PipelineMetrics())
+
+        expected = list(VectorizePlugin({"backend": "hash", "dimensions": 16}).execute(
+            ChunkPlugin({"max_tokens": 64, "overlap_tokens": 8}).execute(ListSubscription(200).execute())
+        ))
+        by_id = {entry.id: entry for entry in publisher.published}
+        self.assertEqual(sorted(by_id), sorted(entry.id for entry in expected))
+        for entry in expected:
+            self.assertEqual(by_id[entry.id].vector, entry.vector)
+            self.assertEqual(by_id[entry.id].content, entry.content)
+        self.assertEqual(len({entry.metadata["pid"] for entry in publisher.published} - {os.getpid()}), 3)
+
+    def test_worker_errors_fail_the_run(self):
+        with self.assertRaises(RuntimeError) as cm:
+            run_sharded_pipeline([ListSubscription(50)], [PidFilter({"fail_at": "id_020"})], [ListPublisher()],
+                                 {"sharded": {"workers": 2, "batch_size": 4}}, PipelineMetrics())
+        self.assertIn("bad entry", str(cm.exception))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+# tests/test_staging.py
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from array import array
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import Entry, TOMBSTONE_KEY
+from plugins.registry import create_plugin
+from plugins.staging import FORMATS, SegmentWriter, read_entries, segment_paths
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+def staging(kind, **config):
+    return create_plugin({"module": f"{kind}::Staging", "config": config})
+
+def make_entries(n, dimensions=4):
+    return [
+        Entry(id=f"id_{i:03d}", source="test", content=f"content {i}",
+              vector=array('f', [i + d / 10 for d in range(dimensions)]),
+              metadata={"tags": ["a", "b"], "n": i}, timestamp=1700000000 + i)
+        for i in range(n)
+    ]
+
+
+@unittest.skipUnless(pyarrow, "pyarrow is not installed")
+class TestStaging(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def round_trip(self, format):
+        entries = make_entries(25)
+        entries.append(Entry(id="gone", source="test", content="", metadata={TOMBSTONE_KEY: True}))
+        publisher = staging("Publish", path=self.tmp, format=format, batch_rows=10, segment_rows=20)
+        committed = []
+        publisher.on_commit = committed.extend
+        publisher.execute(iter(entries))
+
+        self.assertEqual(len(segment_paths(self.tmp)), 2)
+        self.assertEqual(committed, [entry.id for entry in entries])
+        subscription = staging("Subscription", path=self.tmp)
+        self.assertEqual(list(subscription.execute()), entries)
+
+    def test_arrow_round_trip(self):
+        self.round_trip("arrow")
+
+    def test_parquet_round_trip(self):
+        self.round_trip("parquet")
+
+    def test_arrow_vectors_are_views_of_the_file(self):
+        writer = SegmentWriter(self.tmp)
+        for entry in make_entries(3, dimensions=768):
+            writer.write(entry)
+        path = writer.close()
+
+        entry = list(read_entries(path))[2]
+        self.assertIsInstance(entry.vector, memoryview)
+        self.assertEqual(entry.vector.format, 'f')
+        self.assertEqual(len(entry.vector), 768)
+        self.assertEqual(entry.vector[1], array('f', [2.1])[0])
+
+    def test_committed_entries_are_skipped(self):
+        writer = SegmentWriter(self.tmp)
+        for entry in make_entries(5):
+            writer.write(entry)
+        writer.close()
+        subscription = staging("Subscription", path=self.tmp)
+        subscription.committed = lambda entry_id, version=None: entry_id in {"id_001", "id_003"}
+        self.assertEqual([entry.id for entry in subscription.execute()], ["id_000", "id_002", "id_004"])
+
+    def test_failed_runs_leave_no_segment(self):
+        publisher = staging("Publish", path=self.tmp)
+
+        def entries():
+            yield from make_entries(3)
+            raise ValueError("upstream failed")
+
+        with self.assertRaises(ValueError):
+            publisher.execute(entries())
+        self.assertEqual(os.listdir(self.tmp), [])
+
+    def test_vector_width_waits_for_the_first_vector(self):
+        vectorless = [Entry(id=f"bare_{i}", source="test", content="no vector yet") for i in range(3)]
+        entries = vectorless + make_entries(4) + vectorless[:1]
+        for format in FORMATS:
+            with self.subTest(format=format):
+                directory = os.path.join(self.tmp, format)
+                publisher = staging("Publish", path=directory, format=format, batch_rows=2, segment_rows=5)
+                publisher.execute(iter(entries))
+                self.assertEqual(publisher.dimensions, 4)
+                self.assertEqual(list(staging("Subscription", path=directory).execute()), entries)
+
+    def test_mismatched_dimensions_are_rejected(self):
+        writer = SegmentWriter(self.tmp, dimensions=8)
+        writer.write(make_entries(1)[0])
+        with self.assertRaises(ValueError):
+            writer.close()
+        writer.abort()
+
+
+class TestStagingConfig(unittest.TestCase):
+
+    def test_path_is_required(self):
+        with self.assertRaises(ValueError):
+            staging("Publish")
+
+    @unittest.skipIf(pyarrow, "pyarrow is installed")
+    def test_missing_pyarrow_is_reported_at_startup(self):
+        with self.assertRaises(ImportError) as cm:
+            staging("Subscription", path="staging")
+        self.assertIn("pip install pyarrow", str(cm.exception))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+# tests/test_vector_index.py
+
+import unittest
+import sys
+import os
+import io
+import json
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+
+# Add 'src' to path to allow direct import of plugins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from plugins.base import Entry
+from plugins.embedding import HashEmbeddingBackend
+from plugins.vector_index import Plugin as VectorIndexPlugin, VectorIndex, main as vector_index_main
+
+DIMENSIONS = 16
+
+def make_entries(n: int):
+    backend = HashEmbeddingBackend("test-model", {"dimensions": DIMENSIONS})
+    colors = ["blue", "red"]
+    for i in range(n):
+        content = f"note {i}"
+        yield Entry(id=f"id_{i}", source="google_keep", content=content,
+                    vector=backend.embed([content])[0],
+                    metadata={"color": colors[i % 2], "other": "not indexed"})
+
+class TestVectorIndex(unittest.TestCase):
+    """
+    Unit tests for the local vector index publish plugin.
+    """
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.test_dir, "index")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _publish(self, entries, **config):
+        VectorIndexPlugin({"path": self.index_path, **config}).execute(iter(entries))
+
+    def test_exact_search_finds_the_entry_itself(self):
+        """
+        Tests that querying with an entry's own vector returns it first,
+        with a cosine score of 1, and that metadata filters apply.
+        """
+        entries = list(make_entries(40))
+        self._publish(entries)
+
+        index = VectorIndex(self.index_path)
+        self.assertEqual(len(index), 40)
+        results = index.search(entries[7].vector, k=3)
+        self.assertEqual(results[0]["id"], "id_7")
+        self.assertAlmostEqual(results[0]["score"], 1.0, places=5)
+        self.assertEqual(results[0]["metadata"], {"color": "red"})
+
+        red_only = index.search(entries[8].vector, k=10, filters={"color": "red"})
+        self.assertTrue(all(r["metadata"]["color"] == "red" for r in red_only))
+        self.assertNotIn("id_8", [r["id"] for r in red_only])
+
+    def test_updates_and_tombstones_persist_across_runs(self):
+        """
+        Tests that re-published IDs supersede their old row and that
+        tombstones remove entries, after reopening the index.
+        """
+        entries = list(make_entries(5))
+        self._publish(entries)
+
+        replacement = Entry(id="id_0", source="google_keep", content="edited",
+                            vector=entries[3].vector, metadata={"color": "blue"})
+        tombstone = Entry(id="id_1", source="google_keep", content="", metadata={"deleted": True})
+        self._publish([replacement, tombstone])
+
+        index = VectorIndex(self.index_path)
+        self.assertEqual(len(index), 4)
+        ids = [r["id"] for r in index.search(entries[3].vector, k=10)]
+        self.assertNotIn("id_1", ids)
+        self.assertEqual(ids.count("id_0"), 1)
+        self.assertEqual(set(ids[:2]), {"id_0", "id_3"})
+
+    def test_approximate_search_matches_exact_top_hit(self):
+        """
+        Tests that the IVF path returns the same best match as the exact path,
+        including for rows added after the clusters were built.
+        """
+        entries = list(make_entries(60))
+        self._publish(entries[:50])
+        self.assertIsNone(VectorIndex(self.index_path).meta["ivf"])  # never built while publishing
+        with redirect_stdout(io.StringIO()):
+            vector_index_main([self.index_path, "--build-ivf", "--lists", "7"])
+        self.assertEqual(VectorIndex(self.index_path).meta["ivf"]["lists"], 7)
+
+        self._publish(entries[50:])
+        index = VectorIndex(self.index_path)
+        for i in (3, 25, 55):
+            exact = index.search(entries[i].vector, k=1)
+            approximate = index.search(entries[i].vector, k=1, approximate=True, nprobe=2)
+            self.assertEqual(approximate[0]["id"], exact[0]["id"])
+
+    def test_cli_queries_by_id(self):
+        """
+        Tests the command-line query interface.
+        """
+        self._publish(make_entries(10))
+        out = io.StringIO()
+        with redirect_stdout(out):
+            vector_index_main([self.index_path, "--id", "id_4", "-k", "2", "--filter", "color=blue"])
+        results = json.loads(out.getvalue())
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]["id"], "id_4")
+
+
+if __name__ == '__main__':
+    unittest.main()